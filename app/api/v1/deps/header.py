@@ -1,13 +1,28 @@
 # app/api/v1/deps/header.py
 
-from fastapi import Header
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
 from app.api.v1.models.security_model import HeaderSecurity
 
-async def get_header_security(
-    x_api_key: str = Header(..., alias="x-api-key"),
-    x_hospcode: str = Header(..., alias="x-hospcode")
-) -> HeaderSecurity:
-    return HeaderSecurity(
-        x_api_key=x_api_key,
-        x_hospcode=x_hospcode
-    )
+# อ่าน header จาก request.headers ตรงๆ (ไม่ประกาศเป็น Header(...) ที่ FastAPI ต้อง validate ทุก request)
+# เอกสาร OpenAPI ของ header ทั้งสองจึงใส่เองผ่าน openapi_extra=HEADER_SECURITY_DOC ของแต่ละ route
+HEADER_SECURITY_DOC = {
+    "parameters": [
+        {"in": "header", "name": "x-api-key", "required": True, "schema": {"title": "X-Api-Key", "type": "string"}},
+        {"in": "header", "name": "x-hospcode", "required": True, "schema": {"title": "X-Hospcode", "type": "string"}},
+    ]
+}
+
+
+async def get_header_security(request: Request) -> HeaderSecurity:
+    headers = request.headers
+    x_api_key = headers.get("x-api-key")
+    x_hospcode = headers.get("x-hospcode")
+    if x_api_key is None or x_hospcode is None:
+        # ไม่มี header -> 422 รูปแบบเดียวกับที่ FastAPI validate Header(...) ให้ (สัญญากับผู้เรียกเดิม)
+        raise RequestValidationError([
+            {"type": "missing", "loc": ("header", name), "msg": "Field required", "input": None}
+            for name, value in (("x-api-key", x_api_key), ("x-hospcode", x_hospcode))
+            if value is None
+        ])
+    return HeaderSecurity(x_api_key, x_hospcode)
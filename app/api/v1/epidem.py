@@ -1,6 +1,7 @@
 from fastapi import APIRouter
+from app.core.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 @router.get("/ping")
 async def epidem_ping():
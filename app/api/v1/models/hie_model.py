@@ -24,6 +24,13 @@ class HIEAdmitRequest(HIEBaseRequest):
     an: str = Field(..., example="0000123456", description="AN")
     vstdate: str = Field(..., example="2025-01-15", description="วันที่เริ่ม admit (YYYY-MM-DD)")
 
+class HIEVisitKey(BaseModel):
+    hn: str = Field(..., example="000123456", description="HN")
+    vn: str = Field(..., example="650101123456", description="VN")
+
+class HIEVisitBatchRequest(HIEBaseRequest):
+    visits: List[HIEVisitKey] = Field(..., min_length=1, description="รายการ (hn, vn) ของผู้ป่วยรายนี้ที่ต้องการดึงรายละเอียด")
+
 class HIEDiagnosisItem(BaseModel):
     code3: Optional[str] = None
     tname: Optional[str] = None
@@ -227,3 +234,11 @@ class HIEVisitResponse(HIEBaseResponse):
 class HIEAdmitResponse(HIEBaseResponse):
     admit: Optional[HIEAdmitItem] = None
 
+class HIEVisitBatchItem(HIEBaseResponse):
+    hn: str = Field(..., example="000123456")
+    vn: str = Field(..., example="650101123456")
+    visit: Optional[HIEVisitItem] = None
+
+class HIEVisitBatchResponse(HIEBaseResponse):
+    visits: List[HIEVisitBatchItem] = []
+
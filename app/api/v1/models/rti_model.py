@@ -7,7 +7,20 @@ class RTIBaseRequest(BaseModel):
 
 class RTIAccidentRequest(RTIBaseRequest):
     vstdate: str = Field(..., example="2025-01-15", description="วันที่รับบริการ (YYYY-MM-DD)")
-    pass
+    since: Optional[str] = Field(
+        None, example="2025-01-15 10:00:00",
+        description=(
+            "ดึงเฉพาะรายการที่ D_UPDATE ตั้งแต่ค่านี้ (>=, ใช้ next_since ของรอบก่อน) ไม่ระบุ = ทั้งวัน"
+            " รายการที่ D_UPDATE เท่ากับ since จะถูกส่งซ้ำ ผู้เรียกต้องตัดซ้ำด้วย (HOSPCODE, PID, SEQ)"
+        ),
+    )
+    limit: Optional[int] = Field(
+        None, ge=1, example=500,
+        description="จำนวนรายการต่อหน้า (keyset pagination) ไม่ระบุ = คืนทั้งหมด",
+    )
+    cursor: Optional[str] = Field(
+        None, description="next_cursor จากหน้าก่อน สำหรับดึงหน้าถัดไป",
+    )
 
 class RTIAccidentPlaceRequest(RTIBaseRequest):
     pass
@@ -67,6 +80,17 @@ class RTIBaseResponse(BaseModel):
     
 class RTIAccidentResponse(RTIBaseResponse):
     result: list[RTIAccidentItem] = None
+    next_since: Optional[str] = Field(
+        None, example="2025-01-15 10:00:00",
+        description=(
+            "D_UPDATE ล่าสุดของผลลัพธ์ ส่งเป็น since ในการดึงรอบถัดไป"
+            " (since + limit: ทุกหน้าเรียงตาม D_UPDATE ใช้ค่าของหน้าไหนก็ได้,"
+            " limit โดยไม่มี since: null, โหมด NDJSON: อยู่ใน header X-Next-Since)"
+        ),
+    )
+    next_cursor: Optional[str] = Field(
+        None, description="ส่งเป็น cursor เพื่อดึงหน้าถัดไป (null = หน้าสุดท้าย หรือไม่ได้ระบุ limit)",
+    )
 
 class RTIAccidentPlaceResponse(RTIBaseResponse):
     result: list[RTIAccidentPlaceItem] = None
\ No newline at end of file
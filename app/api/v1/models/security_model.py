@@ -1,6 +1,8 @@
 # app/api/v1/models/security_model.py
-from pydantic import BaseModel, Field
+from typing import NamedTuple
 
-class HeaderSecurity(BaseModel):
-    x_api_key: str = Field(..., description="API key", example="my-secret-api-key")
-    x_hospcode: str = Field(..., description="Hospcode", example="10815")
+
+# header ที่ใช้ตรวจสิทธิ์ (สร้างทุก request จึงเป็น NamedTuple ไม่ใช่ pydantic model)
+class HeaderSecurity(NamedTuple):
+    x_api_key: str
+    x_hospcode: str
@@ -3,7 +3,22 @@ from typing import Optional
 
 class StrokeIPDRequest(BaseModel):
     hospcode: str = Field(..., example="10815", description="รหัสสถานพยาบาล 5 หลัก")
-    dchdate: str = Field(..., example="2025-01-15", description="วันที่จำหน่าย (YYYY-MM-DD)")
+    dchdate: Optional[str] = Field(None, example="2025-01-15", description="วันที่จำหน่าย (YYYY-MM-DD)")
+    date_from: Optional[str] = Field(
+        None, example="2025-01-01",
+        description="โหมดช่วงวันที่: วันแรก (YYYY-MM-DD) ใช้แทน dchdate พร้อม date_to",
+    )
+    date_to: Optional[str] = Field(
+        None, example="2025-01-31",
+        description="โหมดช่วงวันที่: วันสุดท้าย (YYYY-MM-DD) รวมวันนี้ด้วย",
+    )
+    limit: Optional[int] = Field(
+        None, ge=1, example=500,
+        description="จำนวนรายการต่อหน้า (keyset pagination) ไม่ระบุ = คืนทั้งหมด",
+    )
+    cursor: Optional[str] = Field(
+        None, description="next_cursor จากหน้าก่อน สำหรับดึงหน้าถัดไป",
+    )
 
 class StrokeIPDItem(BaseModel):
     hospcode: Optional[str] = Field(None, example="10807")
@@ -39,10 +54,28 @@ class StrokeIPDResponse(BaseModel):
     MessageCode: str
     Message: str
     result: list[StrokeIPDItem]
+    next_cursor: Optional[str] = Field(
+        None, description="ส่งเป็น cursor เพื่อดึงหน้าถัดไป (null = หน้าสุดท้าย หรือไม่ได้ระบุ limit)",
+    )
 
 class StrokeOPDRequest(BaseModel):
     hospcode: str = Field(..., example="10815", description="รหัสสถานพยาบาล 5 หลัก")
-    vstdate: str = Field(..., example="2025-01-15", description="วันที่เข้ารับบริการ (YYYY-MM-DD)")
+    vstdate: Optional[str] = Field(None, example="2025-01-15", description="วันที่เข้ารับบริการ (YYYY-MM-DD)")
+    date_from: Optional[str] = Field(
+        None, example="2025-01-01",
+        description="โหมดช่วงวันที่: วันแรก (YYYY-MM-DD) ใช้แทน vstdate พร้อม date_to",
+    )
+    date_to: Optional[str] = Field(
+        None, example="2025-01-31",
+        description="โหมดช่วงวันที่: วันสุดท้าย (YYYY-MM-DD) รวมวันนี้ด้วย",
+    )
+    limit: Optional[int] = Field(
+        None, ge=1, example=500,
+        description="จำนวนรายการต่อหน้า (keyset pagination) ไม่ระบุ = คืนทั้งหมด",
+    )
+    cursor: Optional[str] = Field(
+        None, description="next_cursor จากหน้าก่อน สำหรับดึงหน้าถัดไป",
+    )
 
 class StrokeOPDItem(BaseModel):
     hospcode: Optional[str] = Field(None, example="10807")
@@ -76,4 +109,7 @@ class StrokeOPDItem(BaseModel):
 class StrokeOPDResponse(BaseModel):
     MessageCode: str
     Message: str
-    result: list[StrokeOPDItem]
\ No newline at end of file
+    result: list[StrokeOPDItem]
+    next_cursor: Optional[str] = Field(
+        None, description="ส่งเป็น cursor เพื่อดึงหน้าถัดไป (null = หน้าสุดท้าย หรือไม่ได้ระบุ limit)",
+    )
@@ -1,21 +1,32 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import get_db, engine
+from app.core.cache import caches
+from app.core.metrics import render_all
+from app.core.slow_queries import slow_query_log
+from app.core import thaiaddress, dimensions, sampler, startup, admission, replica
+from app.core.timing import TimedRoute
+from app.core.security import api_security
+from app.api.v1.deps.header import HEADER_SECURITY_DOC, get_header_security
+from app.api.v1.models.security_model import HeaderSecurity
 
+import os
 import socket
 import platform
-import psutil
 from datetime import datetime
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
 
 # ---------------------------------------------------------
 # 1) ตรวจสอบ API ว่ายังทำงานหรือไม่
 # ---------------------------------------------------------
 @router.get("/status", summary="Check API status")
 async def status():
-    return {"status": "running"}
+    # startup = เวลา warm-up pool / โหลดข้อมูลอ้างอิง / time-to-ready และ request แรกของ worker ที่ตอบ
+    return {"status": "running", "startup": startup.report()}
 
 
 # ---------------------------------------------------------
@@ -46,39 +57,119 @@ async def system_info():
 
 # ---------------------------------------------------------
 # 4) Performance (เบามาก ไม่กินเครื่อง รพ.)
+#    อ่านจาก snapshot ของ sampler ใน background ไม่บล็อก event loop
 # ---------------------------------------------------------
 @router.get("/performance", summary="Get basic performance usage")
 async def performance():
+    snap = await sampler.snapshot()
     return {
-        "cpu": psutil.cpu_percent(interval=0.1),
-        "memory": psutil.virtual_memory().percent,
-        "disk": psutil.disk_usage("/").percent,
+        "cpu": snap["cpu"],
+        "memory": snap["memory"],
+        "disk": snap["disk"],
         "environment": "docker" if platform.system() == "Linux" else "windows",
+        "sampled_at": snap["sampled_at"],
     }
 
 
 # ---------------------------------------------------------
 # 5) Full-check: รวมทั้งหมดใน endpoint เดียว
+#    สถานะ DB มาจาก sampler (ตรวจทุก MONITOR_SAMPLE_SECONDS) ไม่ยิง query ทุกครั้งที่ถูก poll
 # ---------------------------------------------------------
 @router.get("/full-check", summary="Check API + DB + system performance")
-async def full_check(db: AsyncSession = Depends(get_db)):
-    # Database
-    try:
-        await db.execute(text("SELECT @@VERSION"))
-        db_ok = True
-        db_error = None
-    except Exception as e:
-        db_ok = False
-        db_error = str(e)
-
+async def full_check():
+    snap = await sampler.snapshot()
     return {
         "system": "running",
-        "database": db_ok,
-        "database_error": db_error,
+        "database": snap["database"],
+        "database_error": snap["database_error"],
+        "database_latency_ms": snap["database_latency_ms"],
         "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "sampled_at": snap["sampled_at"],
         "performance": {
-            "cpu": psutil.cpu_percent(interval=0.1),
-            "memory": psutil.virtual_memory().percent,
-            "disk": psutil.disk_usage("/").percent,
+            "cpu": snap["cpu"],
+            "memory": snap["memory"],
+            "disk": snap["disk"],
         }
     }
+
+
+# ---------------------------------------------------------
+# 6) สถิติ cache ในหน่วยความจำ (hit / miss / invalidate)
+# ---------------------------------------------------------
+@router.get("/cache", summary="Get in-process cache statistics")
+async def cache_stats():
+    result = {name: cache.stats() for name, cache in caches.items()}
+    result["thaiaddress"] = thaiaddress.stats()
+    result["dimensions"] = dimensions.stats()
+    return result
+
+
+# ---------------------------------------------------------
+# 7) สถานะ connection pool (ยืมอยู่ / ว่าง / overflow / การรอคิว)
+# ---------------------------------------------------------
+@router.get("/pool", summary="Get database connection pool statistics")
+async def pool_stats():
+    pool = engine.sync_engine.pool
+    result = pool.stats()
+    result["pre_ping"] = settings.DB_POOL_PRE_PING
+    # หลาย worker (app/server.py): ค่าข้างบนเป็นของ worker ที่ตอบ request นี้เท่านั้น
+    result["worker_pid"] = os.getpid()
+    result["workers"] = settings.SERVER_WORKERS
+    result["max_connections"] = settings.DB_MAX_CONNECTIONS or None
+    return result
+
+
+# ---------------------------------------------------------
+# 8) Metrics แบบ Prometheus (histogram เวลาตอบสนองต่อ route / ช่วงเวลา security, db, convert, serialize)
+# ---------------------------------------------------------
+@router.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(render_all(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ---------------------------------------------------------
+# 9) Slow-query log: SQL ที่ช้า / ถูกเรียกบ่อย รวมตาม fingerprint (ไม่มีค่า parameter)
+# ---------------------------------------------------------
+@router.get("/slow-queries", summary="Get slowest and most frequent SQL fingerprints")
+async def slow_queries(limit: int = Query(20, ge=1, le=200)):
+    result = slow_query_log.report(limit)
+    result["hospcode"] = settings.HOSP_CODE
+    return result
+
+
+# ล้างสถิติ: เปลี่ยนสถานะจึงเป็น DELETE และต้องผ่านการตรวจสิทธิ์เหมือน DELETE /rti/place/cache
+@router.delete(
+    "/slow-queries",
+    summary="Reset slow-query statistics",
+    description="ล้างสถิติ slow-query log (ต้องส่ง x-api-key / x-hospcode)",
+    status_code=200,
+    openapi_extra=HEADER_SECURITY_DOC,
+)
+async def slow_queries_reset(
+    request: Request,
+    headers: HeaderSecurity = Depends(get_header_security),
+):
+    await api_security(request, headers.x_hospcode)
+
+    slow_query_log.reset()
+
+    return {
+        "MessageCode": "200",
+        "Message": "Success"
+    }
+
+
+# ---------------------------------------------------------
+# 10) Admission control: rate limit ต่อ IP / request ที่ทำงานพร้อมกัน / จำนวนที่ถูกปฏิเสธ (429, 503)
+# ---------------------------------------------------------
+@router.get("/admission", summary="Get rate-limit and concurrency-limit statistics")
+async def admission_stats():
+    return admission.stats()
+
+
+# ---------------------------------------------------------
+# 11) Read replica: งานรายงาน (/stroke, /rti) ใช้ replica หรือ primary / lag / ผลตรวจล่าสุด
+# ---------------------------------------------------------
+@router.get("/replica", summary="Get read-replica health and routing statistics")
+async def replica_stats():
+    return replica.stats()
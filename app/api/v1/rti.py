@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Request, Depends, params, status
+from fastapi import APIRouter, Request, Depends, Response, params, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
@@ -7,13 +7,50 @@ from app.core.config import settings
 from app.api.v1.models.rti_model import (
     RTIAccidentRequest, RTIAccidentPlaceRequest,
     RTIAccidentResponse, RTIAccidentPlaceResponse,
+    RTIAccidentItem, RTIAccidentPlaceItem,
 )
-from app.api.v1.deps.header import get_header_security
+from app.api.v1.deps.header import HEADER_SECURITY_DOC, get_header_security
 from app.api.v1.models.security_model import HeaderSecurity
 from app.core.security import api_security
-from app.core.database import get_db
+from app.core.replica import get_reporting_db, reporting_sessions
+from app.core.cache import ResponseCache
+from app.core.converters import RowConverter, spec_from_model
+from app.core.responses import dumps, fast_response
+from app.core.pagination import check_limit, keyset_sql, limit_sql, order_sql, split_page
+from app.core.streaming import NDJSON_RESPONSE_DOC, wants_ndjson, ndjson_response
+from app.core.deadline import CancellableRoute
+
+# งานรายงาน: อ่านจาก read replica ถ้าตั้งไว้และพร้อม ไม่งั้น primary (app/core/replica.py)
+router = APIRouter(route_class=CancellableRoute)
+
+# ข้อมูลจุดเสี่ยงเปลี่ยนไม่บ่อย เก็บ response ที่ serialise แล้วไว้ตาม RTI_PLACE_CACHE_TTL
+rti_place_cache = ResponseCache("rti_place", settings.RTI_PLACE_CACHE_TTL)
+
+
+# HOSPCODE/PID/SEQ/DATETIME_SERV เป็น str เสมอ field อื่น str หรือ None
+accident_item = RowConverter(
+    spec_from_model(RTIAccidentItem, "str_or_none", {
+        "HOSPCODE": "str", "PID": "str", "SEQ": "str", "DATETIME_SERV": "str",
+    }),
+    "accident_item",
+)
+
+# ลำดับเดิม DATETIME_SERV DESC + PID, SEQ ให้ลำดับไม่ซ้ำสำหรับ keyset pagination
+ACCIDENT_PAGE_KEYS = [
+    ("DATETIME_SERV", "DATETIME_SERV", "DESC"),
+    ("PID", "PID", "DESC"),
+    ("SEQ", "SEQ", "DESC"),
+]
+# delta (since + limit) เรียงตาม D_UPDATE จากเก่าไปใหม่ -> next_since ของทุกหน้าเป็น watermark ที่ใช้ต่อได้
+# (แถวที่ยังไม่ได้ส่งมี D_UPDATE >= แถวสุดท้ายของหน้า)
+ACCIDENT_DELTA_PAGE_KEYS = [
+    ("D_UPDATE", "D_UPDATE", "ASC"),
+    ("PID", "PID", "ASC"),
+    ("SEQ", "SEQ", "ASC"),
+]
+
+place_item = RowConverter(spec_from_model(RTIAccidentPlaceItem, "str"), "place_item")
 
-router = APIRouter()
 
 @router.post(
     "/accident",
@@ -21,12 +58,14 @@ router = APIRouter()
     description="ข้อมูลการเกิดอุบัติเหตุ",
     response_model=RTIAccidentResponse,
     status_code=status.HTTP_200_OK,
+    responses=NDJSON_RESPONSE_DOC,
+    openapi_extra=HEADER_SECURITY_DOC,
 )
 async def rti_accident(
     body: RTIAccidentRequest,
     request: Request,
     headers: HeaderSecurity = Depends(get_header_security),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_reporting_db),
 ):
     await api_security(request, body.hospcode)
 
@@ -34,66 +73,83 @@ async def rti_accident(
         "vstdate": body.vstdate
     }
 
-    sql = text("""
+    # delta sync: since = next_since ของรอบก่อน -> รายการที่แก้ไขตั้งแต่เวลานั้น
+    # ใช้ >= เพราะ D_UPDATE ซ้ำกันได้ (แถวที่ commit ทีหลังด้วยเวลาเดียวกับ watermark ต้องไม่หาย)
+    # รายการที่ D_UPDATE = since จึงถูกส่งซ้ำ ผู้เรียกต้องตัดซ้ำด้วย (HOSPCODE, PID, SEQ) เช่น upsert
+    delta = ""
+    if body.since:
+        delta = "AND D_UPDATE >= :since"
+        params["since"] = body.since
+
+    # keyset pagination (opt-in ด้วย limit) โหมด streaming ส่งทั้งหมดอยู่แล้วจึงไม่แบ่งหน้า
+    stream = wants_ndjson(request)
+    paged = bool(body.limit) and not stream
+    page_keys = ACCIDENT_DELTA_PAGE_KEYS if body.since else ACCIDENT_PAGE_KEYS
+    page_where, order_by, page_limit = "", order_sql(page_keys), ""
+    if paged:
+        check_limit(body.limit)
+        page_where, order_by = keyset_sql(page_keys, body.cursor, params)
+        page_limit = limit_sql(body.limit, params)
+
+    sql = text(f"""
         SELECT 
             * FROM v_rti_accident 
-        WHERE vstdate = :vstdate 
-        ORDER BY DATETIME_SERV DESC
+        WHERE vstdate = :vstdate {delta} {page_where}
+        {order_by} {page_limit}
     """
     )
+
+    if stream:
+        # watermark อ่านก่อนเริ่มส่ง จากฐานเดียวกับ stream ส่งใน header X-Next-Since
+        # แถวที่ commit ระหว่าง stream (D_UPDATE ใหม่กว่า) จะถูกส่งซ้ำรอบหน้า ไม่หาย
+        sessions = reporting_sessions()
+        async with sessions() as session:
+            watermark = (await session.execute(text(f"""
+                SELECT MAX(D_UPDATE) FROM v_rti_accident
+                WHERE vstdate = :vstdate {delta}
+            """), params)).scalar()
+        response = ndjson_response(sql, params, accident_item, sessions)
+        next_since = str(watermark) if watermark is not None else body.since
+        if next_since is not None:
+            response.headers["X-Next-Since"] = next_since
+        return response
+
     rows = await db.execute(sql, params)
-    result = rows.mappings().all()
+    result = rows.all()
     if not result:
         return {
             "MessageCode": "404",
             "Message": "Not Found Data",
-            "result": []
+            "result": [],
+            "next_since": body.since,
         }
 
-    list_data = []
-    for row in result:
-        temp = {
-            "HOSPCODE": str(row["HOSPCODE"]),
-            "PID": str(row["PID"]),
-            "SEQ": str(row["SEQ"]),
-            "DATETIME_SERV": str(row["DATETIME_SERV"]),
-            "DATETIME_AE": str(row["DATETIME_AE"]) if row["DATETIME_AE"] else None,
-            "AETYPE": str(row["AETYPE"]) if row["AETYPE"] else None,
-            "AEPLACE": str(row["AEPLACE"]) if row["AEPLACE"] else None,
-            "TYPEIN_AE": str(row["TYPEIN_AE"]) if row["TYPEIN_AE"] else None,
-            "TRAFFIC": str(row["TRAFFIC"]) if row["TRAFFIC"] else None,
-            "VEHICLE": str(row["VEHICLE"]) if row["VEHICLE"] else None,
-            "ALCOHOL": str(row["ALCOHOL"]) if row["ALCOHOL"] else None,
-            "NACROTIC_DRUG": str(row["NACROTIC_DRUG"]) if row["NACROTIC_DRUG"] else None,
-            "BELT": str(row["BELT"]) if row["BELT"] else None,
-            "HELMET": str(row["HELMET"]) if row["HELMET"] else None,
-            "AIRWAY": str(row["AIRWAY"]) if row["AIRWAY"] else None
-            ,"STOPBLEED": str(row["STOPBLEED"]) if row["STOPBLEED"] else None,
-            "SPLINT": str(row["SPLINT"]) if row["SPLINT"] else None,
-            "FLUID": str(row["FLUID"]) if row["FLUID"] else None,
-            "URGENCY": str(row["URGENCY"]) if row["URGENCY"] else None,
-            "COMA_EYE": str(row["COMA_EYE"]) if row["COMA_EYE"] else None,
-            "COMA_SPEAK": str(row["COMA_SPEAK"]) if row["COMA_SPEAK"] else None,
-            "COMA_MOVEMENT": str(row["COMA_MOVEMENT"]) if row["COMA_MOVEMENT"] else None,
-            "D_UPDATE": str(row["D_UPDATE"]) if row["D_UPDATE"] else None,
-            "CID": str(row["CID"]) if row["CID"] else None,
-            "HOSPCODE9": str(row["HOSPCODE9"]) if row["HOSPCODE9"] else None,
-            "accident_stdcode": str(row["accident_stdcode"]) if row["accident_stdcode"] else None,
-            "pt_name": str(row["pt_name"]) if row["pt_name"] else None,
-            "hn": str(row["hn"]) if row["hn"] else None,
-            "an": str(row["an"]) if row["an"] else None,
-            "referhos": str(row["referhos"]) if row["referhos"] else None,
-            "dead_in": str(row["dead_in"]) if row["dead_in"] else None,
-            "dead_before": str(row["dead_before"]) if row["dead_before"] else None,
-            "place_other": str(row["place_other"]) if row["place_other"] else None,
-        }
-        list_data.append(temp)
+    next_cursor = None
+    if paged:
+        result, next_cursor = split_page(result, page_keys, body.limit)
 
-    return {
+    keys = rows.keys()
+    list_data = accident_item.convert_batch(result, keys)
+
+    # หน้าที่เรียงตาม DATETIME_SERV (limit โดยไม่มี since) ไม่มี watermark ที่ถูกต้อง:
+    # หน้าถัดไปอาจมีแถวที่ D_UPDATE เก่ากว่า -> ไม่ส่ง next_since (ให้เริ่ม delta ด้วย since)
+    next_since = None if paged and not body.since else _next_since(result, keys, body.since)
+
+    return fast_response({
         "MessageCode": "200",
         "Message": "Success",
-        "result": list_data
-    }
+        "result": list_data,
+        "next_since": next_since,
+        "next_cursor": next_cursor,
+    })
+
+
+def _next_since(result, keys, since):
+    # D_UPDATE ล่าสุดของผลลัพธ์ (ไม่มี D_UPDATE เลย -> คืน since เดิม)
+    position = list(keys).index("D_UPDATE")
+    updates = [row[position] for row in result if row[position] is not None]
+    return str(max(updates)) if updates else since
+
 
 @router.post(
     "/place",
@@ -101,45 +157,67 @@ async def rti_accident(
     description="ข้อมูลจุดเสี่ยง",
     response_model=RTIAccidentPlaceResponse,
     status_code=status.HTTP_200_OK,
+    openapi_extra=HEADER_SECURITY_DOC,
 )
 async def rti_place(
     body: RTIAccidentPlaceRequest,
     request: Request,
     headers: HeaderSecurity = Depends(get_header_security),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_reporting_db),
 ):
     await api_security(request, body.hospcode)
 
-    sql = text("""
-        SELECT * FROM v_rti_place ORDER BY accident_stdcode ASC
-    """)
+    payload = rti_place_cache.get()
+    if payload is not None:
+        return Response(content=payload, media_type="application/json", headers={"X-Cache": "HIT"})
 
-    rows = await db.execute(sql)
-    result = rows.mappings().all()
+    async with rti_place_cache.lock:
+        # request อื่นอาจเติม cache ให้แล้วระหว่างรอ lock
+        payload = rti_place_cache.peek()
+        if payload is None:
+            sql = text("""
+                SELECT * FROM v_rti_place ORDER BY accident_stdcode ASC
+            """)
 
-    if not result:
-        return {
-            "MessageCode": "404",
-            "Message": "Not Found Data",
-            "result": []
-        }
+            rows = await db.execute(sql)
+            result = rows.all()
+
+            if not result:
+                return {
+                    "MessageCode": "404",
+                    "Message": "Not Found Data",
+                    "result": []
+                }
+
+            list_data = place_item.convert_batch(result, rows.keys())
+
+            # serialise ครั้งเดียวตอน miss แล้วเก็บเป็น bytes (place_item สร้างตรงตาม model แล้ว)
+            payload = dumps({
+                "MessageCode": "200",
+                "Message": "Success",
+                "result": list_data
+            })
+            rti_place_cache.set(payload)
+
+    return Response(content=payload, media_type="application/json", headers={"X-Cache": "MISS"})
 
-    list_data = []
-    for row in result:
-        temp = {
-            "accident_stdcode": str(row["accident_stdcode"]),
-            "accident_place_type_name": str(row["accident_place_type_name"]),
-            "latitude": str(row["latitude"]),
-            "longitude": str(row["longitude"]),
-            "tamboncode": str(row["tamboncode"]),
-            "ampurcode": str(row["ampurcode"]),
-            "road": str(row["road"]),
-            "export_code": str(row["export_code"]),
-        }
-        list_data.append(temp)
+
+@router.delete(
+    "/place/cache",
+    summary="RTI AccidentPlace cache invalidate",
+    description="ล้าง cache ข้อมูลจุดเสี่ยง ให้ request ถัดไปดึงจากฐานข้อมูลใหม่",
+    status_code=status.HTTP_200_OK,
+    openapi_extra=HEADER_SECURITY_DOC,
+)
+async def rti_place_cache_invalidate(
+    request: Request,
+    headers: HeaderSecurity = Depends(get_header_security),
+):
+    await api_security(request, headers.x_hospcode)
+
+    rti_place_cache.invalidate()
 
     return {
         "MessageCode": "200",
-        "Message": "Success",
-        "result": list_data
-    }
\ No newline at end of file
+        "Message": "Success"
+    }
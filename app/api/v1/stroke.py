@@ -1,86 +1,113 @@
-from fastapi import APIRouter, Request, Depends, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import text
+import functools
 
-from app.api.v1.deps.header import get_header_security
+from fastapi import APIRouter, Request, Depends, HTTPException, status
+
+from app.api.v1.deps.header import HEADER_SECURITY_DOC, get_header_security
 from app.api.v1.models.stroke_model import StrokeIPDRequest, StrokeIPDResponse, StrokeIPDItem, StrokeOPDRequest, StrokeOPDResponse, StrokeOPDItem
 from app.api.v1.models.security_model import HeaderSecurity
 from app.core.security import api_security
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.date_range import request_days
+from app.core import thaiaddress, dimensions, timing
+from app.core.responses import fast_response
+from app.core.pagination import check_limit
+from app.core.streaming import NDJSON_RESPONSE_DOC, wants_ndjson, ndjson_partitions_response
+from app.core.deadline import CancellableRoute
+from app.services.stroke_cohort import STROKE_IPD, STROKE_OPD, request_connections
 
-router = APIRouter()
+router = APIRouter(route_class=CancellableRoute)
+
+
+def _stroke_ipd_item(row) -> dict:
+    changwat, ampur, tambon = thaiaddress.resolve(row["chwpart"], row["ampart"], row["tmbpart"])
+    return {
+        "hospcode": str(row["hospcode"]),
+        "cid": str(row["cid"]),
+        "hn": str(row["hn"]),
+        "an": str(row["an"]),
+        "pname": str(row["pname"]),
+        "fname": str(row["fname"]),
+        "lname": str(row["lname"]),
+        "sex": str(row["sex"]) if row["sex"] else None,
+        "nation": str(row["nationality"]) if row["nationality"] else None,
+        "birthday": row["birthday"].isoformat() if row["birthday"] else None,
+        "icd10": str(row["icd10"]),
+        "vstdate": row["vstdate"].isoformat() if row["vstdate"] else None,
+        "regdate": row["regdate"].isoformat() if row["regdate"] else None,
+        "dxdate": row["dxdate"].isoformat() if row["dxdate"] else None,
+        "dchdate": row["dchdate"].isoformat() if row["dchdate"] else None,
+        "status": dimensions.name("dchtype", row["dchtype"]),
+        "address": row["address"],
+        "moo": row["moo"],
+        "tambon": tambon,
+        "ampur": ampur,
+        "changwat": changwat,
+        "tmbpart": row["tmbpart"],
+        "ampart": row["ampart"],
+        "chwpart": row["chwpart"],
+        "phone": row["phone"],
+        "relation_phone": row["relation_phone"],
+        "relation_name": row["relation_name"],
+        "drug_name": row["drug_name"],
+    }
 
-@router.post("/StrokeIPD", summary="Stroke IPD", description="ดึงข้อมูลผู้ป่วย Stroke จากข้อมูล IPD", response_model=StrokeIPDResponse, status_code=status.HTTP_200_OK)
-async def stroke_ipd(
-    body: StrokeIPDRequest,
-    request: Request,
-    headers: HeaderSecurity = Depends(get_header_security),
-    db: AsyncSession = Depends(get_db)
-):
-    # ตรวจสอบ API KEY (ตามที่คุณกำหนด)
-    await api_security(request, body.hospcode)
 
-    sql = text("""
-        SELECT 
-            o.hcode AS hospcode,
-            o.vstdate,
-            p.cid,
-            o.hn,
-            o.vn,
-            p.pname,
-            p.fname,
-            p.lname,
-            o.an,
-            p.sex,
-            p.nationality,
-            p.birthday,
-            id.icd10,
-            i.regdate,
-            DATE(id.modify_datetime) AS dxdate,
-            i.dchdate,
-            d.name AS status,
-            CONCAT(p.addrpart,' ',p.road) AS address,
-            p.moopart AS moo,
-            t3.name AS tambon,
-            t2.name AS ampur,
-            t1.name AS changwat,
-            p.tmbpart,
-            p.amppart AS ampart,
-            p.chwpart,
-            p.hometel AS phone,
-            p.informtel AS relation_phone,
-            p.informname AS relation_name,
-            GROUP_CONCAT(di.sticker_short_name SEPARATOR '|') AS drug_name
-        FROM ovst o
-        INNER JOIN ipt i ON i.an = o.an
-        LEFT JOIN opitemrece r ON r.an = o.an
-        LEFT JOIN drugitems di ON di.icode = r.icode
-        LEFT JOIN iptdiag id ON id.an = i.an
-        LEFT JOIN patient p ON p.hn = i.hn
-        LEFT JOIN icd10 i1 ON i1.code = id.icd10
-        LEFT JOIN dchtype d ON d.dchtype = i.dchtype
-        LEFT JOIN thaiaddress t1 
-            ON t1.chwpart = p.chwpart 
-            AND t1.amppart = '00' 
-            AND t1.tmbpart = '00'
-        LEFT JOIN thaiaddress t2 
-            ON t2.chwpart = p.chwpart 
-            AND t2.amppart = p.amppart 
-            AND t2.tmbpart = '00'
-        LEFT JOIN thaiaddress t3 
-            ON t3.chwpart = p.chwpart 
-            AND t3.amppart = p.amppart 
-            AND t3.tmbpart = p.tmbpart
-        WHERE i.dchdate = :dchdate
-            AND i.dchdate IS NOT NULL 
-            AND i.dchdate != ''
-            AND id.icd10 BETWEEN 'I60' AND 'I69'
-            AND r.icode LIKE '1%%'
-        GROUP BY o.vn
-    """)
-
-    rows = await db.execute(sql, {"dchdate": body.dchdate})
-    result = rows.mappings().all()
+def _stroke_opd_item(row) -> dict:
+    changwat, ampur, tambon = thaiaddress.resolve(row["chwpart"], row["ampart"], row["tmbpart"])
+    return {
+        "hospcode": str(row["hospcode"]),
+        "cid": str(row["cid"]),
+        "hn": str(row["hn"]),
+        "vn": str(row["vn"]),
+        "pname": str(row["pname"]),
+        "fname": str(row["fname"]),
+        "lname": str(row["lname"]),
+        "sex": str(row["sex"]) if row["sex"] else None,
+        "nation": str(row["nationality"]) if row["nationality"] else None,
+        "birthday": row["birthday"].isoformat() if row["birthday"] else None,
+        "icd10": str(row["icd10"]),
+        "vstdate": row["vstdate"].isoformat() if row["vstdate"] else None,
+        "dxdate": row["dxdate"].isoformat() if row["dxdate"] else None,
+        "dchdate": row["dchdate"].isoformat() if row["dchdate"] else None,
+        "status": dimensions.name("ovstost", row["ovstost"]),
+        "address": row["address"],
+        "moo": row["moo"],
+        "tambon": tambon,
+        "ampur": ampur,
+        "changwat": changwat,
+        "tmbpart": row["tmbpart"],
+        "ampart": row["ampart"],
+        "chwpart": row["chwpart"],
+        "phone": row["phone"],
+        "relation_phone": row["relation_phone"],
+        "relation_name": row["relation_name"],
+        "drug_name": row["drug_name"],
+    }
+
+
+async def _stroke_response(cohort, days: list, body, request: Request, convert):
+    # ชื่อจังหวัด/อำเภอ/ตำบล และสถานะ แปลงจากข้อมูลอ้างอิงในหน่วยความจำหลัง query หลัก
+    await thaiaddress.ensure_loaded()
+    await dimensions.ensure_loaded()
+
+    # connection ที่ request นี้ใช้พร้อมกันได้ รวมทุกวันและทุก query ย่อย (ไม่เกิน DB_FANOUT_PER_REQUEST)
+    connections = request_connections()
+
+    if wants_ndjson(request):
+        # ส่งทีละวันตามลำดับ ไม่แบ่งหน้า: keys + ยาของหลายวันอ่านล่วงหน้าพร้อมกัน, details stream จาก DB ทีละวัน
+        loaders = [functools.partial(cohort.stream, day, connections) for day in days]
+        return ndjson_partitions_response(loaders, convert, settings.DATE_RANGE_PARALLELISM)
+
+    next_cursor = None
+    if len(days) > 1:
+        # โหมดช่วงวันที่: ทีละวันพร้อมกัน (ไม่เกิน DATE_RANGE_PARALLELISM) รวมผลเรียงตามวัน
+        result = await cohort.load_days(days, settings.DATE_RANGE_PARALLELISM, connections)
+    elif body.limit:
+        # keyset pagination (opt-in ด้วย limit) เรียงตาม vn
+        check_limit(body.limit)
+        result, next_cursor = await cohort.load(days[0], body.cursor, body.limit)
+    else:
+        result, _ = await cohort.load(days[0])
 
     if not result:
         return {
@@ -89,161 +116,45 @@ async def stroke_ipd(
             "result": []
         }
 
-    list_data = []
-    for row in result:
-        temp = {
-            "hospcode": str(row["hospcode"]),
-            "cid": str(row["cid"]),
-            "hn": str(row["hn"]),
-            "an": str(row["an"]),
-            "pname": str(row["pname"]),
-            "fname": str(row["fname"]),
-            "lname": str(row["lname"]),
-            "sex": str(row["sex"]) if row["sex"] else None,
-            "nation": str(row["nationality"]) if row["nationality"] else None,
-            "birthday": row["birthday"].isoformat() if row["birthday"] else None,
-            "icd10": str(row["icd10"]),
-            "vstdate": row["vstdate"].isoformat() if row["vstdate"] else None,
-            "regdate": row["regdate"].isoformat() if row["regdate"] else None,
-            "dxdate": row["dxdate"].isoformat() if row["dxdate"] else None,
-            "dchdate": row["dchdate"].isoformat() if row["dchdate"] else None,
-            "status": row["status"],
-            "address": row["address"],
-            "moo": row["moo"],
-            "tambon": row["tambon"],
-            "ampur": row["ampur"],
-            "changwat": row["changwat"],
-            "tmbpart": row["tmbpart"],
-            "ampart": row["ampart"],
-            "chwpart": row["chwpart"],
-            "phone": row["phone"],
-            "relation_phone": row["relation_phone"],
-            "relation_name": row["relation_name"],
-            "drug_name": row["drug_name"],
-        }
-        list_data.append(temp)
+    with timing.phase("convert"):
+        list_data = [convert(row) for row in result]
 
-    return {
+    return fast_response({
         "MessageCode": "200",
         "Message": "Success",
-        "result": list_data
-    }
-
+        "result": list_data,
+        "next_cursor": next_cursor,
+    })
 
 
-@router.post("/StrokeOPD", summary="Stroke OPD", description="ดึงข้อมูลผู้ป่วย Stroke จากข้อมูล OPD", response_model=StrokeOPDResponse, status_code=status.HTTP_200_OK)
-async def stroke_opd(
-    body: StrokeOPDRequest,
+@router.post("/StrokeIPD", summary="Stroke IPD", description="ดึงข้อมูลผู้ป่วย Stroke จากข้อมูล IPD", response_model=StrokeIPDResponse, status_code=status.HTTP_200_OK, responses=NDJSON_RESPONSE_DOC, openapi_extra=HEADER_SECURITY_DOC)
+async def stroke_ipd(
+    body: StrokeIPDRequest,
     request: Request,
     headers: HeaderSecurity = Depends(get_header_security),
-    db: AsyncSession = Depends(get_db)
 ):
-    # ตรวจสอบ API-KEY + hospcode
+    # ตรวจสอบ API KEY (ตามที่คุณกำหนด)
     await api_security(request, body.hospcode)
 
-    sql = text("""
-        SELECT 
-            o.hcode AS hospcode,
-            o.vstdate,
-            p.cid,
-            o.hn,
-            o.vn,
-            p.pname,
-            p.fname,
-            p.lname,
-            p.sex,
-            p.nationality,
-            p.birthday,
-            id.icd10,
-            o.vstdate AS regdate,
-            DATE(CONCAT(id.vstdate,' ',id.vsttime)) AS dxdate,
-            o.vstdate AS dchdate,
-            d.name AS status,
-            CONCAT(p.addrpart,' ',p.road) AS address,
-            p.moopart AS moo,
-            t3.name AS tambon,
-            t2.name AS ampur,
-            t1.name AS changwat,
-            p.tmbpart,
-            p.amppart AS ampart,
-            p.chwpart,
-            p.hometel AS phone,
-            p.informtel AS relation_phone,
-            p.informname AS relation_name,
-            GROUP_CONCAT(di.sticker_short_name SEPARATOR '|') AS drug_name
-        FROM ovst o
-        LEFT JOIN opitemrece r ON r.vn = o.vn
-        LEFT JOIN drugitems di ON di.icode = r.icode
-        LEFT JOIN ovstdiag id ON id.vn = o.vn
-        LEFT JOIN patient p ON p.hn = o.hn
-        LEFT JOIN icd10 i1 ON i1.code = id.icd10
-        LEFT JOIN ovstost d ON d.ovstost = o.ovstost
-        LEFT JOIN thaiaddress t1 
-            ON t1.chwpart = p.chwpart
-            AND t1.amppart = '00'
-            AND t1.tmbpart = '00'
-        LEFT JOIN thaiaddress t2 
-            ON t2.chwpart = p.chwpart
-            AND t2.amppart = p.amppart
-            AND t2.tmbpart = '00'
-        LEFT JOIN thaiaddress t3 
-            ON t3.chwpart = p.chwpart
-            AND t3.amppart = p.amppart
-            AND t3.tmbpart = p.tmbpart
-        WHERE o.vstdate = :vstdate
-            AND id.icd10 BETWEEN 'I60' AND 'I69'
-            AND r.icode LIKE '1%'
-            AND o.an IS NULL
-        GROUP BY o.vn
-    """)
-
-    rows = await db.execute(sql, {"vstdate": body.vstdate})
-    result = rows.mappings().all()
+    days = request_days(body.dchdate, body.date_from, body.date_to, "dchdate")
+    if len(days) > 1 and body.limit:
+        raise HTTPException(status_code=400, detail="limit is not supported with date_from/date_to")
 
-    if not result:
-        return {
-            "MessageCode": "404",
-            "Message": "Not Found Data",
-            "result": []
-        }
+    return await _stroke_response(STROKE_IPD, days, body, request, _stroke_ipd_item)
 
-    list_data = []
-    for row in result:
-        temp = {
-            "hospcode": str(row["hospcode"]),
-            "cid": str(row["cid"]),
-            "hn": str(row["hn"]),
-            "vn": str(row["vn"]),
-            "pname": str(row["pname"]),
-            "fname": str(row["fname"]),
-            "lname": str(row["lname"]),
-            "sex": str(row["sex"]) if row["sex"] else None,
-            "nation": str(row["nationality"]) if row["nationality"] else None,
-            "birthday": row["birthday"].isoformat() if row["birthday"] else None,
-            "icd10": str(row["icd10"]),
-            "vstdate": row["vstdate"].isoformat() if row["vstdate"] else None,
-            "dxdate": row["dxdate"].isoformat() if row["dxdate"] else None,
-            "dchdate": row["dchdate"].isoformat() if row["dchdate"] else None,
-            "status": row["status"],
-            "address": row["address"],
-            "moo": row["moo"],
-            "tambon": row["tambon"],
-            "ampur": row["ampur"],
-            "changwat": row["changwat"],
-            "tmbpart": row["tmbpart"],
-            "ampart": row["ampart"],
-            "chwpart": row["chwpart"],
-            "phone": row["phone"],
-            "relation_phone": row["relation_phone"],
-            "relation_name": row["relation_name"],
-            "drug_name": row["drug_name"],
-        }
 
-        list_data.append(temp)
 
+@router.post("/StrokeOPD", summary="Stroke OPD", description="ดึงข้อมูลผู้ป่วย Stroke จากข้อมูล OPD", response_model=StrokeOPDResponse, status_code=status.HTTP_200_OK, responses=NDJSON_RESPONSE_DOC, openapi_extra=HEADER_SECURITY_DOC)
+async def stroke_opd(
+    body: StrokeOPDRequest,
+    request: Request,
+    headers: HeaderSecurity = Depends(get_header_security),
+):
+    # ตรวจสอบ API-KEY + hospcode
+    await api_security(request, body.hospcode)
 
-    return {
-        "MessageCode": "200",
-        "Message": "Success",
-        "result": list_data
-    }
+    days = request_days(body.vstdate, body.date_from, body.date_to, "vstdate")
+    if len(days) > 1 and body.limit:
+        raise HTTPException(status_code=400, detail="limit is not supported with date_from/date_to")
+
+    return await _stroke_response(STROKE_OPD, days, body, request, _stroke_opd_item)
@@ -0,0 +1,208 @@
+# app/core/admission.py
+#
+# Admission control หน้า /hie, /stroke, /rti เพื่อไม่ให้ผู้เรียกรายเดียวรุมฐานข้อมูล HOSxP ตัวจริงของโรงพยาบาล
+#   1) rate limit ต่อ IP ของผู้เรียก (token bucket แยกตาม group) เกิน -> 429 + Retry-After
+#      IP จาก security.get_trusted_client_ip: X-Forwarded-For เชื่อเฉพาะเมื่อมาจาก TRUSTED_PROXIES
+#   2) จำนวน request ที่ทำงานพร้อมกัน ต่อ group และรวมทุก group (ผูกกับขนาด connection pool)
+#      เต็มแล้วรอคิวได้ไม่เกิน ADMISSION_QUEUE_SIZE / ADMISSION_QUEUE_TIMEOUT วินาที ไม่งั้น -> 503 + Retry-After
+# /monitor และ /epidem ไม่ถูกจำกัด (ต้องดูสถานะได้แม้ระบบกำลังรับโหลดเกิน)
+# ค่าทั้งหมดเป็นของแต่ละ worker
+
+import asyncio
+import math
+import time
+from collections import OrderedDict
+
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.core.database import POOL_SIZE, POOL_MAX_OVERFLOW
+from app.core.metrics import Counter
+from app.core.security import get_trusted_client_ip
+
+REJECTED = Counter(
+    "agent_admission_rejected_total", "จำนวน request ที่ถูกปฏิเสธโดย admission control",
+    ("group", "reason"),
+)
+
+
+class RateLimiter:
+    # token bucket ต่อ IP: เติม rate token ต่อวินาที เก็บได้สูงสุด burst
+    def __init__(self, rate: float, burst: int, max_clients: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.max_clients = max_clients
+        # ip -> [tokens, เวลาที่เติมล่าสุด] เรียงจากใช้ล่าสุด (เกิน max_clients ทิ้งตัวที่เงียบนานสุด)
+        self._buckets = OrderedDict()
+
+    def acquire(self, client_ip: str) -> float:
+        # คืนค่า 0 = ผ่าน, มากกว่า 0 = วินาทีที่ต้องรอจนมี token
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        bucket = self._buckets.get(client_ip)
+        if bucket is None:
+            bucket = self._buckets[client_ip] = [float(self.burst), now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client_ip)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def stats(self) -> dict:
+        return {"per_second": self.rate, "burst": self.burst, "clients": len(self._buckets)}
+
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int, queue_size: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def acquire(self, timeout: float) -> bool:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        else:
+            # คิวเต็ม -> ปฏิเสธทันที ไม่ให้ request กองรอ (ผู้เรียกจะ timeout แล้วยิงซ้ำอยู่ดี)
+            if self.waiting >= self.queue_size or timeout <= 0:
+                return False
+            self.waiting += 1
+            # ไม่ใช้ wait_for ตรงๆ: บน Python 3.11 acquire อาจได้ permit พร้อมกับที่ timeout/cancel
+            # permit นั้นจะไม่มีใครคืน (limit หดลงเรื่อยๆ) จึงรอผ่าน task แล้วคืนเองถ้าได้มาหลังเลิกรอ
+            waiter = asyncio.ensure_future(self._semaphore.acquire())
+            try:
+                done, _ = await asyncio.wait((waiter,), timeout=timeout)
+            except asyncio.CancelledError:
+                self._abandon(waiter)
+                raise
+            finally:
+                self.waiting -= 1
+            if not done:
+                self._abandon(waiter)
+                return False
+        self.active += 1
+        return True
+
+    def _abandon(self, waiter):
+        waiter.cancel()
+        waiter.add_done_callback(self._release_abandoned)
+
+    def _release_abandoned(self, waiter):
+        if not waiter.cancelled() and waiter.exception() is None:
+            self._semaphore.release()
+
+    def release(self):
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting, "queue_size": self.queue_size}
+
+
+def _pool_capacity() -> int:
+    # request ของ HIE ถือ connection ของ session ไว้ระหว่างรอ query ย่อย (fan-out)
+    # เหลือที่ให้ fan-out อย่างน้อย DB_FANOUT_PER_REQUEST ตัว ไม่งั้น pool ตันจนทุก request รอกันเอง
+    # stroke โหมดช่วงวันที่ใช้ connection รวมทุกวันไม่เกิน DB_FANOUT_PER_REQUEST เช่นกัน (stroke_cohort.request_connections)
+    return max(POOL_SIZE + POOL_MAX_OVERFLOW - settings.DB_FANOUT_PER_REQUEST, 1)
+
+
+_GROUPS = {
+    "hie": (settings.RATE_LIMIT_HIE_PER_SECOND, settings.RATE_LIMIT_HIE_BURST, settings.CONCURRENCY_HIE),
+    "stroke": (settings.RATE_LIMIT_STROKE_PER_SECOND, settings.RATE_LIMIT_STROKE_BURST, settings.CONCURRENCY_STROKE),
+    "rti": (settings.RATE_LIMIT_RTI_PER_SECOND, settings.RATE_LIMIT_RTI_BURST, settings.CONCURRENCY_RTI),
+}
+_PREFIX = "/api/v1/"
+
+rate_limiters = {
+    group: RateLimiter(rate, burst, settings.RATE_LIMIT_MAX_CLIENTS)
+    for group, (rate, burst, _) in _GROUPS.items()
+}
+group_limiters = {
+    group: ConcurrencyLimiter(limit, settings.ADMISSION_QUEUE_SIZE)
+    for group, (_, _, limit) in _GROUPS.items() if limit > 0
+}
+global_limiter = ConcurrencyLimiter(
+    settings.ADMISSION_MAX_CONCURRENT or _pool_capacity(), settings.ADMISSION_QUEUE_SIZE,
+)
+
+
+def route_group(path: str):
+    if not path.startswith(_PREFIX):
+        return None
+    group = path[len(_PREFIX):].split("/", 1)[0]
+    return group if group in _GROUPS else None
+
+
+def _reject(group: str, reason: str, status_code: int, detail: str, retry_after: float) -> JSONResponse:
+    REJECTED.inc((group, reason))
+    return JSONResponse(
+        status_code=status_code,
+        content={"detail": detail},
+        headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+    )
+
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.ADMISSION_ENABLED:
+            return await self.app(scope, receive, send)
+        group = route_group(scope["path"])
+        if group is None:
+            return await self.app(scope, receive, send)
+
+        # key = IP ที่ปลอมไม่ได้ (XFF ใช้เฉพาะเมื่อ peer เป็น TRUSTED_PROXIES) จำนวน bucket จำกัดที่ RATE_LIMIT_MAX_CLIENTS
+        wait = rate_limiters[group].acquire(get_trusted_client_ip(Request(scope)))
+        if wait:
+            response = _reject(group, "rate_limit", 429, "Too many requests", wait)
+            return await response(scope, receive, send)
+
+        # รอคิวรวมกันไม่เกิน ADMISSION_QUEUE_TIMEOUT (ทั้งคิวของ group และคิวรวม)
+        deadline = time.monotonic() + settings.ADMISSION_QUEUE_TIMEOUT
+        acquired = []
+        try:
+            for limiter in (group_limiters.get(group), global_limiter):
+                if limiter is None:
+                    continue
+                if not await limiter.acquire(deadline - time.monotonic()):
+                    response = _reject(
+                        group, "overloaded", 503, "Server busy, retry later",
+                        settings.ADMISSION_RETRY_AFTER_SECONDS,
+                    )
+                    return await response(scope, receive, send)
+                acquired.append(limiter)
+
+            # ถือสิทธิ์ไว้จนส่ง response ครบ (รวม streaming NDJSON)
+            await self.app(scope, receive, send)
+        finally:
+            for limiter in acquired:
+                limiter.release()
+
+
+def stats() -> dict:
+    return {
+        "enabled": settings.ADMISSION_ENABLED,
+        "global": global_limiter.stats(),
+        "groups": {
+            group: {
+                "rate_limit": rate_limiters[group].stats(),
+                "concurrency": group_limiters[group].stats() if group in group_limiters else None,
+                "rejected": {
+                    reason: int(REJECTED.series.get((group, reason), 0))
+                    for reason in ("rate_limit", "overloaded")
+                },
+            }
+            for group in _GROUPS
+        },
+    }
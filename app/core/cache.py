@@ -0,0 +1,160 @@
+# app/core/cache.py
+#
+# In-process cache สำหรับ response ที่ข้อมูลเปลี่ยนไม่บ่อย (เช่น จุดเสี่ยง RTI)
+# เก็บ payload ที่ serialise เป็น JSON bytes ไว้แล้ว ตอน hit จึงไม่ต้องแตะ DB และไม่ต้อง validate ซ้ำ
+#
+# KeyedResponseCache: cache ตาม key อายุสั้นสำหรับ endpoint ที่ถูกเรียกซ้ำเป็นช่วงๆ (HIE patient / service ตอน refer)
+
+import asyncio
+import time
+from collections import OrderedDict
+
+# รายการ cache ทั้งหมด ใช้แสดงสถิติใน /monitor/cache
+caches = {}
+
+
+class ResponseCache:
+    def __init__(self, name: str, ttl: int):
+        self.name = name
+        self.ttl = ttl
+        self.payload = None
+        self.stored_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        # ให้ miss ที่เข้ามาพร้อมกันยิง DB แค่ครั้งเดียว
+        self.lock = asyncio.Lock()
+        caches[name] = self
+
+    def get(self):
+        if self.payload is not None and time.monotonic() - self.stored_at < self.ttl:
+            self.hits += 1
+            return self.payload
+        self.misses += 1
+        return None
+
+    def peek(self):
+        # อ่านค่าโดยไม่นับสถิติ (ใช้ตรวจซ้ำหลังได้ lock)
+        if self.payload is not None and time.monotonic() - self.stored_at < self.ttl:
+            return self.payload
+        return None
+
+    def set(self, payload: bytes):
+        if self.ttl <= 0:
+            return
+        self.payload = payload
+        self.stored_at = time.monotonic()
+
+    def invalidate(self):
+        self.payload = None
+        self.stored_at = 0.0
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        age = time.monotonic() - self.stored_at if self.payload is not None else None
+        return {
+            "ttl": self.ttl,
+            "cached": self.peek() is not None,
+            "age_seconds": round(age, 1) if age is not None else None,
+            "size_bytes": len(self.payload) if self.payload is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+
+class _LeaderCancelled(Exception):
+    # request ที่กำลังโหลดถูกยกเลิก (client ตัดการเชื่อมต่อ) -> ตัวที่รออยู่ต้องโหลดเอง
+    pass
+
+
+class KeyedResponseCache:
+    # cache ตาม key (เช่น cid) อายุสั้น + LRU
+    # request ที่ key เดียวกันเข้ามาพร้อมกัน (single-flight) รอผลจาก query เดียวกัน ไม่ยิง DB ซ้ำ
+    def __init__(self, name: str, ttl: int, max_entries: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.invalidations = 0
+        caches[name] = self
+
+    def _get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] >= self.ttl:
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def _set(self, key, content):
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        self.entries[key] = (content, time.monotonic())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_load(self, key, loader, cacheable=None):
+        # คืนค่า (content, "HIT" | "MISS" | "COALESCED")
+        # loader = async function ที่ query แล้วคืน content (ห้ามแก้ content ที่ได้จาก cache)
+        # cacheable(content) -> False = ไม่เก็บ (เช่น ไม่พบข้อมูล) แต่ยังแชร์ให้ตัวที่รออยู่
+        while True:
+            content = self._get(key)
+            if content is not None:
+                self.hits += 1
+                return content, "HIT"
+            future = self.inflight.get(key)
+            if future is None:
+                break
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(future), "COALESCED"
+            except _LeaderCancelled:
+                continue
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            content = await loader()
+        except asyncio.CancelledError:
+            future.set_exception(_LeaderCancelled())
+            future.exception()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            if cacheable is None or cacheable(content):
+                self._set(key, content)
+            future.set_result(content)
+            return content, "MISS"
+        finally:
+            self.inflight.pop(key, None)
+
+    def invalidate(self):
+        self.entries.clear()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "ttl": self.ttl,
+            "max_entries": self.max_entries,
+            "entries": len(self.entries),
+            "inflight": len(self.inflight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -7,7 +9,11 @@ class Settings(BaseSettings):
 
     API_KEY: str
     API_ALLOWED_IP1: str
-    API_ALLOWED_IP2: str
+    API_ALLOWED_IP2: str = ""
+    # API key เพิ่มเติม คั่นด้วย , (ใส่เป็น sha256:<hex> ได้ เพื่อไม่เก็บ key จริงใน .env)
+    API_KEYS: str = ""
+    # IP / ช่วง CIDR ที่อนุญาตเพิ่มเติม คั่นด้วย , เช่น 203.157.115.0/24,10.0.0.5
+    API_ALLOWED_IPS: str = ""
 
     HOSP_CODE: str
     HOSP_CODE9: str
@@ -21,6 +27,139 @@ class Settings(BaseSettings):
     # เพิ่มบรรทัดนี้เพื่อให้รองรับค่าจาก .env ครับ
     DB_DRIVER: str
 
+    # ถ้ากำหนด จะใช้ URL นี้แทน MS SQL ข้างบน (เช่น ฐานข้อมูลจำลองของ benchmarks/)
+    DB_URL: Optional[str] = None
+
+    # จำนวน query ย่อยที่ยิงพร้อมกันได้ต่อ 1 request (HIE visit/admit)
+    DB_FANOUT_PER_REQUEST: int = 4
+
+    # Connection pool
+    DB_POOL_SIZE: int = 5
+    DB_POOL_MAX_OVERFLOW: int = 10
+    # อายุสูงสุดของ connection (วินาที) -1 = ไม่จำกัด
+    DB_POOL_RECYCLE: int = 1800
+    # เวลารอ connection ว่างจาก pool ก่อน error (วินาที)
+    DB_POOL_TIMEOUT: int = 30
+    # always = ตรวจทุกครั้งที่ยืม, idle = ตรวจเฉพาะ connection ที่ว่างเกิน DB_POOL_PRE_PING_IDLE_SECONDS, never = ไม่ตรวจ
+    DB_POOL_PRE_PING: Literal["always", "idle", "never"] = "idle"
+    DB_POOL_PRE_PING_IDLE_SECONDS: int = 60
+    # จำนวน connection ที่เปิดไว้ใน pool ตอน start (ไม่เกิน pool size) 0 = ไม่ warm-up
+    DB_POOL_WARMUP: int = 2
+    # เวลารอ warm-up และ preload ข้อมูลอ้างอิงสูงสุด (วินาที ต่อขั้น) DB ไม่ตอบก็ start ต่อได้
+    DB_POOL_WARMUP_TIMEOUT: int = 10
+    # จำนวน connection รวมทุก worker ที่ยอมให้เปิดไปยัง DB โรงพยาบาล
+    # แต่ละ worker ได้ pool_size + max_overflow ไม่เกิน DB_MAX_CONNECTIONS / SERVER_WORKERS (0 = ไม่จำกัด ใช้ค่า pool ข้างบนต่อ worker)
+    DB_MAX_CONNECTIONS: int = 0
+
+    # Read replica (ไม่บังคับ) สำหรับงานรายงาน /stroke/* และ /rti/* (HIE ใช้ primary เสมอ)
+    # กำหนด REPLICA_DB_HOST (ค่าอื่นที่เว้นไว้ใช้ของ primary) หรือ REPLICA_DB_URL
+    REPLICA_DB_HOST: Optional[str] = None
+    REPLICA_DB_PORT: Optional[int] = None
+    REPLICA_DB_USER: Optional[str] = None
+    REPLICA_DB_PASS: Optional[str] = None
+    REPLICA_DB_NAME: Optional[str] = None
+    REPLICA_DB_URL: Optional[str] = None
+    # ตรวจสุขภาพ replica ทุกกี่วินาที / เวลารอคำตอบสูงสุด (วินาที) ไม่ผ่าน -> ใช้ primary จนกว่าจะกลับมา
+    REPLICA_CHECK_SECONDS: int = 15
+    REPLICA_CHECK_TIMEOUT: int = 5
+    # SQL ที่คืนค่าเดียว (datetime หรือตัวเลขวินาที) รันทั้ง primary และ replica แล้วเทียบเป็น lag
+    # เช่น SELECT MAX(CAST(vstdate AS datetime) + CAST(vsttime AS datetime)) FROM ovst  (เว้นไว้ = ไม่ตรวจ lag)
+    REPLICA_LAG_SQL: Optional[str] = None
+    # lag เกินกี่วินาทีถือว่าตามไม่ทัน -> ใช้ primary
+    REPLICA_MAX_LAG_SECONDS: int = 300
+
+    # Server launcher (python -m app.server)
+    SERVER_HOST: str = "0.0.0.0"
+    # จำนวน worker process (0 = เท่าจำนวน CPU)
+    SERVER_WORKERS: int = 1
+    # auto = uvloop / httptools ถ้าติดตั้งไว้ (uvicorn[standard]) ไม่มีก็ใช้ asyncio / h11
+    SERVER_LOOP: Literal["auto", "uvloop", "asyncio"] = "auto"
+    SERVER_HTTP: Literal["auto", "httptools", "h11"] = "auto"
+    # เวลาคง connection keep-alive ที่ว่างไว้ (วินาที) ผู้เรียกที่ poll ถี่ไม่ต้อง handshake ใหม่
+    SERVER_KEEPALIVE_SECONDS: int = 5
+    # เวลารอ request ที่ค้างอยู่ให้จบก่อนปิด worker ตอน stop / deploy (วินาที)
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SERVER_BACKLOG: int = 2048
+    SERVER_ACCESS_LOG: bool = True
+
+    # รอบเก็บค่า CPU / memory / disk / สถานะ DB ของ /monitor/performance, /monitor/full-check (วินาที)
+    MONITOR_SAMPLE_SECONDS: int = 10
+    # เวลารอ SELECT @@VERSION ของ sampler ก่อนถือว่า DB ไม่ตอบ (วินาที)
+    MONITOR_DB_CHECK_TIMEOUT: int = 5
+
+    # Slow-query log (/monitor/slow-queries)
+    # statement ที่ใช้เวลาเกินค่านี้ (ms) จะถูกเก็บใน ring buffer
+    SLOW_QUERY_THRESHOLD_MS: int = 500
+    # จำนวน statement ช้าล่าสุดที่เก็บไว้
+    SLOW_QUERY_LOG_SIZE: int = 200
+    # จำนวน fingerprint (รูปแบบ SQL) สูงสุดที่เก็บสถิติ
+    SLOW_QUERY_MAX_FINGERPRINTS: int = 500
+
+    # Admission control ของ /hie, /stroke, /rti (ต่อ worker) เกินแล้วตอบ 429 / 503 + Retry-After ทันที
+    ADMISSION_ENABLED: bool = True
+    # request ที่ทำงานพร้อมกันรวมทุก group (0 = ขนาด pool + overflow - DB_FANOUT_PER_REQUEST)
+    ADMISSION_MAX_CONCURRENT: int = 0
+    # จำนวน request ที่รอคิวได้ และเวลารอคิวสูงสุด (วินาที) เกินแล้วตอบ 503
+    ADMISSION_QUEUE_SIZE: int = 50
+    ADMISSION_QUEUE_TIMEOUT: float = 5.0
+    # Retry-After (วินาที) ของ 503
+    ADMISSION_RETRY_AFTER_SECONDS: int = 2
+    # rate limit ต่อ IP ผู้เรียก (token bucket): request ต่อวินาที / burst, 0 = ไม่จำกัด
+    RATE_LIMIT_HIE_PER_SECOND: float = 50
+    RATE_LIMIT_HIE_BURST: int = 100
+    RATE_LIMIT_STROKE_PER_SECOND: float = 2
+    RATE_LIMIT_STROKE_BURST: int = 10
+    RATE_LIMIT_RTI_PER_SECOND: float = 5
+    RATE_LIMIT_RTI_BURST: int = 20
+    # จำนวน IP สูงสุดที่จำ bucket ไว้
+    RATE_LIMIT_MAX_CLIENTS: int = 10000
+    # proxy ที่เชื่อ X-Forwarded-For (IP หรือ CIDR คั่นด้วย ,) rate limit และ IP allowlist ใช้ IP จาก XFF เฉพาะเมื่อ peer เป็น proxy เหล่านี้
+    # รันใน docker หลัง Apache/Nginx บนเครื่องเดียวกัน: ใส่ gateway ของ docker network เช่น 172.17.0.1
+    TRUSTED_PROXIES: str = "127.0.0.1,::1"
+    # request ที่ทำงานพร้อมกันต่อ group (0 = จำกัดแค่ค่ารวม)
+    CONCURRENCY_HIE: int = 0
+    CONCURRENCY_STROKE: int = 2
+    CONCURRENCY_RTI: int = 2
+
+    # เวลาสูงสุดต่อ request (วินาที) ของแต่ละ group เกินแล้วยกเลิก query ใน DB และตอบ 504, 0 = ไม่จำกัด
+    # (ODBC ใช้เป็น query timeout ของ driver ด้วย)
+    REQUEST_DEADLINE_HIE: float = 15
+    REQUEST_DEADLINE_STROKE: float = 120
+    REQUEST_DEADLINE_RTI: float = 120
+
+    # จำนวน visit สูงสุดต่อ 1 request ของ /hie/visits/batch
+    HIE_BATCH_MAX_VISITS: int = 100
+
+    # cache อายุสั้นของ /hie/patient และ /hie/service ตาม cid (วินาที) 0 = ไม่ cache
+    HIE_CACHE_TTL: int = 30
+    # จำนวนรายการสูงสุดต่อ cache (เกินแล้วทิ้งตัวที่ไม่ได้ใช้นานสุด)
+    HIE_CACHE_MAX_ENTRIES: int = 1000
+
+    # ส่ง header Server-Timing (เวลา security / db / convert / serialize) กลับไปกับทุก response
+    SERVER_TIMING: bool = True
+
+    # คืน response ของ endpoint รายการขนาดใหญ่ด้วย fast JSON (orjson) ไม่ validate กับ response_model ซ้ำ
+    FAST_JSON_RESPONSE: bool = True
+
+    # โหมดช่วงวันที่ (date_from / date_to) ของ /stroke/*: จำนวนวันสูงสุด และจำนวนวันที่ query พร้อมกัน
+    DATE_RANGE_MAX_DAYS: int = 31
+    DATE_RANGE_PARALLELISM: int = 4
+
+    # limit สูงสุดต่อหน้าของ keyset pagination (/rti/accident, /stroke/*)
+    PAGE_MAX_LIMIT: int = 5000
+
+    # จำนวน row ต่อ chunk ของโหมด streaming (Accept: application/x-ndjson)
+    STREAM_CHUNK_SIZE: int = 500
+
+    # อายุ cache ของ /rti/place (วินาที) ตั้ง 0 เพื่อปิด cache
+    RTI_PLACE_CACHE_TTL: int = 3600
+
+    # รอบการโหลดตาราง thaiaddress เข้าหน่วยความจำใหม่ (วินาที)
+    THAIADDRESS_REFRESH_SECONDS: int = 86400
+
+    # รอบการโหลดตารางรหัส (doctor, pttype, icd101, ...) เข้าหน่วยความจำใหม่ใน background (วินาที)
+    DIMENSION_REFRESH_SECONDS: int = 3600
+
     class Config:
         env_file = ".env"
 
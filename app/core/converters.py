@@ -0,0 +1,112 @@
+# app/core/converters.py
+#
+# แปลง row จากฐานข้อมูล -> dict ของ item model แบบประกาศด้วย spec
+# spec ถูก compile เป็นฟังก์ชัน Python จริงครั้งเดียว (ไม่มี loop/if ต่อ field ตอนแปลง)
+# และแปลงทั้ง batch ด้วย index ของคอลัมน์แทนการค้นด้วยชื่อทีละ field
+#
+# spec = [(field, kind), (field, kind, column), (field, kind, column, via), ...]
+#   column  ชื่อคอลัมน์ใน row (ไม่ระบุ = ชื่อเดียวกับ field)
+#   via     ฟังก์ชันแปลงค่าก่อน format เช่น ค้นชื่อจาก dimension cache
+#
+# kind:
+#   "str"          str(v)
+#   "str_or_none"  str(v) if v else None
+#   "str_if_str"   str(v) if str(v) else None   (รูปแบบเดิมของ HIE: None -> "None")
+#   "or_none"      v if v else None
+#   "if_str"       v if str(v) else None
+#   "isoformat"    v.isoformat() if v else None
+#   "raw"          v
+
+from app.core import timing
+
+KINDS = {
+    "str": "str({v})",
+    "str_or_none": "(str({v}) if {v} else None)",
+    "str_if_str": "(_s if (_s := str({v})) else None)",
+    "or_none": "({v} if {v} else None)",
+    "if_str": "({v} if str({v}) else None)",
+    "isoformat": "({v}.isoformat() if {v} else None)",
+    "raw": "{v}",
+}
+
+
+def spec_from_model(model, kind: str = "str_or_none", overrides: dict = None) -> list:
+    # สร้าง spec จาก field ของ Pydantic model (ลำดับตาม model)
+    overrides = overrides or {}
+    return [(field, overrides.get(field, kind)) for field in model.model_fields]
+
+
+def _compile(spec: list, name: str, positions: dict = None, width: int = 0):
+    # positions = None -> อ่าน row ด้วยชื่อคอลัมน์
+    # positions = {column: index} -> unpack row (tuple) ทั้งแถวเป็นตัวแปร local ครั้งเดียว
+    namespace = {}
+    lines = [f"def {name}(row):"]
+    if positions is not None:
+        used = {positions[(e[2] if len(e) > 2 and e[2] else e[0])] for e in spec}
+        targets = [f"_c{i}" if i in used else "_" for i in range(width)]
+        lines.append(f"    {', '.join(targets)}, = row")
+
+    items = []
+    for i, entry in enumerate(spec):
+        field, kind = entry[0], entry[1]
+        column = entry[2] if len(entry) > 2 and entry[2] else field
+        via = entry[3] if len(entry) > 3 else None
+
+        access = f"_c{positions[column]}" if positions is not None else f"row[{column!r}]"
+        if via is not None:
+            namespace[f"_via{i}"] = via
+            access = f"_via{i}({access})"
+
+        if KINDS[kind].count("{v}") > 1 and (via is not None or positions is None):
+            # อ่าน/แปลงค่าครั้งเดียวแล้วใช้ซ้ำ
+            lines.append(f"    _v{i} = {access}")
+            access = f"_v{i}"
+        items.append(f"        {field!r}: {KINDS[kind].format(v=access)},")
+
+    lines.append("    return {")
+    lines.extend(items)
+    lines.append("    }")
+    exec("\n".join(lines), namespace)
+    return namespace[name]
+
+
+class RowConverter:
+    def __init__(self, spec: list, name: str = "convert"):
+        for entry in spec:
+            if entry[1] not in KINDS:
+                raise ValueError(f"unknown converter kind {entry[1]!r} for field {entry[0]!r}")
+        self.spec = spec
+        self.name = name
+        self.columns = [entry[2] if len(entry) > 2 and entry[2] else entry[0] for entry in spec]
+        self._by_name = _compile(spec, name)
+        # cache ของตัวแปลงแบบ index ตามชุดคอลัมน์ของผลลัพธ์ (ปกติ 1 ชุดต่อ query)
+        self._by_position = {}
+
+    def __call__(self, row) -> dict:
+        # แปลงทีละ row (row แบบ mapping)
+        return self._by_name(row)
+
+    def for_keys(self, keys):
+        keys = tuple(keys)
+        convert = self._by_position.get(keys)
+        if convert is None:
+            positions = {}
+            for i, key in enumerate(keys):
+                # ชื่อคอลัมน์ซ้ำ (เช่น SELECT *, x) ใช้ตัวแรก
+                positions.setdefault(key, i)
+            missing = [c for c in self.columns if c not in positions]
+            if missing:
+                raise KeyError(f"{self.name}: columns not in result: {missing}")
+            convert = _compile(self.spec, self.name, positions, len(keys))
+            self._by_position[keys] = convert
+        return convert
+
+    def convert_batch(self, rows, keys) -> list:
+        # rows = Row (tuple-like) ของผลลัพธ์เดียวกัน keys = result.keys()
+        convert = self.for_keys(keys)
+        with timing.phase("convert"):
+            return [convert(row) for row in rows]
+
+    def convert_all(self, result) -> list:
+        # result = Result ของ SQLAlchemy (ยังไม่เรียก .mappings())
+        return self.convert_batch(result.all(), result.keys())
@@ -1,34 +1,128 @@
+import asyncio
+import os
+
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.pool import InstrumentedQueuePool, enable_idle_pre_ping, worker_pool_limits
+from app.core.timing import instrument_engine
+from app.core import slow_queries, deadline
 
 # สำหรับ MS SQL Server (Async) เราจะใช้ mssql+aioodbc
 # ต้องทำการ format connection string สำหรับ ODBC
-connection_string = (
-    f"DRIVER={{{settings.DB_DRIVER}}};"
-    f"SERVER={settings.DB_HOST},{settings.DB_PORT};"
-    f"DATABASE={settings.DB_NAME};"
-    f"UID={settings.DB_USER};"
-    f"PWD={settings.DB_PASS};"
+def _odbc_url(host: str, port: int, name: str, user: str, password: str) -> str:
+    connection_string = (
+        f"DRIVER={{{settings.DB_DRIVER}}};"
+        f"SERVER={host},{port};"
+        f"DATABASE={name};"
+        f"UID={user};"
+        f"PWD={password};"
+    )
+    #f"TrustServerCertificate=yes;" # สำคัญสำหรับ ODBC Driver 18
+    return f"mssql+aioodbc:///?odbc_connect={connection_string}"
+
+
+# สร้าง DATABASE_URL สำหรับ aioodbc (DB_URL ใน .env ใช้แทนได้ เช่น ตอน benchmark กับฐานข้อมูลจำลอง)
+DATABASE_URL = settings.DB_URL or _odbc_url(
+    settings.DB_HOST, settings.DB_PORT, settings.DB_NAME, settings.DB_USER, settings.DB_PASS,
 )
-#f"TrustServerCertificate=yes;" # สำคัญสำหรับ ODBC Driver 18
 
-# สร้าง DATABASE_URL สำหรับ aioodbc
-DATABASE_URL = f"mssql+aioodbc:///?odbc_connect={connection_string}"
+# Read replica (ไม่บังคับ) ค่าที่ไม่ได้กำหนดใช้ของ primary
+REPLICA_DATABASE_URL = settings.REPLICA_DB_URL or (
+    _odbc_url(
+        settings.REPLICA_DB_HOST,
+        settings.REPLICA_DB_PORT or settings.DB_PORT,
+        settings.REPLICA_DB_NAME or settings.DB_NAME,
+        settings.REPLICA_DB_USER or settings.DB_USER,
+        settings.REPLICA_DB_PASS or settings.DB_PASS,
+    )
+    if settings.REPLICA_DB_HOST else None
+)
 
-# สร้าง engine แบบ Async
-engine = create_async_engine(
-    DATABASE_URL, 
-    echo=False,
-    pool_pre_ping=True # ช่วยตรวจสอบ connection ก่อนใช้งาน ป้องกันปัญหาต่อไม่ติด
+# ขนาด pool ต่อ worker: ถ้ากำหนด DB_MAX_CONNECTIONS จะแบ่งให้ทุก worker (app/server.py) รวมกันไม่เกินค่านี้
+POOL_SIZE, POOL_MAX_OVERFLOW = worker_pool_limits(
+    settings.DB_POOL_SIZE,
+    settings.DB_POOL_MAX_OVERFLOW,
+    settings.DB_MAX_CONNECTIONS,
+    settings.SERVER_WORKERS or os.cpu_count() or 1,
 )
 
+
+def _create_engine(url: str):
+    # สร้าง engine แบบ Async
+    # ขนาด pool / overflow / recycle / timeout ปรับได้จาก .env
+    # pre-ping: always = ตรวจทุก checkout, idle = ตรวจเฉพาะ connection ที่ว่างนาน, never = ไม่ตรวจ
+    new_engine = create_async_engine(
+        url,
+        echo=False,
+        poolclass=InstrumentedQueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING == "always",
+    )
+    if settings.DB_POOL_PRE_PING == "idle":
+        enable_idle_pre_ping(new_engine, settings.DB_POOL_PRE_PING_IDLE_SECONDS)
+
+    # จับเวลา SQL ทุก statement เข้า Server-Timing / metrics ของ request
+    instrument_engine(new_engine)
+    # รวมเวลา SQL ตาม fingerprint เข้า slow-query log
+    slow_queries.instrument_engine(new_engine)
+    # deadline ต่อ request -> query timeout ของ driver + cancel statement เมื่อหมดเวลา/ผู้เรียกตัดการเชื่อมต่อ
+    deadline.instrument_engine(new_engine)
+    return new_engine
+
+
+engine = _create_engine(DATABASE_URL)
+
 async_session_factory = sessionmaker(
     bind=engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
+# งานรายงาน / ดึงข้อมูลจำนวนมาก (/stroke, /rti) เลือก factory ผ่าน app/core/replica.py
+replica_engine = _create_engine(REPLICA_DATABASE_URL) if REPLICA_DATABASE_URL else None
+replica_session_factory = sessionmaker(
+    bind=replica_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+) if replica_engine is not None else None
+
+
 async def get_db():
     async with async_session_factory() as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+# ---------------------------------------------------------
+# Fan-out: ยิงหลาย query พร้อมกัน แต่ละตัวใช้ connection แยกจาก pool
+# จำกัดจำนวนพร้อมกันต่อ 1 request ด้วย DB_FANOUT_PER_REQUEST เพื่อไม่ให้ pool หมด
+# ---------------------------------------------------------
+async def _fetch_mappings(semaphore: asyncio.Semaphore, sql, params: dict, session_factory):
+    async with semaphore:
+        async with session_factory() as session:
+            rows = await session.execute(sql, params)
+            return rows.mappings().all()
+
+
+async def fetch_concurrently(queries: dict, limit: int = None, session_factory=None,
+                             semaphore: asyncio.Semaphore = None) -> dict:
+    # queries = {"ชื่อ": (sql, params)} -> คืนค่า {"ชื่อ": [row, ...]}
+    # session_factory = ฐานข้อมูลที่ใช้ (ค่าเริ่มต้น primary) เช่น replica.reporting_sessions()
+    # semaphore = ใช้ร่วมกันหลายครั้งใน request เดียว (เช่น stroke หลายวัน) จำนวน connection รวมไม่เกินค่าเดียว
+    semaphore = semaphore or asyncio.Semaphore(limit or settings.DB_FANOUT_PER_REQUEST)
+    session_factory = session_factory or async_session_factory
+    tasks = {
+        name: asyncio.ensure_future(_fetch_mappings(semaphore, sql, params, session_factory))
+        for name, (sql, params) in queries.items()
+    }
+    try:
+        results = await asyncio.gather(*tasks.values())
+    except BaseException:
+        # query ใดล้มเหลว ยกเลิกตัวที่เหลือเพื่อคืน connection ให้ pool ทันที
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return dict(zip(tasks.keys(), results))
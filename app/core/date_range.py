@@ -0,0 +1,39 @@
+# app/core/date_range.py
+#
+# โหมดช่วงวันที่ (date_from / date_to) ของ endpoint ที่ query ทีละวัน
+# แบ่งช่วงเป็น partition รายวัน -> query แต่ละวันยิงพร้อมกันได้ (จำกัดด้วย DATE_RANGE_PARALLELISM)
+# แทนการให้ client เรียกทีละวันต่อกัน 30 ครั้งตอน backfill
+
+from datetime import date, timedelta
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+def _parse(value: str, field: str) -> date:
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {field} (YYYY-MM-DD)")
+
+
+def request_days(single: str, date_from: str, date_to: str, field: str) -> list:
+    # คืนรายการวัน (YYYY-MM-DD) ตามลำดับ: วันเดียว (field เดิม) หรือทุกวันใน date_from..date_to
+    if single and (date_from or date_to):
+        raise HTTPException(status_code=400, detail=f"Use either {field} or date_from/date_to")
+    if single:
+        return [single]
+    if not date_from or not date_to:
+        raise HTTPException(status_code=400, detail=f"{field} or date_from and date_to are required")
+
+    start, end = _parse(date_from, "date_from"), _parse(date_to, "date_to")
+    if end < start:
+        raise HTTPException(status_code=400, detail="date_to is before date_from")
+    count = (end - start).days + 1
+    if count > settings.DATE_RANGE_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Date range too long (max {settings.DATE_RANGE_MAX_DAYS} days)"
+        )
+    return [(start + timedelta(days=i)).isoformat() for i in range(count)]
@@ -0,0 +1,200 @@
+# app/core/deadline.py
+#
+# กำหนดเวลาสูงสุดต่อ request (ตาม group: /hie, /stroke, /rti) และยกเลิกงาน DB เมื่อผู้เรียกตัดการเชื่อมต่อ
+#   - ODBC (pyodbc): ตั้ง query timeout ของ connection ตามเวลาที่เหลือทุกครั้งที่ยืมจาก pool
+#     driver/SQL Server ตัด statement เองแม้ event loop จะไม่ได้รอแล้ว
+#   - ครบกำหนด -> ยกเลิก handler + สั่ง cancel statement ที่ค้างอยู่ (SQLCancel) ตอบ 504
+#   - ผู้เรียกตัดการเชื่อมต่อ (timeout ฝั่ง client / ยิงซ้ำ) -> ยกเลิกแบบเดียวกัน connection กลับเข้า pool ทันที
+# ใช้กับ router ด้วย APIRouter(route_class=CancellableRoute) (ต่อยอดจาก TimedRoute)
+# หมายเหตุ: โหมด NDJSON ทำงานต่อหลัง handler คืน response แล้ว จึงไม่อยู่ใต้ deadline นี้
+#           (StreamingResponse หยุดเองเมื่อผู้เรียกตัดการเชื่อมต่อ และ cancel query ที่เหลือใน finally)
+
+import asyncio
+import math
+from contextvars import ContextVar
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import Counter
+from app.core.timing import TimedRoute
+
+CANCELLED = Counter(
+    "agent_requests_cancelled_total", "จำนวน request ที่ถูกยกเลิกระหว่างทำงาน",
+    ("group", "reason"),
+)
+
+_DEADLINES = {
+    "hie": settings.REQUEST_DEADLINE_HIE,
+    "stroke": settings.REQUEST_DEADLINE_STROKE,
+    "rti": settings.REQUEST_DEADLINE_RTI,
+}
+_PREFIX = "/api/v1/"
+
+# เวลา (loop.time()) ที่ request ปัจจุบันต้องเสร็จ และ cursor ที่กำลัง execute อยู่ของ request นั้น
+_deadline = ContextVar("request_deadline", default=None)
+_active_cursors = ContextVar("request_active_cursors", default=None)
+
+
+def _group(path: str):
+    if not path.startswith(_PREFIX):
+        return None
+    return path[len(_PREFIX):].split("/", 1)[0]
+
+
+_warned = set()
+
+
+def _warn_once(message: str):
+    # attribute ภายในของ SQLAlchemy / aioodbc หายไป (อัปเกรด library) -> timeout/cancel ฝั่ง driver ไม่ทำงาน
+    # ต้องเห็นใน log ไม่ใช่เงียบ (query จะค้างบน HOSxP หลังตอบ 499/504)
+    if message not in _warned:
+        _warned.add(message)
+        print(f"deadline: {message}; query timeout/cancel on the ODBC driver is disabled", flush=True)
+
+
+def _odbc_connection(dbapi_connection):
+    # AdaptedConnection.driver_connection (public API ของ SQLAlchemy) = aioodbc Connection
+    # aioodbc ไม่มี API สาธารณะสำหรับตั้ง timeout จึงต้องใช้ pyodbc Connection ข้างใน (_conn)
+    driver = getattr(dbapi_connection, "driver_connection", None)
+    odbc = getattr(driver, "_conn", None)
+    if odbc is None or not hasattr(odbc, "timeout"):
+        _warn_once("pyodbc connection not found at driver_connection._conn")
+        return None
+    return odbc
+
+
+def _pyodbc_cursor(cursor):
+    # SQLAlchemy aioodbc cursor -> aioodbc Cursor -> pyodbc Cursor (ทั้งสองชั้นไม่มี API สาธารณะ)
+    impl = getattr(getattr(cursor, "_cursor", None), "_impl", None)
+    if impl is None or not hasattr(impl, "cancel"):
+        _warn_once("pyodbc cursor not found at cursor._cursor._impl")
+        return None
+    return impl
+
+
+def _cancel_cursor(cursor):
+    # cancel() ของ pyodbc เรียกข้าม thread ได้
+    impl = _pyodbc_cursor(cursor)
+    if impl is None:
+        return
+    try:
+        impl.cancel()
+    except Exception as e:
+        print(f"cancel statement failed: {e}")
+
+
+def _instrument_odbc_timeout(sync_engine):
+    @event.listens_for(sync_engine.pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        deadline = _deadline.get()
+        odbc = _odbc_connection(dbapi_connection)
+        if deadline is None or odbc is None:
+            return
+        remaining = deadline - asyncio.get_running_loop().time()
+        # query timeout ของ pyodbc เป็นวินาทีเต็ม (0 = ไม่จำกัด)
+        odbc.timeout = max(math.ceil(remaining), 1)
+        connection_record.info["deadline_timeout"] = True
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        if connection_record.info.pop("deadline_timeout", False):
+            odbc = _odbc_connection(dbapi_connection)
+            if odbc is not None:
+                odbc.timeout = 0
+
+
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+    # driver อื่น (เช่น SQLite ของ benchmarks/) ไม่มี query timeout / SQLCancel ใช้แค่การยกเลิกฝั่ง asyncio
+    odbc = sync_engine.dialect.driver == "aioodbc"
+    if odbc:
+        _instrument_odbc_timeout(sync_engine)
+
+    # active = {cursor: ยกเลิกผ่าน pyodbc ได้หรือไม่}
+    verified = False
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        nonlocal verified
+        if odbc and not verified:
+            # ตรวจ attribute ภายในตั้งแต่ statement แรก (ไม่รอจนต้อง cancel จริงถึงรู้ว่าใช้ไม่ได้)
+            verified = True
+            _pyodbc_cursor(cursor)
+        active = _active_cursors.get()
+        if active is not None:
+            active[cursor] = odbc
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        active = _active_cursors.get()
+        if active is not None:
+            active.pop(cursor, None)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(exception_context):
+        active = _active_cursors.get()
+        if active is not None and exception_context.cursor is not None:
+            active.pop(exception_context.cursor, None)
+
+
+async def _wait_disconnect(request):
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def _run(handler, request, seconds: float, active: dict):
+    if seconds:
+        _deadline.set(asyncio.get_running_loop().time() + seconds)
+    _active_cursors.set(active)
+    return await handler(request)
+
+
+class CancellableRoute(TimedRoute):
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def cancellable_handler(request):
+            group = _group(request.scope["path"])
+            seconds = _DEADLINES.get(group) or 0
+            # อ่าน body ก่อน (FastAPI ใช้ค่าที่ cache ไว้) ข้อความถัดไปจาก receive จึงเป็น http.disconnect เท่านั้น
+            await request.body()
+
+            active = {}
+            task = asyncio.ensure_future(_run(handler, request, seconds, active))
+            watcher = asyncio.ensure_future(_wait_disconnect(request))
+            try:
+                done, _ = await asyncio.wait(
+                    {task, watcher}, timeout=seconds or None, return_when=asyncio.FIRST_COMPLETED,
+                )
+            except BaseException:
+                task.cancel()
+                raise
+            finally:
+                watcher.cancel()
+
+            if task in done:
+                return task.result()
+
+            # ครบกำหนด / ผู้เรียกไปแล้ว: หยุด statement ที่ค้างใน driver แล้วยกเลิก handler
+            for cursor, cancellable in list(active.items()):
+                if cancellable:
+                    _cancel_cursor(cursor)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+            if watcher in done:
+                CANCELLED.inc((group or "other", "client_disconnect"))
+                # ไม่มีใครรับแล้ว 499 ไว้ให้ metrics / log แยกออกจาก error จริง
+                return Response(status_code=499)
+            CANCELLED.inc((group or "other", "deadline"))
+            raise HTTPException(
+                status_code=504,
+                detail=f"Request exceeded {seconds:g}s deadline"
+            )
+
+        return cancellable_handler
@@ -0,0 +1,134 @@
+# app/core/dimensions.py
+#
+# Dimension cache: ตารางรหัสขนาดเล็กของ HOSxP (doctor, pttype, icd101, ...) โหลดเข้าหน่วยความจำ
+# ตอน startup และรีเฟรชใน background ทุก DIMENSION_REFRESH_SECONDS (thaiaddress ทุก THAIADDRESS_REFRESH_SECONDS)
+# query ของ endpoint จึงดึงเฉพาะ fact rows (รหัส) แล้วแปลงเป็นชื่อจาก cache นี้
+# แทนการ join ตารางรหัสซ้ำในทุก request
+
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import fetch_concurrently
+from app.core import thaiaddress
+
+# ตาราง -> SQL (คอลัมน์แรกคือรหัส คอลัมน์ถัดไปคือค่าที่ต้องการ)
+DIMENSION_SQL = {
+    "doctor": text("SELECT code, name FROM doctor"),
+    "pttype": text("SELECT pttype, name FROM pttype"),
+    "icd101": text("SELECT code, code3, tname, name FROM icd101"),
+    "spclty": text("SELECT spclty, name FROM spclty"),
+    "ovstist": text("SELECT ovstist, name FROM ovstist"),
+    "ovstost": text("SELECT ovstost, name FROM ovstost"),
+    "ward": text("SELECT ward, name FROM ward"),
+    "dchtype": text("SELECT dchtype, name FROM dchtype"),
+    "dchstts": text("SELECT dchstts, name FROM dchstts"),
+    "er_oper_code": text("SELECT er_oper_code, name FROM er_oper_code"),
+    "ipt_oper_code": text("SELECT ipt_oper_code, name FROM ipt_oper_code"),
+    "drugusage": text("SELECT drugusage, shortlist FROM drugusage"),
+    "opdconfig": text("SELECT hospitalname FROM opdconfig"),
+}
+
+_maps = {}
+_hospitalname = None
+_loaded_at = 0.0
+_lock = asyncio.Lock()
+
+_ICD101_EMPTY = (None, None, None)
+
+
+def _key(code):
+    # CHAR ที่ถูก pad ด้วยช่องว่าง SQL เทียบเท่ากัน แต่ dict ไม่ จึงตัดช่องว่างท้ายออก
+    return code.rstrip() if isinstance(code, str) else code
+
+
+async def refresh():
+    global _maps, _hospitalname, _loaded_at
+
+    rows = await fetch_concurrently({name: (sql, {}) for name, sql in DIMENSION_SQL.items()})
+
+    maps = {}
+    for name, result in rows.items():
+        if name == "opdconfig":
+            continue
+        values = [tuple(r.values()) for r in result]
+        if name == "icd101":
+            maps[name] = {_key(r[0]): r[1:] for r in values}
+        else:
+            maps[name] = {_key(r[0]): r[1] for r in values}
+
+    # สลับทั้งชุดพร้อมกัน request ที่กำลังอ่านจะไม่เห็นข้อมูลครึ่งๆ กลางๆ
+    _maps = maps
+    _hospitalname = rows["opdconfig"][0]["hospitalname"] if rows["opdconfig"] else None
+    _loaded_at = time.monotonic()
+
+
+def _is_fresh() -> bool:
+    return bool(_maps) and time.monotonic() - _loaded_at < settings.DIMENSION_REFRESH_SECONDS * 2
+
+
+async def ensure_loaded():
+    # ปกติ background task รีเฟรชให้ก่อนหมดอายุ ตรงนี้เป็นทางสำรองกรณียังไม่เคยโหลด/task หยุดไป
+    if _is_fresh():
+        return
+
+    async with _lock:
+        if _is_fresh():
+            return
+        try:
+            await refresh()
+        except Exception as e:
+            if not _maps:
+                raise
+            print(f"dimension refresh failed, keep previous cache: {e}")
+
+
+async def _refresh_every(seconds: int, loader):
+    while True:
+        await asyncio.sleep(seconds)
+        try:
+            await loader()
+        except Exception as e:
+            print(f"reference data refresh failed ({loader.__module__}): {e}")
+
+
+async def refresh_loop():
+    # รีเฟรชข้อมูลอ้างอิงเป็นรอบๆ แต่ละชุดตามรอบของตัวเอง
+    # dimension ทุก DIMENSION_REFRESH_SECONDS, thaiaddress (ตารางใหญ่ แทบไม่เปลี่ยน) ทุก THAIADDRESS_REFRESH_SECONDS
+    await asyncio.gather(
+        _refresh_every(settings.DIMENSION_REFRESH_SECONDS, refresh),
+        _refresh_every(settings.THAIADDRESS_REFRESH_SECONDS, thaiaddress.refresh),
+    )
+
+
+# ---------------------------------------------------------
+# lookup (เรียกหลัง ensure_loaded แล้ว)
+# ---------------------------------------------------------
+def name(table: str, code):
+    if code is None:
+        return None
+    return _maps.get(table, {}).get(_key(code))
+
+
+def icd101(code) -> tuple:
+    # คืนค่า (code3, tname, name) หรือ (None, None, None) ถ้าไม่พบ
+    if code is None:
+        return _ICD101_EMPTY
+    return _maps.get("icd101", {}).get(_key(code), _ICD101_EMPTY)
+
+
+def has_icd101(code) -> bool:
+    return code is not None and _key(code) in _maps.get("icd101", {})
+
+
+def hospitalname():
+    return _hospitalname
+
+
+def stats() -> dict:
+    return {
+        "tables": {table: len(values) for table, values in _maps.items()},
+        "age_seconds": round(time.monotonic() - _loaded_at, 1) if _maps else None,
+    }
@@ -0,0 +1,83 @@
+# app/core/pagination.py
+#
+# Keyset pagination (เปิดใช้เมื่อ client ส่ง limit)
+# cursor = ค่าคีย์เรียงลำดับของแถวสุดท้ายในหน้าก่อน (base64 ของ JSON) -> หน้าถัดไปใช้ WHERE แทน OFFSET
+# ทุกหน้าจึงใช้เวลาเท่ากันไม่ว่าจะลึกแค่ไหน (OFFSET ต้องอ่านแถวก่อนหน้าทิ้งทั้งหมด)
+#
+# keys = [(column_ใน_SQL, column_ในผลลัพธ์, "ASC" | "DESC"), ...]  คีย์สุดท้ายต้องทำให้ลำดับไม่ซ้ำ
+
+import base64
+import json
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+
+
+def check_limit(limit: int):
+    if limit is not None and limit > settings.PAGE_MAX_LIMIT:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit too large (max {settings.PAGE_MAX_LIMIT})"
+        )
+
+
+def _plain(value):
+    return value if isinstance(value, (str, int, float)) or value is None else str(value)
+
+
+def encode_cursor(values: list) -> str:
+    raw = json.dumps([_plain(v) for v in values], separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def order_sql(keys: list) -> str:
+    # ใช้ลำดับเดียวกันทั้งแบบแบ่งหน้าและไม่แบ่งหน้า -> ต่อทุกหน้าแล้วได้ลำดับเดียวกับดึงทีเดียว
+    return "ORDER BY " + ", ".join(f"{column} {direction}" for column, _, direction in keys)
+
+
+def keyset_sql(keys: list, cursor: str, params: dict) -> tuple:
+    # คืนค่า (เงื่อนไข "AND ..." สำหรับ WHERE, "ORDER BY ...") และเติม parameter ของ cursor ลงใน params
+    order_by = order_sql(keys)
+    if not cursor:
+        return "", order_by
+
+    values = decode_cursor(cursor, len(keys))
+    # (a, b, c) > (x, y, z) เขียนแบบขยาย เพราะ row value comparison ใช้ไม่ได้ทุกฐานข้อมูล
+    condition = None
+    for i in reversed(range(len(keys))):
+        column, _, direction = keys[i]
+        op = "<" if direction == "DESC" else ">"
+        params[f"_cursor{i}"] = values[i]
+        step = f"{column} {op} :_cursor{i}"
+        if condition is not None:
+            step = f"({step} OR ({column} = :_cursor{i} AND {condition}))"
+        condition = step
+    return f"AND {condition}", order_by
+
+
+def limit_sql(limit: int, params: dict) -> str:
+    # ขอเกิน 1 แถวเพื่อรู้ว่ามีหน้าถัดไปหรือไม่
+    params["_limit"] = limit + 1
+    return "LIMIT :_limit"
+
+
+def split_page(rows: list, keys: list, limit: int) -> tuple:
+    # คืนค่า (แถวของหน้านี้, next_cursor หรือ None ถ้าเป็นหน้าสุดท้าย)
+    # rows เป็น Row หรือ RowMapping ก็ได้
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = getattr(rows[-1], "_mapping", rows[-1])
+    return rows, encode_cursor([last[name] for _, name, _ in keys])
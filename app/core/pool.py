@@ -0,0 +1,98 @@
+# app/core/pool.py
+#
+# Connection pool ที่เก็บสถิติการรอ connection (pool starvation)
+# ใช้ดูว่า p99 ที่สูงมาจาก DB ช้า หรือมาจาก request รอคิว connection ใน pool (/monitor/pool)
+
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        self.wait_time_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        self.checkouts += 1
+
+        # ไม่มี connection ว่างและ overflow เต็มแล้ว -> ต้องรอคิว
+        must_wait = (
+            self._pool.empty()
+            and self._max_overflow > -1
+            and self._overflow >= self._max_overflow
+        )
+        if not must_wait:
+            return super()._do_get()
+
+        self.waits += 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            self.wait_time += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.size(),
+            "checked_out": self.checkedout(),
+            "idle": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "timeout": self._timeout,
+            "recycle": self._recycle,
+            "checkouts": self.checkouts,
+            "waits": self.waits,
+            "timeouts": self.timeouts,
+            "wait_time_total_ms": round(self.wait_time * 1000, 2),
+            "wait_time_avg_ms": round(self.wait_time * 1000 / self.waits, 2) if self.waits else 0.0,
+            "wait_time_max_ms": round(self.wait_time_max * 1000, 2),
+        }
+
+
+def enable_idle_pre_ping(engine, idle_seconds: int):
+    # pre-ping เฉพาะ connection ที่ว่างนานเกิน idle_seconds
+    # connection ที่เพิ่งคืนมาไม่ต้องเสีย round trip "SELECT 1" ทุกครั้งที่ checkout
+    sync_engine = engine.sync_engine
+
+    @event.listens_for(sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["checked_in_at"] = time.monotonic()
+
+    @event.listens_for(sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_in_at = connection_record.info.get("checked_in_at")
+        if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+            return
+
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+        except Exception as e:
+            # ให้ pool ทิ้ง connection นี้แล้วเปิดใหม่
+            raise exc.DisconnectionError(f"idle connection is dead: {e}")
+        finally:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+
+
+def worker_pool_limits(pool_size: int, max_overflow: int, max_connections: int, workers: int) -> tuple:
+    # แบ่ง DB_MAX_CONNECTIONS ให้ทุก worker เท่ากัน: pool_size + max_overflow ต่อ worker ไม่เกินส่วนแบ่ง
+    # คืนค่า (pool_size, max_overflow) ของ worker นี้
+    if max_connections <= 0:
+        return pool_size, max_overflow
+    share = max(max_connections // max(workers, 1), 1)
+    size = min(pool_size, share)
+    return size, max(min(max_overflow, share - size), 0)
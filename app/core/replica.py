@@ -0,0 +1,140 @@
+# app/core/replica.py
+#
+# เลือกฐานข้อมูลสำหรับงานรายงาน (/stroke/*, /rti/*): read replica ถ้าตั้งไว้และพร้อม ไม่งั้น primary
+#   - HIE (ข้อมูลรายคน ต้องเป็นปัจจุบัน) ใช้ primary เสมอ ไม่ผ่านโมดูลนี้
+#   - health_loop ตรวจ replica ทุก REPLICA_CHECK_SECONDS: ต่อไม่ได้ / ตอบช้าเกิน REPLICA_CHECK_TIMEOUT
+#     / lag (REPLICA_LAG_SQL) เกิน REPLICA_MAX_LAG_SECONDS -> ใช้ primary จนกว่าจะตรวจผ่านอีกครั้ง
+#   - connection ของ replica หลุดระหว่าง query -> ใช้ primary ทันที ไม่ต้องรอรอบตรวจถัดไป
+# สถานะดูได้ที่ /monitor/replica
+
+import asyncio
+import time
+from datetime import datetime
+
+from sqlalchemy import event, text
+
+from app.core.config import settings
+from app.core.database import async_session_factory, replica_engine, replica_session_factory
+from app.core.metrics import Counter
+
+ROUTED = Counter(
+    "agent_reporting_sessions_total", "จำนวน session ของงานรายงาน แยกตามฐานข้อมูลที่ใช้",
+    ("target",),
+)
+
+_state = {
+    "configured": replica_engine is not None,
+    # ยังไม่ได้ตรวจ = ยังไม่ใช้ (startup.start ตรวจรอบแรกก่อนรับ request)
+    "healthy": False,
+    "reason": None if replica_engine is not None else "not configured",
+    "lag_seconds": None,
+    "check_ms": None,
+    "checked_at": None,
+    "failovers": 0,
+}
+
+
+def _mark_down(reason: str):
+    if _state["healthy"]:
+        _state["failovers"] += 1
+        print(f"Replica unavailable, reporting queries use primary: {reason}")
+    _state["healthy"] = False
+    _state["reason"] = reason
+
+
+if replica_engine is not None:
+    @event.listens_for(replica_engine.sync_engine, "handle_error")
+    def _on_error(exception_context):
+        if exception_context.is_disconnect:
+            _mark_down(f"disconnect: {exception_context.original_exception}")
+
+
+def use_replica() -> bool:
+    return _state["healthy"]
+
+
+def reporting_sessions():
+    # session_factory สำหรับงานรายงาน (เลือกตอนเริ่ม request ทั้ง request ใช้ฐานเดียวกัน)
+    if use_replica():
+        ROUTED.inc(("replica",))
+        return replica_session_factory
+    ROUTED.inc(("primary",))
+    return async_session_factory
+
+
+# Dependency สำหรับ router งานรายงาน (แทน get_db)
+async def get_reporting_db():
+    async with reporting_sessions()() as session:
+        yield session
+
+
+async def _scalar(session_factory, sql: str):
+    async with session_factory() as session:
+        return (await session.execute(text(sql))).scalar()
+
+
+def _lag_seconds(primary, replica) -> float:
+    if primary is None or replica is None:
+        return 0.0
+    if isinstance(primary, str):
+        primary, replica = datetime.fromisoformat(primary), datetime.fromisoformat(replica)
+    lag = primary - replica
+    lag = lag.total_seconds() if hasattr(lag, "total_seconds") else float(lag)
+    return max(lag, 0.0)
+
+
+async def _probe():
+    if not settings.REPLICA_LAG_SQL:
+        await _scalar(replica_session_factory, "SELECT 1")
+        return None
+    primary, replica = await asyncio.gather(
+        _scalar(async_session_factory, settings.REPLICA_LAG_SQL),
+        _scalar(replica_session_factory, settings.REPLICA_LAG_SQL),
+    )
+    return _lag_seconds(primary, replica)
+
+
+async def check() -> dict:
+    if replica_engine is None:
+        return _state
+    started = time.perf_counter()
+    try:
+        lag = await asyncio.wait_for(_probe(), timeout=settings.REPLICA_CHECK_TIMEOUT)
+    except asyncio.TimeoutError:
+        _mark_down(f"timeout after {settings.REPLICA_CHECK_TIMEOUT}s")
+    except Exception as e:
+        _mark_down(str(e))
+    else:
+        _state["lag_seconds"] = round(lag, 1) if lag is not None else None
+        if lag is not None and lag > settings.REPLICA_MAX_LAG_SECONDS:
+            _mark_down(f"lag {lag:.0f}s > {settings.REPLICA_MAX_LAG_SECONDS}s")
+        else:
+            if not _state["healthy"]:
+                print("Replica healthy, reporting queries use replica")
+            _state["healthy"] = True
+            _state["reason"] = None
+    _state["check_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    _state["checked_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return _state
+
+
+async def health_loop():
+    if replica_engine is None:
+        return
+    while True:
+        await asyncio.sleep(settings.REPLICA_CHECK_SECONDS)
+        await check()
+
+
+async def dispose():
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
+
+def stats() -> dict:
+    return {
+        **_state,
+        "target": "replica" if use_replica() else "primary",
+        "sessions": {target: int(ROUTED.series.get((target,), 0)) for target in ("replica", "primary")},
+        "pool": replica_engine.pool.stats() if replica_engine is not None else None,
+    }
@@ -0,0 +1,54 @@
+# app/core/responses.py
+#
+# Fast JSON response: สำหรับ endpoint ที่ converter สร้าง dict ตรงกับ item model อยู่แล้ว
+# (ลำดับ field ตรง model, ค่าเป็น str/None) จึงไม่ต้องให้ FastAPI validate กับ response_model ซ้ำ
+# คืน Response ตรงๆ -> FastAPI ข้ามขั้น validate/serialise แต่ response_model ยังใช้สร้าง OpenAPI เหมือนเดิม
+# ใช้ orjson ถ้าติดตั้งไว้ ไม่มีก็ใช้ json มาตรฐาน
+
+import datetime
+import json
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.core import timing
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    # ให้ผลเหมือน jsonable_encoder ของ FastAPI
+    if isinstance(obj, Decimal):
+        return int(obj) if obj.as_tuple().exponent >= 0 else float(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, bytes):
+        return obj.decode()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+if orjson is not None:
+    def dumps(content) -> bytes:
+        return orjson.dumps(content, default=_default)
+else:
+    def dumps(content) -> bytes:
+        return json.dumps(
+            content, ensure_ascii=False, separators=(",", ":"), default=_default
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        with timing.phase("serialize"):
+            return dumps(content)
+
+
+def fast_response(content: dict, **kwargs):
+    # FAST_JSON_RESPONSE=false -> คืน dict ให้ FastAPI validate กับ response_model ตามปกติ
+    if not settings.FAST_JSON_RESPONSE:
+        return content
+    return FastJSONResponse(content, **kwargs)
@@ -0,0 +1,67 @@
+# app/core/sampler.py
+#
+# เก็บค่า CPU / memory / disk / สถานะ DB ใน background ทุก MONITOR_SAMPLE_SECONDS วินาที
+# endpoint /monitor/performance และ /monitor/full-check อ่านจาก snapshot นี้ทันที
+# (เดิม cpu_percent(interval=0.1) บล็อก event loop 100 ms และยิง SELECT @@VERSION ทุกครั้งที่ถูก poll)
+
+import asyncio
+import time
+from datetime import datetime
+
+import psutil
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import async_session_factory
+
+_snapshot = None
+_sampled_at = 0.0
+
+
+async def _check_database():
+    started = time.perf_counter()
+    try:
+        async with async_session_factory() as session:
+            await asyncio.wait_for(
+                session.execute(text("SELECT @@VERSION")),
+                timeout=settings.MONITOR_DB_CHECK_TIMEOUT,
+            )
+        return True, None, round((time.perf_counter() - started) * 1000, 2)
+    except asyncio.TimeoutError:
+        return False, f"timeout after {settings.MONITOR_DB_CHECK_TIMEOUT}s", None
+    except Exception as e:
+        return False, str(e), None
+
+
+async def sample():
+    global _snapshot, _sampled_at
+    db_ok, db_error, db_latency = await _check_database()
+    # interval=None ไม่บล็อก: คืน % CPU เฉลี่ยตั้งแต่การเรียกครั้งก่อน (= ช่วงระหว่าง sample)
+    _snapshot = {
+        "cpu": psutil.cpu_percent(interval=None),
+        "memory": psutil.virtual_memory().percent,
+        "disk": psutil.disk_usage("/").percent,
+        "database": db_ok,
+        "database_error": db_error,
+        "database_latency_ms": db_latency,
+        "sampled_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    _sampled_at = time.monotonic()
+    return _snapshot
+
+
+async def snapshot() -> dict:
+    # ยังไม่มี sampler (หรือหยุดไปนาน) -> sample เองครั้งเดียว
+    if _snapshot is None or time.monotonic() - _sampled_at > settings.MONITOR_SAMPLE_SECONDS * 3:
+        return await sample()
+    return _snapshot
+
+
+async def sample_loop():
+    psutil.cpu_percent(interval=None)
+    while True:
+        try:
+            await sample()
+        except Exception as e:
+            print(f"system sampler failed: {e}")
+        await asyncio.sleep(settings.MONITOR_SAMPLE_SECONDS)
@@ -1,7 +1,94 @@
+import functools
+import hashlib
+import hmac
+import ipaddress
+
 from fastapi import Request, Header, HTTPException
 from app.core.config import settings
+from app.core import timing
+
+
+# ---------------------------------------------------------
+# นโยบาย API key / IP สร้างครั้งเดียวตอน import (start worker)
+# ต่อ request เหลือแค่ hash key 1 ครั้ง + lookup IP จาก cache
+# ---------------------------------------------------------
+def _split(value: str) -> list:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+def _key_digest(entry: str) -> bytes:
+    # "sha256:<hex>" = เก็บเฉพาะ hash ของ key ไว้ใน .env, อย่างอื่น = key ตรงๆ
+    if entry.startswith("sha256:"):
+        return bytes.fromhex(entry[len("sha256:"):])
+    return hashlib.sha256(entry.encode("utf-8")).digest()
+
+
+def _normalize(ip):
+    # IPv4 ที่มาในรูป IPv6 (::ffff:203.157.115.88) เทียบกับรายการ IPv4
+    if ip.version == 6 and ip.ipv4_mapped:
+        return ip.ipv4_mapped
+    return ip
+
+
+def _parse_ips(entries: list) -> tuple:
+    # คืนค่า (set ของ IP เดี่ยว, list ของช่วง CIDR)
+    # รายการผิดรูปแบบ -> ValueError ตั้งแต่ start ไม่ใช่ตอนมี request
+    addresses, networks = set(), []
+    for entry in entries:
+        if "/" in entry:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+        else:
+            addresses.add(_normalize(ipaddress.ip_address(entry)))
+    return addresses, networks
+
+
+def _ip_in(client_ip: str, addresses: set, networks: list) -> bool:
+    try:
+        ip = _normalize(ipaddress.ip_address(client_ip))
+    except ValueError:
+        return False
+    if ip in addresses:
+        return True
+    return any(ip in network for network in networks)
+
+
+class SecurityPolicy:
+    def __init__(self, api_keys: list, allowed: list, trusted_proxies: list = ()):
+        # เก็บเฉพาะ SHA-256 ของ key ไม่เก็บ key จริงไว้ในหน่วยความจำ
+        self.key_digests = tuple(_key_digest(key) for key in api_keys)
+        self.addresses, self.networks = _parse_ips(allowed)
+        self.proxy_addresses, self.proxy_networks = _parse_ips(trusted_proxies)
+        self.ip_allowed = functools.lru_cache(maxsize=4096)(self._ip_allowed)
+        self.proxy_trusted = functools.lru_cache(maxsize=256)(self._proxy_trusted)
+
+    @classmethod
+    def from_settings(cls, s) -> "SecurityPolicy":
+        return cls(
+            [s.API_KEY, *_split(s.API_KEYS)],
+            [*_split(s.API_ALLOWED_IP1), *_split(s.API_ALLOWED_IP2), *_split(s.API_ALLOWED_IPS)],
+            _split(s.TRUSTED_PROXIES),
+        )
+
+    def key_allowed(self, api_key: str) -> bool:
+        digest = hashlib.sha256(api_key.encode("utf-8")).digest()
+        # เทียบกับทุก key แบบ constant time (ไม่หยุดที่ตัวแรกที่ตรง)
+        matched = False
+        for allowed in self.key_digests:
+            matched |= hmac.compare_digest(digest, allowed)
+        return matched
+
+    def _ip_allowed(self, client_ip: str) -> bool:
+        return _ip_in(client_ip, self.addresses, self.networks)
+
+    def _proxy_trusted(self, peer_ip: str) -> bool:
+        return _ip_in(peer_ip, self.proxy_addresses, self.proxy_networks)
+
+
+policy = SecurityPolicy.from_settings(settings)
+
 
 def get_client_ip(request: Request) -> str:
+    # ใช้แสดงผล/log เท่านั้น ห้ามใช้ตัดสินสิทธิ์ (X-Forwarded-For ซ้ายสุดผู้เรียกใส่เองได้) -> ใช้ get_trusted_client_ip
     # 1) ใช้ X-Forwarded-For ก่อน (จาก Apache / Proxy)
     xff = request.headers.get("x-forwarded-for")
     if xff:
@@ -11,33 +98,51 @@ def get_client_ip(request: Request) -> str:
     # 2) fallback กรณีไม่ผ่าน proxy
     return request.client.host
 
+def get_trusted_client_ip(request: Request) -> str:
+    # IP ที่ผู้เรียกปลอมไม่ได้ (ใช้ทั้ง key ของ rate limit และ IP allowlist ให้เห็น IP เดียวกัน)
+    # peer ของ TCP, ถ้า peer เป็น proxy ใน TRUSTED_PROXIES -> ไล่ X-Forwarded-For จากขวา ข้าม proxy ที่เชื่อถือ
+    # (ค่าทางซ้ายสุดผู้เรียกใส่มาเองได้ ค่าที่ proxy ของเราต่อท้ายให้ปลอมไม่ได้)
+    peer = request.client.host if request.client else ""
+    if not policy.proxy_trusted(peer):
+        return peer
+    xff = request.headers.get("x-forwarded-for")
+    if not xff:
+        return peer
+    hops = [hop.strip() for hop in xff.split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not policy.proxy_trusted(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
 async def api_security(request: Request, body_hospcode: str):
-    x_api_key = request.headers.get("x-api-key")
-    hospcode_header = request.headers.get("x-hospcode")
+    with timing.phase("security"):
+        return _check_api_security(request, body_hospcode)
+
+
+def _check_api_security(request: Request, body_hospcode: str):
+    headers = request.headers
+    x_api_key = headers.get("x-api-key")
+    hospcode_header = headers.get("x-hospcode")
 
     # 1. ไม่มี API Key
     if x_api_key is None:
         raise HTTPException(status_code=401, detail="Missing X-API-KEY header")
 
     # 2. ตรวจ API KEY
-    if x_api_key != settings.API_KEY:
+    if not policy.key_allowed(x_api_key):
         raise HTTPException(status_code=403, detail="Invalid API Key")
-    
+
     if hospcode_header != body_hospcode:
         raise HTTPException(status_code=400, detail="Hospcode mismatch")
 
     if settings.HOSP_CODE != body_hospcode:
         raise HTTPException(status_code=400, detail="Hospcode not allowed")
 
-    # 3. ตรวจ IP Address
-    # client_ip = request.client.host
-    client_ip = get_client_ip(request)
-    allowed_ips = {settings.API_ALLOWED_IP1, settings.API_ALLOWED_IP2}
-
-    # ลบ None ออกจาก set
-    allowed_ips = {ip for ip in allowed_ips if ip}
+    # 3. ตรวจ IP Address (IP เดี่ยว หรือช่วง CIDR)
+    client_ip = get_trusted_client_ip(request)
 
-    if client_ip not in allowed_ips:
+    if not policy.ip_allowed(client_ip):
         raise HTTPException(
             status_code=403,
             detail=f"IP {client_ip} is not allowed"
@@ -0,0 +1,168 @@
+# app/core/slow_queries.py
+#
+# Slow-query log: จับเวลา SQL ทุก statement แล้วรวมตาม fingerprint
+# (SQL ที่ตัดค่าคงที่ / parameter ออก -> query รูปเดียวกันนับเป็นตัวเดียว)
+# ใช้เป็นหลักฐานคุยกับ DBA ของแต่ละ รพ. ว่า query ไหนช้า / ถูกเรียกบ่อย (/monitor/slow-queries)
+#
+# ไม่เก็บค่า parameter (อาจมี CID / HN ของผู้ป่วย) เก็บเฉพาะ fingerprint
+# หน่วยความจำจำกัด: fingerprint ไม่เกิน SLOW_QUERY_MAX_FINGERPRINTS (ทิ้งตัวที่ไม่ได้ใช้นานสุด)
+# และ ring buffer ของ statement ที่ช้าเกิน threshold ไม่เกิน SLOW_QUERY_LOG_SIZE รายการ
+
+import hashlib
+import re
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+from functools import lru_cache
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core import timing
+
+_COMMENTS = re.compile(r"--[^\n]*|/\*.*?\*/", re.S)
+_STRINGS = re.compile(r"N?'(?:[^']|'')*'")
+_PARAMS = re.compile(r"%\([^)]*\)s|%s|:\w+|@\w+|\?")
+_NUMBERS = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+_IN_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACES = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(statement: str) -> str:
+    # statement จาก text() เป็น string เดิมทุกครั้ง -> cache ผลไว้ได้
+    sql = _COMMENTS.sub(" ", statement)
+    sql = _STRINGS.sub("?", sql)
+    sql = _PARAMS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _IN_LISTS.sub("(?+)", sql)
+    return _SPACES.sub(" ", sql).strip()
+
+
+@lru_cache(maxsize=1024)
+def fingerprint_id(fp: str) -> str:
+    # id สั้นที่เหมือนกันทุก รพ. ใช้อ้างถึง query เดียวกันข้ามหน่วยบริการ
+    return hashlib.sha1(fp.encode("utf-8")).hexdigest()[:12]
+
+
+class QueryStats:
+    __slots__ = ("fingerprint", "count", "errors", "total", "max", "slow", "first_seen", "last_seen")
+
+    def __init__(self, fp: str):
+        self.fingerprint = fp
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.slow = 0
+        self.first_seen = time.time()
+        self.last_seen = self.first_seen
+
+    def as_dict(self) -> dict:
+        return {
+            "id": fingerprint_id(self.fingerprint),
+            "fingerprint": self.fingerprint,
+            "count": self.count,
+            "errors": self.errors,
+            "slow": self.slow,
+            "total_ms": round(self.total * 1000, 2),
+            "avg_ms": round(self.total * 1000 / self.count, 2) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 2),
+            "first_seen": datetime.fromtimestamp(self.first_seen).strftime("%Y-%m-%d %H:%M:%S"),
+            "last_seen": datetime.fromtimestamp(self.last_seen).strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: int, log_size: int, max_fingerprints: int):
+        self.threshold = threshold_ms / 1000
+        self.max_fingerprints = max_fingerprints
+        self.queries = OrderedDict()
+        self.recent = deque(maxlen=log_size)
+        self.evicted = 0
+
+    def record(self, statement: str, seconds: float, failed: bool = False):
+        fp = fingerprint(statement)
+        stats = self.queries.get(fp)
+        if stats is None:
+            stats = self.queries[fp] = QueryStats(fp)
+            if len(self.queries) > self.max_fingerprints:
+                self.queries.popitem(last=False)
+                self.evicted += 1
+        else:
+            self.queries.move_to_end(fp)
+
+        stats.count += 1
+        stats.total += seconds
+        stats.max = max(stats.max, seconds)
+        stats.last_seen = time.time()
+        if failed:
+            stats.errors += 1
+
+        if seconds >= self.threshold:
+            stats.slow += 1
+            self.recent.append((stats.last_seen, fp, seconds, timing.current_path(), failed))
+
+    def reset(self):
+        self.queries.clear()
+        self.recent.clear()
+        self.evicted = 0
+
+    def report(self, limit: int = 20) -> dict:
+        queries = list(self.queries.values())
+        slowest = sorted(queries, key=lambda q: q.max, reverse=True)[:limit]
+        frequent = sorted(queries, key=lambda q: q.count, reverse=True)[:limit]
+        heaviest = sorted(queries, key=lambda q: q.total, reverse=True)[:limit]
+        recent = [
+            {
+                "time": datetime.fromtimestamp(at).strftime("%Y-%m-%d %H:%M:%S"),
+                "id": fingerprint_id(fp),
+                "duration_ms": round(seconds * 1000, 2),
+                "path": path,
+                "error": failed,
+            }
+            for at, fp, seconds, path, failed in reversed(self.recent)
+        ][:limit]
+        return {
+            "threshold_ms": round(self.threshold * 1000),
+            "fingerprints": len(queries),
+            "evicted": self.evicted,
+            "slowest": [q.as_dict() for q in slowest],
+            "most_frequent": [q.as_dict() for q in frequent],
+            "most_total_time": [q.as_dict() for q in heaviest],
+            "recent_slow": recent,
+        }
+
+
+slow_query_log = SlowQueryLog(
+    settings.SLOW_QUERY_THRESHOLD_MS,
+    settings.SLOW_QUERY_LOG_SIZE,
+    settings.SLOW_QUERY_MAX_FINGERPRINTS,
+)
+
+
+# ---------------------------------------------------------
+# Event ของ engine (ผูกใน database.py)
+# ---------------------------------------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, "slow_query_started", None)
+    if started is not None:
+        slow_query_log.record(statement, time.perf_counter() - started)
+
+
+def _handle_error(context):
+    started = getattr(context.execution_context, "slow_query_started", None)
+    if started is not None and context.statement:
+        slow_query_log.record(context.statement, time.perf_counter() - started, failed=True)
+
+
+def instrument_engine(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
@@ -0,0 +1,142 @@
+# app/core/startup.py
+#
+# ขั้นตอนตอน start / stop ของแต่ละ worker (เรียกจาก lifespan ใน app/main.py)
+#   - เปิด connection ไว้ใน pool ล่วงหน้า DB_POOL_WARMUP ตัว request แรกหลัง deploy / restart
+#     จะได้ไม่ต้องจ่ายค่า ODBC connect + TLS + login เอง
+#   - โหลดข้อมูลอ้างอิง (ตารางรหัส + thaiaddress) รอไม่เกิน DB_POOL_WARMUP_TIMEOUT เกินแล้วโหลดต่อใน background
+#   - ตรวจ read replica รอบแรก (ถ้าตั้งไว้) งานรายงานจะได้ใช้ replica ตั้งแต่ request แรก
+#   - ตอนปิด: หยุด background task แล้ว dispose engine ทั้ง primary และ replica (ปิด connection กับ DB ให้เรียบร้อย)
+# เวลาแต่ละขั้น + เวลาจน worker พร้อม (time-to-ready) + request แรก ดูได้ที่ /monitor/status
+
+import asyncio
+import os
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime
+
+import psutil
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine, POOL_SIZE
+from app.core import dimensions, replica, thaiaddress, timing
+
+_report = {
+    "pid": os.getpid(),
+    "ready": False,
+    "ready_at": None,
+    # ตั้งแต่ process เริ่ม (รวม import) จน lifespan พร้อมรับ request
+    "time_to_ready_ms": None,
+    "lifespan_ms": None,
+    "pool_warmup": None,
+    "reference_data": None,
+    "replica": None,
+}
+
+# preload ที่เกินเวลาแล้วยังโหลดต่อ (ยกเลิกตอน stop)
+_background = set()
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 2)
+
+
+async def _open_connection(stack: AsyncExitStack) -> float:
+    started = time.perf_counter()
+    conn = await stack.enter_async_context(engine.connect())
+    await conn.execute(text("SELECT 1"))
+    return _ms(started)
+
+
+async def warm_pool(count: int) -> dict:
+    # ถือ connection ไว้พร้อมกันทุกตัวจนเปิดครบ (ไม่งั้น pool จะคืนตัวเดิมซ้ำ) แล้วคืนเข้า pool ทั้งหมด
+    count = min(count, POOL_SIZE)
+    started = time.perf_counter()
+    connect_ms, error = [], None
+    if count > 0:
+        try:
+            async with AsyncExitStack() as stack:
+                results = await asyncio.wait_for(
+                    asyncio.gather(*(_open_connection(stack) for _ in range(count)), return_exceptions=True),
+                    timeout=settings.DB_POOL_WARMUP_TIMEOUT,
+                )
+                for result in results:
+                    if isinstance(result, BaseException):
+                        error = str(result)
+                    else:
+                        connect_ms.append(result)
+        except asyncio.TimeoutError:
+            error = f"timeout after {settings.DB_POOL_WARMUP_TIMEOUT}s"
+    return {
+        "requested": count,
+        "opened": len(connect_ms),
+        "connect_ms_max": max(connect_ms, default=None),
+        "connect_ms_min": min(connect_ms, default=None),
+        "ms": _ms(started),
+        "error": error,
+    }
+
+
+async def _load_reference_data():
+    await asyncio.gather(dimensions.ensure_loaded(), thaiaddress.ensure_loaded())
+
+
+def _background_done(task: asyncio.Task):
+    _background.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Background reference data load failed: {task.exception()}")
+
+
+async def preload_reference_data() -> dict:
+    # ถ้า DB ยังไม่พร้อม ให้ start ต่อได้ endpoint จะโหลดเองตอนเรียกครั้งแรก
+    # รอไม่เกิน DB_POOL_WARMUP_TIMEOUT (DB ช้า/ไม่ตอบต้องไม่ค้าง lifespan) เกินแล้วโหลดต่อใน background
+    started = time.perf_counter()
+    error = None
+    task = asyncio.ensure_future(_load_reference_data())
+    try:
+        await asyncio.wait_for(asyncio.shield(task), timeout=settings.DB_POOL_WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        error = f"timeout after {settings.DB_POOL_WARMUP_TIMEOUT}s, loading in background"
+        print(f"Preload reference data {error}")
+        _background.add(task)
+        task.add_done_callback(_background_done)
+    except Exception as e:
+        error = str(e)
+        print(f"Preload reference data failed: {e}")
+    return {"ms": _ms(started), "error": error}
+
+
+async def start():
+    started = time.perf_counter()
+    # warm-up ก่อน preload: query ของ preload ได้ใช้ connection ที่เปิดไว้แล้ว
+    _report["pool_warmup"] = await warm_pool(settings.DB_POOL_WARMUP)
+    _report["reference_data"] = await preload_reference_data()
+    # ตรวจ replica รอบแรกก่อนรับ request (ไม่ผ่าน -> งานรายงานเริ่มที่ primary)
+    state = await replica.check()
+    _report["replica"] = {key: state[key] for key in ("configured", "healthy", "reason", "lag_seconds", "check_ms")}
+
+    _report["lifespan_ms"] = _ms(started)
+    _report["time_to_ready_ms"] = round((time.time() - psutil.Process().create_time()) * 1000, 2)
+    _report["ready_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    _report["ready"] = True
+
+    warmup = _report["pool_warmup"]
+    print(
+        f"worker {_report['pid']} ready in {_report['time_to_ready_ms']:.0f} ms "
+        f"(pool warm-up {warmup['opened']}/{warmup['requested']} in {warmup['ms']:.0f} ms, "
+        f"reference data {_report['reference_data']['ms']:.0f} ms)",
+        flush=True,
+    )
+
+
+async def stop(tasks: list):
+    tasks = [*tasks, *_background]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await engine.dispose()
+    await replica.dispose()
+
+
+def report() -> dict:
+    return {**_report, "first_request": timing.first_request}
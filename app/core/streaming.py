@@ -0,0 +1,89 @@
+# app/core/streaming.py
+#
+# โหมด streaming แบบ NDJSON (1 บรรทัด = 1 item) สำหรับ endpoint ที่คืนข้อมูลจำนวนมาก
+# เปิดใช้เมื่อ client ส่ง "Accept: application/x-ndjson"
+# อ่านจาก server-side cursor ทีละ chunk แล้วส่งออกทันที ไม่ต้องถือผลลัพธ์ทั้งหมดไว้ในหน่วยความจำ
+
+import asyncio
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.core.config import settings
+from app.core.converters import RowConverter
+from app.core.responses import dumps
+from app.core.database import async_session_factory
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# ใช้ใน responses= ของ route เพื่อให้ OpenAPI แสดงว่ารองรับ NDJSON
+NDJSON_RESPONSE_DOC = {
+    200: {
+        "content": {NDJSON_MEDIA_TYPE: {"schema": {"type": "string"}}},
+        "description": "ส่ง Accept: application/x-ndjson เพื่อรับผลลัพธ์แบบ streaming ทีละบรรทัด",
+    }
+}
+
+
+def wants_ndjson(request: Request) -> bool:
+    return NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+async def _stream_rows(sql, params: dict, convert, session_factory):
+    # เปิด session ของตัวเอง เพราะ generator ทำงานต่อหลัง endpoint return ไปแล้ว
+    async with session_factory() as session:
+        result = await session.stream(
+            sql, params, execution_options={"yield_per": settings.STREAM_CHUNK_SIZE}
+        )
+        if isinstance(convert, RowConverter):
+            # converter ที่ compile แล้ว อ่าน row ด้วย index ได้เลย
+            convert_row = convert.for_keys(result.keys())
+            partitions = result.partitions()
+        else:
+            convert_row = convert
+            partitions = result.mappings().partitions()
+
+        async for partition in partitions:
+            yield b"".join(dumps(convert_row(row)) + b"\n" for row in partition)
+
+
+def ndjson_response(sql, params: dict, convert, session_factory=None) -> StreamingResponse:
+    # session_factory = ฐานข้อมูลที่ใช้ (ค่าเริ่มต้น primary) เช่น replica.reporting_sessions()
+    return StreamingResponse(
+        _stream_rows(sql, params, convert, session_factory or async_session_factory),
+        media_type=NDJSON_MEDIA_TYPE,
+    )
+
+
+async def _stream_partitions(loaders: list, convert, limit: int):
+    # loader ของทุก partition ทำงานพร้อมกัน (ไม่เกิน limit) แต่ส่งออกตามลำดับ partition
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(loader):
+        async with semaphore:
+            return await loader()
+
+    tasks = [asyncio.ensure_future(run(loader)) for loader in loaders]
+    try:
+        for task in tasks:
+            rows = await task
+            if rows is None or isinstance(rows, list):
+                if rows:
+                    yield b"".join(dumps(convert(row)) + b"\n" for row in rows)
+                continue
+            # loader คืน async generator ของ list -> stream ต่อทีละ chunk (ปิด generator เสมอ คืน connection)
+            try:
+                async for batch in rows:
+                    yield b"".join(dumps(convert(row)) + b"\n" for row in batch)
+            finally:
+                await rows.aclose()
+    finally:
+        # client ตัดการเชื่อมต่อกลางทาง -> ยกเลิกตัวที่เหลือ คืน connection ให้ pool
+        for task in tasks:
+            task.cancel()
+
+
+def ndjson_partitions_response(loaders: list, convert, limit: int) -> StreamingResponse:
+    # loaders = [async function ไม่มี argument ที่คืน list ของ row หรือ async generator ของ list, ...]
+    # เช่น 1 ตัวต่อวันของโหมดช่วงวันที่
+    return StreamingResponse(_stream_partitions(loaders, convert, limit), media_type=NDJSON_MEDIA_TYPE)
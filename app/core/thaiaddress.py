@@ -0,0 +1,70 @@
+# app/core/thaiaddress.py
+#
+# ตาราง thaiaddress มีขนาดเล็กและแทบไม่เปลี่ยน จึงโหลดเข้าหน่วยความจำครั้งเดียว
+# แล้วแปลง (chwpart, amppart, tmbpart) -> ชื่อจังหวัด/อำเภอ/ตำบลใน Python
+# แทนการ join thaiaddress 3 ครั้ง (t1/t2/t3) ในทุก query
+# โหลดใหม่อัตโนมัติเมื่อครบ THAIADDRESS_REFRESH_SECONDS
+
+import asyncio
+import time
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import async_session_factory
+
+SQL_THAIADDRESS = text("""
+    SELECT chwpart, amppart, tmbpart, name FROM thaiaddress
+""")
+
+_index = {}
+_loaded_at = 0.0
+_lock = asyncio.Lock()
+
+
+async def refresh():
+    global _index, _loaded_at
+
+    async with async_session_factory() as session:
+        rows = await session.execute(SQL_THAIADDRESS)
+        index = {(row[0], row[1], row[2]): row[3] for row in rows}
+
+    # สลับทั้งก้อน request ที่กำลังอ่านอยู่จะไม่เห็นข้อมูลครึ่งๆ กลางๆ
+    _index = index
+    _loaded_at = time.monotonic()
+
+
+def _is_fresh() -> bool:
+    return bool(_index) and time.monotonic() - _loaded_at < settings.THAIADDRESS_REFRESH_SECONDS
+
+
+async def ensure_loaded():
+    if _is_fresh():
+        return
+
+    async with _lock:
+        if _is_fresh():
+            return
+        try:
+            await refresh()
+        except Exception as e:
+            # โหลดใหม่ไม่สำเร็จแต่มีข้อมูลเดิมอยู่ ใช้ข้อมูลเดิมต่อไปก่อน
+            if not _index:
+                raise
+            print(f"thaiaddress refresh failed, keep previous index: {e}")
+
+
+def resolve(chwpart, amppart, tmbpart) -> tuple:
+    # คืนค่า (changwat, ampur, tambon) เหมือน t1/t2/t3 ใน SQL เดิม
+    return (
+        _index.get((chwpart, "00", "00")),
+        _index.get((chwpart, amppart, "00")),
+        _index.get((chwpart, amppart, tmbpart)),
+    )
+
+
+def stats() -> dict:
+    return {
+        "rows": len(_index),
+        "age_seconds": round(time.monotonic() - _loaded_at, 1) if _index else None,
+    }
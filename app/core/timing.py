@@ -0,0 +1,230 @@
+# app/core/timing.py
+#
+# จับเวลาภายใน request แยกตามช่วง (security / db / convert / serialize)
+# - ส่งกลับเป็น header "Server-Timing" (เห็นใน DevTools ของ browser หรือ curl -i)
+# - รวมเป็น histogram ต่อ route ที่ /monitor/metrics (Prometheus)
+#
+# เวลาของแต่ละ request เก็บใน contextvar จึงใช้ได้ทั้งใน task ย่อย (fetch_concurrently)
+# และใน event ของ SQLAlchemy ที่ทำงานใน greenlet ของ request เดียวกัน
+
+import functools
+import inspect
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.metrics import Counter, Gauge, Histogram
+
+PHASES = ("security", "db", "convert", "serialize")
+
+REQUESTS = Counter(
+    "agent_http_requests_total", "จำนวน request แยกตาม route และ status",
+    ("method", "route", "status"),
+)
+REQUEST_DURATION = Histogram(
+    "agent_http_request_duration_seconds", "เวลาตอบสนองทั้งหมดของ request (วินาที)",
+    ("method", "route"),
+)
+PHASE_DURATION = Histogram(
+    "agent_request_phase_duration_seconds", "เวลาที่ใช้ในแต่ละช่วงของ request (วินาที)",
+    ("route", "phase"),
+)
+DB_STATEMENTS = Counter(
+    "agent_db_statements_total", "จำนวน SQL statement แยกตาม route",
+    ("route",),
+)
+AGENT_INFO = Gauge("agent_info", "ข้อมูลหน่วยบริการของ agent นี้", ("hospcode", "hospname"))
+AGENT_INFO.set((settings.HOSP_CODE, settings.HOSP_NAME), 1)
+
+
+class RequestTimings:
+    __slots__ = ("started", "phases", "endpoint_done", "path")
+
+    def __init__(self, path: str = None):
+        self.started = time.perf_counter()
+        self.path = path
+        # ชื่อช่วง -> [วินาทีรวม, จำนวนครั้ง]
+        self.phases = {}
+        self.endpoint_done = None
+
+    def add(self, name: str, seconds: float):
+        entry = self.phases.get(name)
+        if entry is None:
+            self.phases[name] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+
+_current = ContextVar("request_timings", default=None)
+
+# request แรกของ worker นี้ (ไม่นับ /monitor) = cold-start latency ที่ผู้ใช้เห็นจริง (/monitor/status)
+first_request = None
+
+
+def record(name: str, seconds: float):
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def current_path():
+    # path ของ request ที่กำลังทำงาน (None = งาน background เช่น refresh dimension)
+    timings = _current.get()
+    return timings.path if timings is not None else None
+
+
+@contextmanager
+def phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - started)
+
+
+# ---------------------------------------------------------
+# เวลาของ SQL แต่ละ statement (ผูกกับ engine ใน database.py)
+# ---------------------------------------------------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # เก็บเวลาเริ่มไว้ที่ execution context ของ statement นั้นเอง ไม่ใช่ conn.info
+    # (statement ที่ error/ถูก cancel จะไม่ทิ้งเวลาเริ่มค้างไว้บน connection ใน pool)
+    if context is not None:
+        context._timing_started = time.perf_counter()
+
+
+def _record_statement(context):
+    started = getattr(context, "_timing_started", None)
+    if started is not None:
+        context._timing_started = None
+        record("db", time.perf_counter() - started)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    _record_statement(context)
+
+
+def _handle_error(context):
+    # statement ที่ error ไม่ผ่าน after_cursor_execute
+    if context.execution_context is not None:
+        _record_statement(context.execution_context)
+
+
+def instrument_engine(engine):
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+
+
+# ---------------------------------------------------------
+# Route class: บันทึกเวลาที่ endpoint ทำงานเสร็จ
+# ช่วงหลังจากนั้นจนเริ่มส่ง response คือ validate response_model + serialise
+# ---------------------------------------------------------
+def _timed_endpoint(endpoint):
+    if not inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        try:
+            return await endpoint(*args, **kwargs)
+        finally:
+            timings = _current.get()
+            if timings is not None:
+                timings.endpoint_done = time.perf_counter()
+
+    return wrapper
+
+
+class TimedRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+
+# ---------------------------------------------------------
+# ASGI middleware
+# ---------------------------------------------------------
+def _server_timing(timings: RequestTimings, now: float) -> str:
+    parts = []
+    for name in PHASES:
+        entry = timings.phases.get(name)
+        if entry is None:
+            continue
+        if name == "db":
+            parts.append(f'db;dur={entry[0] * 1000:.2f};desc="{entry[1]} queries"')
+        else:
+            parts.append(f"{name};dur={entry[0] * 1000:.2f}")
+    parts.append(f"total;dur={(now - timings.started) * 1000:.2f}")
+    return ", ".join(parts)
+
+
+_PARAM = re.compile(r"\{(\w+)(?::[^}]*)?\}")
+
+
+def _route_path(scope) -> str:
+    # ใช้ path template (ไม่ใช่ path จริง) เป็น label เพื่อไม่ให้จำนวน series โตตามค่าใน URL
+    # scope["route"] (Starlette ตั้งหลัง routing) ของ route ที่มาจาก include_router เก็บ path แบบไม่มี prefix
+    # prefix = ส่วนหน้าของ path จริงก่อนส่วนที่ route นั้น match (แทนค่า path_params ลงใน template)
+    template = getattr(scope.get("route"), "path", None)
+    if not template:
+        return "unmatched"
+    params = scope.get("path_params") or {}
+    matched = _PARAM.sub(lambda m: str(params.get(m.group(1), m.group(0))), template) if params else template
+    path = scope.get("path", "")
+    if path.endswith(matched):
+        return path[:len(path) - len(matched)] + template
+    return template
+
+
+class TimingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timings = RequestTimings(scope.get("path"))
+        token = _current.set(timings)
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                status = message["status"]
+                if timings.endpoint_done is not None:
+                    timings.add("serialize", now - timings.endpoint_done)
+                if settings.SERVER_TIMING:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", _server_timing(timings, now).encode("latin-1")))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            self._observe(scope, timings, status)
+
+    def _observe(self, scope, timings: RequestTimings, status: int):
+        global first_request
+        elapsed = time.perf_counter() - timings.started
+        route_path = _route_path(scope)
+        method = scope.get("method", "")
+
+        if first_request is None and not route_path.startswith("/api/v1/monitor"):
+            first_request = {"route": route_path, "status": status, "ms": round(elapsed * 1000, 2)}
+
+        REQUESTS.inc((method, route_path, str(status)))
+        REQUEST_DURATION.observe((method, route_path), elapsed)
+        for name, (seconds, count) in timings.phases.items():
+            PHASE_DURATION.observe((route_path, name), seconds)
+            if name == "db":
+                DB_STATEMENTS.inc((route_path,), count)
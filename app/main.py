@@ -1,8 +1,31 @@
+import asyncio
 import traceback 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 from app.api.v1.routes import router as v1_router
 from app.core.config import settings
+from app.core import dimensions, replica, sampler, startup
+from app.core.timing import TimingMiddleware
+from app.core.admission import AdmissionMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # เปิด connection ใน pool ล่วงหน้า + โหลดข้อมูลอ้างอิง (ตารางรหัส + thaiaddress) ก่อนรับ request แรก
+    await startup.start()
+
+    tasks = [
+        asyncio.create_task(dimensions.refresh_loop()),
+        # เก็บค่า CPU / memory / disk / DB ให้ /monitor อ่านได้ทันที
+        asyncio.create_task(sampler.sample_loop()),
+        # ตรวจ read replica (ถ้าตั้งไว้) ไม่พร้อม / lag เกิน -> งานรายงานใช้ primary
+        asyncio.create_task(replica.health_loop()),
+    ]
+    yield
+    # หยุด background task แล้วปิด connection ใน pool ทั้งหมด
+    await startup.stop(tasks)
+
 
 app = FastAPI(
     title="Saraburi Agent API SSB",
@@ -10,6 +33,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs" if settings.APP_ENV != "production" else None,
     redoc_url="/redoc" if settings.APP_ENV != "production" else None,
+    lifespan=lifespan,
 )
 
 
@@ -34,4 +58,9 @@ async def global_exception_handler(request: Request, exc: Exception):
     )
 # ----------------------------------
 
+# จำกัด rate ต่อ IP / จำนวน request พร้อมกันของ /hie, /stroke, /rti (429 / 503 + Retry-After)
+app.add_middleware(AdmissionMiddleware)
+# จับเวลาแต่ละ request -> Server-Timing + /monitor/metrics (อยู่นอกสุด นับ request ที่ถูกปฏิเสธด้วย)
+app.add_middleware(TimingMiddleware)
+
 app.include_router(v1_router, prefix="/api/v1")
@@ -0,0 +1,78 @@
+# app/server.py
+#
+# ตัวรัน production: python -m app.server  (ค่าทั้งหมดอ่านจาก Settings / .env)
+#   - SERVER_WORKERS process (0 = เท่าจำนวน CPU) แต่ละตัวมี event loop และ connection pool ของตัวเอง
+#   - DB_MAX_CONNECTIONS แบ่งให้ทุก worker (app/core/database.py) connection รวมจึงไม่เกิน limit ของ DB โรงพยาบาล
+#   - uvloop / httptools เมื่อติดตั้ง (uvicorn[standard]) ถ้าสั่งเจาะจงแต่ไม่มี จะหยุดตั้งแต่ตอน start
+#   - graceful shutdown: SIGTERM แล้วรอ request ที่ค้างอยู่ไม่เกิน SERVER_GRACEFUL_TIMEOUT วินาที
+
+import importlib.util
+import os
+import sys
+
+import uvicorn
+
+from app.core.config import settings
+from app.core.pool import worker_pool_limits
+
+
+def resolve_workers() -> int:
+    return settings.SERVER_WORKERS or os.cpu_count() or 1
+
+
+def _check_module(setting: str, value: str, module: str):
+    if value == module and importlib.util.find_spec(module) is None:
+        sys.exit(f"{setting}={value} but '{module}' is not installed (pip install uvicorn[standard])")
+
+
+def _resolved(value: str, module: str, fallback: str) -> str:
+    if value != "auto":
+        return value
+    return module if importlib.util.find_spec(module) is not None else fallback
+
+
+def run(app: str = "app.main:app"):
+    workers = resolve_workers()
+    _check_module("SERVER_LOOP", settings.SERVER_LOOP, "uvloop")
+    _check_module("SERVER_HTTP", settings.SERVER_HTTP, "httptools")
+
+    if settings.DB_MAX_CONNECTIONS and workers > settings.DB_MAX_CONNECTIONS:
+        sys.exit(
+            f"SERVER_WORKERS={workers} exceeds DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS} "
+            "(each worker needs at least one DB connection)"
+        )
+
+    # worker เป็น process ใหม่ที่อ่าน Settings เอง ส่งจำนวน worker จริงไปให้แบ่ง pool ได้ตรงกัน
+    os.environ["SERVER_WORKERS"] = str(workers)
+
+    pool_size, max_overflow = worker_pool_limits(
+        settings.DB_POOL_SIZE, settings.DB_POOL_MAX_OVERFLOW, settings.DB_MAX_CONNECTIONS, workers,
+    )
+    print(
+        f"{settings.APP_NAME}: {workers} worker(s) on {settings.SERVER_HOST}:{settings.APP_PORT} "
+        f"loop={_resolved(settings.SERVER_LOOP, 'uvloop', 'asyncio')} "
+        f"http={_resolved(settings.SERVER_HTTP, 'httptools', 'h11')} "
+        f"keepalive={settings.SERVER_KEEPALIVE_SECONDS}s "
+        f"db pool/worker={pool_size}+{max_overflow} "
+        f"(max {(pool_size + max_overflow) * workers} connections)",
+        flush=True,
+    )
+
+    uvicorn.run(
+        app,
+        host=settings.SERVER_HOST,
+        port=settings.APP_PORT,
+        workers=workers,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        timeout_keep_alive=settings.SERVER_KEEPALIVE_SECONDS,
+        timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        backlog=settings.SERVER_BACKLOG,
+        access_log=settings.SERVER_ACCESS_LOG,
+        # ไม่เปิดเผยชื่อ/รุ่นของ server ใน response header
+        server_header=False,
+    )
+
+
+if __name__ == "__main__":
+    run()
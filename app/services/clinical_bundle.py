@@ -0,0 +1,282 @@
+# app/services/clinical_bundle.py
+#
+# Clinical bundle: ข้อมูลลูก (diagnosis / drug / lab / allergy / หัตถการ) ของหลาย visit
+# ดึงแบบ set-based 1 query ต่อ 1 collection (WHERE vn IN (...)) แล้วจัดกลุ่มตาม key ใน Python
+# ใช้ร่วมกันระหว่าง /hie/visit, /hie/admit และ /hie/visits/batch
+
+import asyncio
+from collections import defaultdict
+
+from sqlalchemy import text, bindparam
+
+from app.core.database import fetch_concurrently
+from app.core import dimensions
+from app.core import timing
+from app.core.converters import RowConverter
+
+
+# ส่วนหัวของ visit (patient + ovst + opdscreen) ใช้ร่วมกันระหว่าง visit / admit / batch
+# ดึงเฉพาะรหัส ชื่อของ pttype/icd101/doctor/spclty/ovstist/ovstost แปลงจาก dimension cache
+_VISIT_HEADER_SELECT = """
+    SELECT p.hn AS hn_0 ,p.cid ,CONCAT(p.pname ,' ', p.fname ,' ', p.lname) AS nm, p.birthday, (YEAR(NOW()) - YEAR(p.birthday)) AS birthday_year, 
+        o.vn AS vn_0, o.an AS an_0, o.vstdate AS vstdate_0, o.vsttime AS vsttime_0, 
+        o.pttype AS pttype_0, o.pttypeno, v.pdx AS pdx_0, v.paid_money, o.doctor AS doctor_0, 
+        v.spclty AS spclty_0, o.ovstist AS ovstist_0, o.ovstost AS ovstost_0, a.nextdate, sc.* 
+    FROM patient p 
+    LEFT JOIN ovst o ON p.hn = o.hn
+    LEFT JOIN opdscreen sc ON sc.vn = o.vn
+    LEFT JOIN vn_stat v ON o.vn = v.vn 
+    LEFT OUTER JOIN oapp a on a.vn = o.vn
+"""
+
+SQL_VISIT_HEADER = text(_VISIT_HEADER_SELECT + """
+    WHERE o.vn = :vn AND p.hn = :hn
+""")
+
+SQL_VISIT_HEADERS = text(_VISIT_HEADER_SELECT + """
+    WHERE p.cid = :cid AND o.vn IN :vns
+""").bindparams(bindparam("vns", expanding=True))
+
+
+SQL_DIAG = text("""
+    SELECT ov.vn AS bundle_key, ov.icd10
+    FROM ovstdiag ov
+    WHERE ov.vn IN :vns AND ov.diagtype <> '1'
+""").bindparams(bindparam("vns", expanding=True))
+
+SQL_DRUG = text("""
+    SELECT a.vn AS bundle_key, a.an AS bundle_an, b.name, b.strength, a.qty, a.sum_price, a.drugusage
+    FROM opitemrece a
+    INNER JOIN s_drugitems b ON a.icode = b.icode
+    WHERE a.vn IN :vns OR a.an IN :ans
+""").bindparams(bindparam("vns", expanding=True), bindparam("ans", expanding=True))
+
+SQL_LAB = text("""
+    SELECT h.vn AS bundle_key, l.lab_items_code, i.lab_items_name, i.lab_items_normal_value,
+    if(i.lab_items_name NOT LIKE '%hiv%' AND i.lab_items_name NOT LIKE '%interpretation%',l.lab_order_result,'ปกปิด') AS lab_order_result
+    FROM lab_head h
+    INNER JOIN lab_order l ON h.lab_order_number = l.lab_order_number
+    INNER JOIN lab_items i ON i.lab_items_code = l.lab_items_code
+    WHERE h.vn IN :vns
+    ORDER BY h.order_date DESC
+""").bindparams(bindparam("vns", expanding=True))
+
+SQL_ALLERGY = text("""
+    SELECT oa.hn AS bundle_key, oa.agent, oa.symptom, oa.report_date, oa.department
+    FROM opd_allergy oa
+    WHERE oa.hn IN :hns
+""").bindparams(bindparam("hns", expanding=True))
+
+SQL_ER_OPER = text("""
+    SELECT ero.vn AS bundle_key, ero.*
+    FROM er_regist_oper ero
+    WHERE ero.vn IN :vns
+    ORDER BY ero.rec_no ASC
+""").bindparams(bindparam("vns", expanding=True))
+
+SQL_OPD_OPER = text("""
+    SELECT dot.vn AS bundle_key, dot.*
+    FROM doctor_operation dot
+    WHERE dot.vn IN :vns
+""").bindparams(bindparam("vns", expanding=True))
+
+SQL_AN = text("""
+    SELECT *, a.vn AS bundle_key, i.admdoctor AS admdoctor_0, i.dch_doctor AS dch_doctor_0, i.pttype AS pttype_0,
+        i.ward AS ward_0, ip.name AS ipname, i.dchtype AS dchtype_0, i.dchstts AS dchstts_0
+    FROM an_stat a
+    INNER JOIN ipt i ON i.an = a.an
+    LEFT JOIN iptadm it ON a.an = it.an
+    LEFT JOIN ipt_spclty ip ON i.ipt_spclty = ip.ipt_spclty
+    WHERE a.vn IN :vns
+""").bindparams(bindparam("vns", expanding=True))
+
+SQL_IPT_OPER = text("""
+    SELECT ino.an AS bundle_key, ino.*
+    FROM ipt_nurse_oper ino
+    WHERE ino.an IN :ans
+    ORDER BY ino.ref_date ASC
+""").bindparams(bindparam("ans", expanding=True))
+
+
+# ---------------------------------------------------------
+# แปลง row -> dict ตาม item model ของ HIE (compile จาก spec ครั้งเดียว)
+# ชื่อจากตารางรหัสค้นผ่าน dimension cache (via)
+# ---------------------------------------------------------
+def _dim(table: str):
+    return lambda code: dimensions.name(table, code)
+
+
+def _icd101(part: int):
+    return lambda code: dimensions.icd101(code)[part]
+
+
+diagnosis_item = RowConverter([
+    ("code3", "str_if_str", "icd10", _icd101(0)),
+    ("tname", "str_if_str", "icd10", _icd101(1)),
+    ("iname", "str_if_str", "icd10", _icd101(2)),
+], "diagnosis_item")
+
+drug_item = RowConverter([
+    ("name", "str_if_str"),
+    ("strength", "str_if_str"),
+    ("shortlist", "str_if_str", "drugusage", _dim("drugusage")),
+    ("qty", "or_none"),
+    ("sum_price", "or_none"),
+], "drug_item")
+
+lab_item = RowConverter([
+    ("lab_items_code", "str_if_str"),
+    ("lab_items_name", "str_if_str"),
+    ("lab_order_result", "or_none"),
+    ("lab_items_normal_value", "or_none"),
+], "lab_item")
+
+allergy_item = RowConverter([
+    ("report_date", "isoformat"),
+    ("agent", "str_if_str"),
+    ("symptom", "str_if_str"),
+    ("department", "str_if_str"),
+], "allergy_item")
+
+er_oper_item = RowConverter([
+    ("er_oper_code", "str_if_str"),
+    ("er_oper_name", "str_if_str", "er_oper_code", _dim("er_oper_code")),
+    ("oper_qty", "or_none"),
+    ("oper_cost", "or_none"),
+], "er_oper_item")
+
+opd_oper_item = RowConverter([
+    ("opd_oper_code", "str_if_str", "er_oper_code"),
+    ("opd_oper_name", "str_if_str", "er_oper_code", _dim("er_oper_code")),
+    ("price", "or_none"),
+], "opd_oper_item")
+
+an_item = RowConverter([
+    ("an", "str_if_str"),
+    ("regdate", "isoformat"),
+    ("dchtime", "str_if_str"),
+    ("wname", "str_if_str", "ward_0", _dim("ward")),
+    ("admday", "str_if_str"),
+    ("dname1", "str_if_str", "admdoctor_0", _dim("doctor")),
+    ("pname", "str_if_str", "pttype_0", _dim("pttype")),
+    ("ipname", "str_if_str"),
+    ("prediag", "str_if_str"),
+    ("dchdate", "isoformat"),
+    ("dname2", "str_if_str", "dch_doctor_0", _dim("doctor")),
+    ("dcname", "str_if_str", "dchtype_0", _dim("dchtype")),
+    ("dsname", "str_if_str", "dchstts_0", _dim("dchstts")),
+], "an_item")
+
+ipt_oper_item = RowConverter([
+    ("ref_date", "str_if_str"),
+    ("oper_name", "str_if_str", "ipt_oper_code", _dim("ipt_oper_code")),
+    ("oper_qty", "or_none"),
+    ("total_price", "or_none"),
+], "ipt_oper_item")
+
+# ส่วนหัวของ visit/admit (patient + ovst + opdscreen) ใช้ร่วมกัน
+_visit_header = RowConverter([
+    ("cid", "str"),
+    ("hn", "str", "hn_0"),
+    ("vn", "str", "vn_0"),
+    ("an", "if_str", "an_0"),
+    ("vstdate", "isoformat", "vstdate_0"),
+    ("vsttime", "str_or_none", "vsttime_0"),
+    ("code3", "str", "pdx_0", _icd101(0)),
+    ("tname", "str", "pdx_0", _icd101(1)),
+    ("iname", "str", "pdx_0", _icd101(2)),
+    ("cname", "str", "pttype_0", _dim("pttype")),
+    ("dname", "str", "doctor_0", _dim("doctor")),
+    ("pttypeno", "str"),
+    ("birthday", "isoformat"),
+    ("pnname", "or_none", "spclty_0", _dim("spclty")),
+    ("novstist", "or_none", "ovstist_0", _dim("ovstist")),
+    ("novstost", "or_none", "ovstost_0", _dim("ovstost")),
+] + [
+    (field, "or_none")
+    for field in (
+        "bw", "height", "temperature", "bps", "bpd", "rr", "pulse", "bmi", "fbs",
+        "cc", "hpi", "fh", "pmh", "pe", "pe_ga", "pe_ga_text", "pe_heent", "pe_heent_text",
+        "pe_heart", "pe_heart_text", "pe_lung", "pe_lung_text", "pe_ab", "pe_ab_text",
+    )
+], "visit_header_item")
+
+
+def visit_header_item(row) -> dict:
+    visit = _visit_header(row)
+    so = dimensions.hospitalname()
+    visit["so"] = so if so else None
+    return visit
+
+
+def _group(rows, convert, key: str = "bundle_key") -> dict:
+    grouped = defaultdict(list)
+    for row in rows:
+        grouped[row[key]].append(convert(row))
+    return grouped
+
+
+# ---------------------------------------------------------
+# โหลด bundle ของหลาย visit ในครั้งเดียว
+# keys = [(hn, vn, an), ...] ; an เป็น None ได้ (กรณี OPD)
+# admit=True จะดึง list_an / procedure_an และรวมยาที่ผูกกับ an ด้วย
+# คืนค่า {(hn, vn): {"diagnosis": [...], "drug": [...], ...}}
+# ---------------------------------------------------------
+async def load_clinical_bundle(keys: list, admit: bool = False) -> dict:
+    vns = sorted({vn for _, vn, _ in keys})
+    hns = sorted({hn for hn, _, _ in keys})
+    ans = sorted({an for _, _, an in keys if an}) if admit else []
+
+    queries = {
+        "diag": (SQL_DIAG, {"vns": vns}),
+        "drug": (SQL_DRUG, {"vns": vns, "ans": ans}),
+        "lab": (SQL_LAB, {"vns": vns}),
+        "allergy": (SQL_ALLERGY, {"hns": hns}),
+        "er_oper": (SQL_ER_OPER, {"vns": vns}),
+        "opd_oper": (SQL_OPD_OPER, {"vns": vns}),
+    }
+    if admit:
+        queries["an"] = (SQL_AN, {"vns": vns})
+        queries["ipt_oper"] = (SQL_IPT_OPER, {"ans": ans})
+
+    # โหลด dimension cache (ถ้ายังไม่มี) พร้อมกับ query ของ bundle
+    rows, _ = await asyncio.gather(fetch_concurrently(queries), dimensions.ensure_loaded())
+
+    with timing.phase("convert"):
+        return _build_bundles(rows, keys, admit)
+
+
+def _build_bundles(rows: dict, keys: list, admit: bool) -> dict:
+    # INNER JOIN icd101 เดิม: ตัด diagnosis ที่ไม่มีรหัสใน icd101 ออก
+    diag = _group(
+        (r for r in rows["diag"] if dimensions.has_icd101(r["icd10"])), diagnosis_item
+    )
+    lab = _group(rows["lab"], lab_item)
+    allergy = _group(rows["allergy"], allergy_item)
+    er_oper = _group(rows["er_oper"], er_oper_item)
+    opd_oper = _group(rows["opd_oper"], opd_oper_item)
+    drug_by_vn = _group(rows["drug"], lambda r: r)
+    drug_by_an = _group(rows["drug"], lambda r: r, key="bundle_an")
+    list_an = _group(rows.get("an", []), an_item)
+    ipt_oper = _group(rows.get("ipt_oper", []), ipt_oper_item)
+
+    bundles = {}
+    for hn, vn, an in keys:
+        drug_rows = list(drug_by_vn.get(vn, []))
+        if admit and an:
+            drug_rows += [r for r in drug_by_an.get(an, []) if r["bundle_key"] != vn]
+
+        bundle = {
+            "diagnosis": diag.get(vn, []),
+            "drug": [drug_item(r) for r in drug_rows],
+            "lab": lab.get(vn, []),
+            "allergy": allergy.get(hn, []),
+            "procedure_er": er_oper.get(vn, []),
+            "procedure_opd": opd_oper.get(vn, []),
+        }
+        if admit:
+            bundle["list_an"] = list_an.get(vn, [])
+            bundle["procedure_an"] = ipt_oper.get(an, []) if an else []
+        bundles[(hn, vn)] = bundle
+
+    return bundles
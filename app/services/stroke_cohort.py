@@ -0,0 +1,247 @@
+# app/services/stroke_cohort.py
+#
+# Stroke cohort: ดึงข้อมูล /stroke/StrokeIPD และ /stroke/StrokeOPD แบบ 2 ขั้น
+#   1) keys    เลือกเฉพาะ vn/an ของผู้ป่วย stroke ในวันนั้น (EXISTS ไม่ join ตารางลูก)
+#   2) details ข้อมูลผู้ป่วย + วินิจฉัย และรายการยา (GROUP_CONCAT) เฉพาะ key จากขั้น 1 ยิงพร้อมกัน
+#
+# แบบเดิม join opitemrece/drugitems ก่อน filter แล้วค่อย GROUP BY o.vn
+# ทุกบรรทัดยาคูณแถว diagnosis/ที่อยู่ก่อนถูกรวม (และชื่อยาซ้ำตามจำนวน diagnosis stroke)
+
+import asyncio
+
+from sqlalchemy import text, bindparam
+
+from app.core.config import settings
+from app.core.database import fetch_concurrently
+from app.core.replica import reporting_sessions
+from app.core.pagination import keyset_sql, limit_sql, split_page
+
+def request_connections() -> asyncio.Semaphore:
+    # งบ connection ของ 1 request (ทุกวัน x keys/details/drugs) = DB_FANOUT_PER_REQUEST
+    # เท่ากับที่ admission (_pool_capacity) เผื่อไว้ให้ต่อ request
+    return asyncio.Semaphore(settings.DB_FANOUT_PER_REQUEST)
+
+
+# 1 แถวต่อ vn จึงใช้ vn เป็นคีย์ของ keyset pagination ได้
+PAGE_KEYS = [("o.vn", "vn", "ASC")]
+
+_STROKE_DIAG = "BETWEEN 'I60' AND 'I69'"
+_DRUG_ICODE = "LIKE '1%'"
+
+_PATIENT_COLUMNS = """
+            p.cid,
+            p.pname,
+            p.fname,
+            p.lname,
+            p.sex,
+            p.nationality,
+            p.birthday,
+            CONCAT(p.addrpart,' ',p.road) AS address,
+            p.moopart AS moo,
+            p.tmbpart,
+            p.amppart AS ampart,
+            p.chwpart,
+            p.hometel AS phone,
+            p.informtel AS relation_phone,
+            p.informname AS relation_name"""
+
+
+class StrokeCohort:
+    def __init__(self, name: str, date_field: str, keys_sql: str, details_sql: str,
+                 drugs_sql: str, drug_key: str):
+        self.name = name
+        self.date_field = date_field
+        # keys_sql มีช่อง {page_where} / {order_by} / {page_limit} สำหรับ keyset pagination
+        self.keys_sql = keys_sql
+        self.details = text(details_sql).bindparams(bindparam("vns", expanding=True))
+        # โหมด NDJSON stream details ทีละ chunk จึงต้องเรียงตาม vn จาก DB (ตัดแถวซ้ำของ vn เดียวกันระหว่างอ่าน)
+        self.details_ordered = text(details_sql + "\n        ORDER BY o.vn").bindparams(
+            bindparam("vns", expanding=True)
+        )
+        self.drugs = text(drugs_sql).bindparams(bindparam("keys", expanding=True))
+        # รายการยาผูกกับ vn (OPD) หรือ an (IPD)
+        self.drug_key = drug_key
+
+    async def load(self, day: str, cursor: str = None, limit: int = None,
+                   connections: asyncio.Semaphore = None) -> tuple:
+        # คืนค่า (rows เรียงตาม vn, next_cursor) row เป็น dict ที่มีคอลัมน์เหมือน query เดิม
+        # connections = semaphore ของทั้ง request (request_connections()) ไม่ระบุ = สร้างใหม่ต่อ load
+        connections = connections or request_connections()
+        # keys + details + drugs ของวันเดียวกันอ่านจากฐานเดียวกัน (replica ถ้าพร้อม)
+        sessions = reporting_sessions()
+        keys = await self._keys(day, cursor, limit, sessions, connections)
+        next_cursor = None
+        if limit:
+            keys, next_cursor = split_page(keys, PAGE_KEYS, limit)
+        if not keys:
+            return [], next_cursor
+
+        vns = [row["vn"] for row in keys]
+        drug_keys = list({row[self.drug_key] for row in keys})
+        rows = await fetch_concurrently({
+            "details": (self.details, {"vns": vns}),
+            "drugs": (self.drugs, {"keys": drug_keys}),
+        }, session_factory=sessions, semaphore=connections)
+
+        # ผู้ป่วยที่มีหลาย diagnosis stroke ใช้แถวแรก (เหมือน GROUP BY o.vn เดิม)
+        details = {}
+        for row in rows["details"]:
+            details.setdefault(row["vn"], row)
+        drugs = {row["cohort_key"]: row["drug_name"] for row in rows["drugs"]}
+
+        result = []
+        for key in keys:
+            detail = details.get(key["vn"])
+            if detail is None:
+                continue
+            item = dict(detail)
+            item["drug_name"] = drugs.get(key[self.drug_key])
+            result.append(item)
+        return result, next_cursor
+
+    async def _keys(self, day: str, cursor: str, limit: int, sessions, connections: asyncio.Semaphore) -> list:
+        params = {self.date_field: day}
+        page_where, order_by = keyset_sql(PAGE_KEYS, cursor, params)
+        page_limit = limit_sql(limit, params) if limit else ""
+        keys_sql = text(self.keys_sql.format(
+            page_where=page_where, order_by=order_by, page_limit=page_limit,
+        ))
+        return (await fetch_concurrently(
+            {"keys": (keys_sql, params)}, session_factory=sessions, semaphore=connections,
+        ))["keys"]
+
+    async def stream(self, day: str, connections: asyncio.Semaphore = None):
+        # โหมด NDJSON: อ่าน keys + รายการยา (เล็ก) ก่อน แล้วคืน async generator ที่ stream details จาก DB
+        # (yield_per เหมือน _stream_rows) ทีละ chunk เรียงตาม vn ผลเหมือน rows() ไม่ต้องถือทั้งวันไว้ในหน่วยความจำ
+        # ไม่มีผู้ป่วยในวันนั้น -> None
+        connections = connections or request_connections()
+        sessions = reporting_sessions()
+        keys = await self._keys(day, None, None, sessions, connections)
+        if not keys:
+            return None
+        drug_keys = list({row[self.drug_key] for row in keys})
+        rows = await fetch_concurrently(
+            {"drugs": (self.drugs, {"keys": drug_keys})}, session_factory=sessions, semaphore=connections,
+        )
+        drugs = {row["cohort_key"]: row["drug_name"] for row in rows["drugs"]}
+        return self._stream_details([row["vn"] for row in keys], drugs, sessions, connections)
+
+    async def _stream_details(self, vns: list, drugs: dict, sessions, connections: asyncio.Semaphore):
+        async with connections:
+            async with sessions() as session:
+                result = await session.stream(
+                    self.details_ordered, {"vns": vns},
+                    execution_options={"yield_per": settings.STREAM_CHUNK_SIZE},
+                )
+                seen = set()
+                async for partition in result.mappings().partitions():
+                    batch = []
+                    for row in partition:
+                        # ผู้ป่วยที่มีหลาย diagnosis stroke ใช้แถวแรก (เหมือน load)
+                        if row["vn"] in seen:
+                            continue
+                        seen.add(row["vn"])
+                        item = dict(row)
+                        item["drug_name"] = drugs.get(row[self.drug_key])
+                        batch.append(item)
+                    if batch:
+                        yield batch
+
+    async def rows(self, day: str, connections: asyncio.Semaphore = None) -> list:
+        return (await self.load(day, connections=connections))[0]
+
+    async def load_days(self, days: list, parallelism: int, connections: asyncio.Semaphore = None) -> list:
+        # โหมดช่วงวันที่: ทีละวันพร้อมกันไม่เกิน parallelism แล้วรวมผลเรียงตามวัน
+        # ทุกวันใช้ connections ร่วมกัน: query ย่อยของทุกวันรวมกันไม่เกิน DB_FANOUT_PER_REQUEST connection
+        semaphore = asyncio.Semaphore(parallelism)
+        connections = connections or request_connections()
+
+        async def one(day):
+            async with semaphore:
+                return await self.rows(day, connections)
+
+        results = await asyncio.gather(*(one(day) for day in days))
+        return [row for rows in results for row in rows]
+
+
+STROKE_IPD = StrokeCohort(
+    "stroke_ipd",
+    "dchdate",
+    keys_sql=f"""
+        SELECT o.vn, i.an
+        FROM ipt i
+        INNER JOIN ovst o ON o.an = i.an
+        WHERE i.dchdate = :dchdate
+            AND i.dchdate IS NOT NULL
+            AND i.dchdate != ''
+            AND EXISTS (SELECT 1 FROM iptdiag id WHERE id.an = i.an AND id.icd10 {_STROKE_DIAG})
+            AND EXISTS (SELECT 1 FROM opitemrece r WHERE r.an = i.an AND r.icode {_DRUG_ICODE})
+            {{page_where}}
+        {{order_by}} {{page_limit}}
+    """,
+    details_sql=f"""
+        SELECT
+            o.hcode AS hospcode,
+            o.vstdate,
+            o.hn,
+            o.vn,
+            o.an,
+            id.icd10,
+            i.regdate,
+            DATE(id.modify_datetime) AS dxdate,
+            i.dchdate,
+            i.dchtype,{_PATIENT_COLUMNS}
+        FROM ovst o
+        INNER JOIN ipt i ON i.an = o.an
+        INNER JOIN iptdiag id ON id.an = i.an AND id.icd10 {_STROKE_DIAG}
+        LEFT JOIN patient p ON p.hn = i.hn
+        WHERE o.vn IN :vns
+    """,
+    drugs_sql=f"""
+        SELECT r.an AS cohort_key, GROUP_CONCAT(di.sticker_short_name SEPARATOR '|') AS drug_name
+        FROM opitemrece r
+        LEFT JOIN drugitems di ON di.icode = r.icode
+        WHERE r.an IN :keys AND r.icode {_DRUG_ICODE}
+        GROUP BY r.an
+    """,
+    drug_key="an",
+)
+
+STROKE_OPD = StrokeCohort(
+    "stroke_opd",
+    "vstdate",
+    keys_sql=f"""
+        SELECT o.vn
+        FROM ovst o
+        WHERE o.vstdate = :vstdate
+            AND o.an IS NULL
+            AND EXISTS (SELECT 1 FROM ovstdiag id WHERE id.vn = o.vn AND id.icd10 {_STROKE_DIAG})
+            AND EXISTS (SELECT 1 FROM opitemrece r WHERE r.vn = o.vn AND r.icode {_DRUG_ICODE})
+            {{page_where}}
+        {{order_by}} {{page_limit}}
+    """,
+    details_sql=f"""
+        SELECT
+            o.hcode AS hospcode,
+            o.vstdate,
+            o.hn,
+            o.vn,
+            id.icd10,
+            o.vstdate AS regdate,
+            DATE(CONCAT(id.vstdate,' ',id.vsttime)) AS dxdate,
+            o.vstdate AS dchdate,
+            o.ovstost,{_PATIENT_COLUMNS}
+        FROM ovst o
+        INNER JOIN ovstdiag id ON id.vn = o.vn AND id.icd10 {_STROKE_DIAG}
+        LEFT JOIN patient p ON p.hn = o.hn
+        WHERE o.vn IN :vns
+    """,
+    drugs_sql=f"""
+        SELECT r.vn AS cohort_key, GROUP_CONCAT(di.sticker_short_name SEPARATOR '|') AS drug_name
+        FROM opitemrece r
+        LEFT JOIN drugitems di ON di.icode = r.icode
+        WHERE r.vn IN :keys AND r.icode {_DRUG_ICODE}
+        GROUP BY r.vn
+    """,
+    drug_key="vn",
+)
@@ -0,0 +1,128 @@
+# benchmarks/bench_converters.py
+#
+# Micro-benchmark: แปลง row -> item ของ /rti/accident และ diagnosis/allergy ของ HIE
+#   before  = ฟังก์ชันเขียนมือแบบเดิม (str(row[x]) if row[x] else None / str(x) if str(x) else None)
+#   after   = RowConverter (compile จาก spec) แบบทีละ row และแบบทั้ง batch (index)
+#
+# ใช้ SQLite ในหน่วยความจำ เพื่อให้ได้ Row/RowMapping ของ SQLAlchemy จริง ไม่ต้องต่อ HOSxP
+#
+#   python -m benchmarks.bench_converters [--rows 20000] [--repeat 5]
+
+import argparse
+import datetime
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Date, create_engine, text
+
+from app.api.v1.models.rti_model import RTIAccidentItem
+from app.core.converters import RowConverter, spec_from_model
+
+RTI_STR_FIELDS = ("HOSPCODE", "PID", "SEQ", "DATETIME_SERV")
+
+
+def legacy_accident_item():
+    # ฟังก์ชันเดิมเขียนมือทีละ field (33 นิพจน์) สร้างด้วยโค้ดเพื่อไม่ต้องคัดลอกทั้งก้อน
+    lines = ["def legacy(row):", "    return {"]
+    for field in RTIAccidentItem.model_fields:
+        if field in RTI_STR_FIELDS:
+            lines.append(f"        {field!r}: str(row[{field!r}]),")
+        else:
+            lines.append(f"        {field!r}: str(row[{field!r}]) if row[{field!r}] else None,")
+    lines.append("    }")
+    namespace = {}
+    exec("\n".join(lines), namespace)
+    return namespace["legacy"]
+
+
+def legacy_allergy_item(row) -> dict:
+    return {
+        "report_date": row["report_date"].isoformat() if row["report_date"] else None,
+        "agent": str(row["agent"]) if str(row["agent"]) else None,
+        "symptom": str(row["symptom"]) if str(row["symptom"]) else None,
+        "department": str(row["department"]) if str(row["department"]) else None,
+    }
+
+
+def seed(engine, rows: int):
+    fields = list(RTIAccidentItem.model_fields)
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE rti ({', '.join(f + ' TEXT' for f in fields)})"))
+        conn.execute(
+            text(f"INSERT INTO rti VALUES ({', '.join(':' + f for f in fields)})"),
+            [
+                {f: (None if (i + j) % 4 == 0 else f"{f}-{i}") for j, f in enumerate(fields)}
+                for i in range(rows)
+            ],
+        )
+        conn.execute(text("CREATE TABLE allergy (report_date DATE, agent TEXT, symptom TEXT, department TEXT)"))
+        conn.execute(
+            text("INSERT INTO allergy VALUES (:d, :a, :s, :p)"),
+            [
+                {"d": datetime.date(2025, 1, 1 + i % 28) if i % 3 else None,
+                 "a": f"agent {i}", "s": "" if i % 5 == 0 else f"symptom {i}", "p": None if i % 2 else "ER"}
+                for i in range(rows)
+            ],
+        )
+
+
+def bench(label: str, fn, rows: int, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"  {label:<38} {rows / best:>12,.0f} rows/s  ({best * 1000:8.1f} ms)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    seed(engine, args.rows)
+
+    with engine.connect() as conn:
+        accident = conn.execute(text("SELECT * FROM rti"))
+        accident_keys, accident_rows = accident.keys(), accident.all()
+        accident_mappings = [row._mapping for row in accident_rows]
+
+        allergy = conn.execute(text("SELECT * FROM allergy").columns(report_date=Date))
+        allergy_keys, allergy_rows = allergy.keys(), allergy.all()
+        allergy_mappings = [row._mapping for row in allergy_rows]
+
+    legacy = legacy_accident_item()
+    accident_converter = RowConverter(
+        spec_from_model(RTIAccidentItem, "str_or_none", {f: "str" for f in RTI_STR_FIELDS}),
+        "accident_item",
+    )
+    allergy_converter = RowConverter([
+        ("report_date", "isoformat"),
+        ("agent", "str_if_str"),
+        ("symptom", "str_if_str"),
+        ("department", "str_if_str"),
+    ], "allergy_item")
+
+    # ผลลัพธ์ต้องเท่ากันก่อนเทียบความเร็ว
+    assert [legacy(r) for r in accident_mappings] == accident_converter.convert_batch(accident_rows, accident_keys)
+    assert [legacy_allergy_item(r) for r in allergy_mappings] == allergy_converter.convert_batch(allergy_rows, allergy_keys)
+
+    n = args.rows
+    print(f"RTI accident item ({len(accident_keys)} fields, {n:,} rows)")
+    bench("before: hand-written, by name", lambda: [legacy(r) for r in accident_mappings], n, args.repeat)
+    bench("after:  compiled, by name", lambda: [accident_converter(r) for r in accident_mappings], n, args.repeat)
+    bench("after:  compiled batch, by index", lambda: accident_converter.convert_batch(accident_rows, accident_keys), n, args.repeat)
+
+    print(f"HIE allergy item (str(x) if str(x) else None, {n:,} rows)")
+    bench("before: hand-written, by name", lambda: [legacy_allergy_item(r) for r in allergy_mappings], n, args.repeat)
+    bench("after:  compiled, by name", lambda: [allergy_converter(r) for r in allergy_mappings], n, args.repeat)
+    bench("after:  compiled batch, by index", lambda: allergy_converter.convert_batch(allergy_rows, allergy_keys), n, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+# benchmarks/bench_security.py
+#
+# Micro-benchmark: ค่าใช้จ่ายของการตรวจสิทธิ์ต่อ request (api_security + get_header_security)
+#   before  = ตรวจแบบเดิม (สร้าง set IP จาก settings ทุก request, เทียบ key ด้วย !=)
+#   after   = SecurityPolicy ที่สร้างครั้งเดียว (hash key + compare_digest, IP/CIDR จาก cache)
+# get_header_security: resolve dependency ผ่าน FastAPI (solve_dependencies) เหมือนตอนรับ request จริง
+#   before  = Header(...) 2 ตัว + สร้าง pydantic model HeaderSecurity
+#   after   = อ่านจาก request.headers ตรงๆ คืน NamedTuple
+#
+#   python -m benchmarks.bench_security [--calls 200000] [--repeat 5] [--networks 20]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from contextlib import AsyncExitStack
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import harness
+
+
+def legacy_check(settings, request, body_hospcode: str):
+    # _check_api_security เดิม (ก่อนใช้ SecurityPolicy)
+    from fastapi import HTTPException
+    from app.core.security import get_client_ip
+
+    x_api_key = request.headers.get("x-api-key")
+    hospcode_header = request.headers.get("x-hospcode")
+    if x_api_key is None:
+        raise HTTPException(status_code=401, detail="Missing X-API-KEY header")
+    if x_api_key != settings.API_KEY:
+        raise HTTPException(status_code=403, detail="Invalid API Key")
+    if hospcode_header != body_hospcode:
+        raise HTTPException(status_code=400, detail="Hospcode mismatch")
+    if settings.HOSP_CODE != body_hospcode:
+        raise HTTPException(status_code=400, detail="Hospcode not allowed")
+    client_ip = get_client_ip(request)
+    allowed_ips = {settings.API_ALLOWED_IP1, settings.API_ALLOWED_IP2}
+    allowed_ips = {ip for ip in allowed_ips if ip}
+    if client_ip not in allowed_ips:
+        raise HTTPException(status_code=403, detail=f"IP {client_ip} is not allowed")
+    return True
+
+
+def legacy_header_dependency():
+    # get_header_security เดิม (Header(...) + pydantic model)
+    from fastapi import Header
+    from pydantic import BaseModel, Field
+
+    class LegacyHeaderSecurity(BaseModel):
+        x_api_key: str = Field(..., description="API key")
+        x_hospcode: str = Field(..., description="Hospcode")
+
+    async def get_header_security(
+        x_api_key: str = Header(..., alias="x-api-key"),
+        x_hospcode: str = Header(..., alias="x-hospcode")
+    ):
+        return LegacyHeaderSecurity(x_api_key=x_api_key, x_hospcode=x_hospcode)
+
+    return get_header_security
+
+
+def bench_dependency(label: str, dependency, calls: int, repeat: int):
+    from fastapi import Depends, Request
+    from fastapi.dependencies.utils import get_dependant, solve_dependencies
+
+    async def endpoint(request: Request, headers=Depends(dependency)):
+        pass
+
+    dependant = get_dependant(path="/api/v1/hie/patient", call=endpoint)
+
+    async def run():
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(calls):
+                async with AsyncExitStack() as stack:
+                    request = make_request(harness.CLIENT_IP, forwarded=False)
+                    request.scope["fastapi_inner_astack"] = request.scope["fastapi_function_astack"] = stack
+                    solved = await solve_dependencies(
+                        request=request, dependant=dependant, async_exit_stack=stack, embed_body_fields=False,
+                    )
+                    assert not solved.errors
+            best = min(best, time.perf_counter() - started)
+        return best
+
+    best = asyncio.run(run())
+    print(f"  {label:<46} {best / calls * 1e6:8.2f} us/call")
+
+
+def make_request(client_ip: str, forwarded: bool):
+    from starlette.requests import Request
+
+    headers = [
+        (b"x-api-key", harness.API_KEY.encode()),
+        (b"x-hospcode", harness.HOSPCODE.encode()),
+        (b"content-type", b"application/json"),
+        (b"user-agent", b"benchmark"),
+    ]
+    if forwarded:
+        headers.append((b"x-forwarded-for", f"{client_ip}, 10.0.0.1".encode()))
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/v1/hie/patient", "query_string": b"",
+        "headers": headers, "client": ("10.0.0.1" if forwarded else client_ip, 50000),
+    }
+    return Request(scope)
+
+
+def bench(label: str, fn, calls: int, repeat: int):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, time.perf_counter() - started)
+    print(f"  {label:<46} {best / calls * 1e6:8.2f} us/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ค่าใช้จ่ายของการตรวจสิทธิ์ต่อ request")
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--networks", type=int, default=20, help="จำนวนช่วง CIDR ใน API_ALLOWED_IPS")
+    args = parser.parse_args()
+
+    harness.configure_env(os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin.sqlite"))
+    os.environ["API_KEYS"] = ",".join(f"other-key-{i}" for i in range(3))
+    os.environ["API_ALLOWED_IPS"] = ",".join(f"10.{i}.0.0/16" for i in range(args.networks))
+    # proxy ของ make_request(forwarded=True) ต้องอยู่ใน TRUSTED_PROXIES ไม่งั้นไม่อ่าน X-Forwarded-For
+    os.environ["TRUSTED_PROXIES"] = "10.0.0.1"
+
+    from app.core.config import settings
+    from app.core.security import _check_api_security, policy
+    from app.api.v1.deps.header import get_header_security
+
+    direct = make_request(harness.CLIENT_IP, forwarded=False)
+    proxied = make_request(harness.CLIENT_IP, forwarded=True)
+    cidr = make_request(f"10.{args.networks - 1}.1.2", forwarded=False)
+    hospcode = harness.HOSPCODE
+
+    # ผลต้องเหมือนเดิมก่อนเทียบความเร็ว
+    assert legacy_check(settings, direct, hospcode) and _check_api_security(direct, hospcode)
+    assert _check_api_security(cidr, hospcode)
+
+    print(f"api_security ({len(policy.key_digests)} keys, {len(policy.addresses)} IPs, {len(policy.networks)} networks)")
+    bench("before: direct client", lambda: legacy_check(settings, direct, hospcode), args.calls, args.repeat)
+    bench("after:  direct client", lambda: _check_api_security(direct, hospcode), args.calls, args.repeat)
+    bench("before: behind proxy (X-Forwarded-For)", lambda: legacy_check(settings, proxied, hospcode), args.calls, args.repeat)
+    bench("after:  behind proxy (X-Forwarded-For)", lambda: _check_api_security(proxied, hospcode), args.calls, args.repeat)
+    bench("after:  client in last CIDR network", lambda: _check_api_security(cidr, hospcode), args.calls, args.repeat)
+    policy.ip_allowed.cache_clear()
+    bench("after:  CIDR lookup, cache cleared each call",
+          lambda: (policy.ip_allowed.cache_clear(), _check_api_security(cidr, hospcode)), args.calls // 10, args.repeat)
+
+    print("get_header_security (solve_dependencies)")
+    bench_dependency("before: Header(...) + pydantic model", legacy_header_dependency(), args.calls // 10, args.repeat)
+    bench_dependency("after:  request.headers + NamedTuple", get_header_security, args.calls // 10, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
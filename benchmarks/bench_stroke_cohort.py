@@ -0,0 +1,158 @@
+# benchmarks/bench_stroke_cohort.py
+#
+# เทียบ query ของ /stroke/StrokeIPD และ /stroke/StrokeOPD
+#   legacy  = query เดียวแบบเดิม (join opitemrece/drugitems ก่อน filter แล้ว GROUP BY o.vn)
+#   cohort  = app/services/stroke_cohort.py (keys -> details + drugs เฉพาะ key)
+# รันกับฐานข้อมูลจำลอง (hosxp_standin) ทุกวันที่มีข้อมูล รายงานเวลาต่อวัน (p50/max)
+# และจำนวนแถวที่ join ได้ก่อน GROUP BY ของแบบเดิม เทียบกับจำนวนแถวที่แบบ cohort ดึงจริง
+#
+#   python -m benchmarks.bench_stroke_cohort [--repeat 5] [--patients 5000 --reseed]
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import harness, hosxp_standin
+
+_LEGACY_FROM = {
+    "ipd": """
+        FROM ovst o
+        INNER JOIN ipt i ON i.an = o.an
+        LEFT JOIN opitemrece r ON r.an = o.an
+        LEFT JOIN drugitems di ON di.icode = r.icode
+        LEFT JOIN iptdiag id ON id.an = i.an
+        LEFT JOIN patient p ON p.hn = i.hn
+        LEFT JOIN icd10 i1 ON i1.code = id.icd10
+        WHERE i.dchdate = :day
+            AND i.dchdate IS NOT NULL
+            AND i.dchdate != ''
+            AND id.icd10 BETWEEN 'I60' AND 'I69'
+            AND r.icode LIKE '1%'
+    """,
+    "opd": """
+        FROM ovst o
+        LEFT JOIN opitemrece r ON r.vn = o.vn
+        LEFT JOIN drugitems di ON di.icode = r.icode
+        LEFT JOIN ovstdiag id ON id.vn = o.vn
+        LEFT JOIN patient p ON p.hn = o.hn
+        LEFT JOIN icd10 i1 ON i1.code = id.icd10
+        WHERE o.vstdate = :day
+            AND id.icd10 BETWEEN 'I60' AND 'I69'
+            AND r.icode LIKE '1%'
+            AND o.an IS NULL
+    """,
+}
+
+_LEGACY_SELECT = {
+    "ipd": """
+        SELECT o.hcode AS hospcode, o.vstdate, p.cid, o.hn, o.vn, p.pname, p.fname, p.lname, o.an,
+            p.sex, p.nationality, p.birthday, id.icd10, i.regdate, DATE(id.modify_datetime) AS dxdate,
+            i.dchdate, i.dchtype, CONCAT(p.addrpart,' ',p.road) AS address, p.moopart AS moo,
+            p.tmbpart, p.amppart AS ampart, p.chwpart, p.hometel AS phone, p.informtel AS relation_phone,
+            p.informname AS relation_name, GROUP_CONCAT(di.sticker_short_name SEPARATOR '|') AS drug_name
+    """,
+    "opd": """
+        SELECT o.hcode AS hospcode, o.vstdate, p.cid, o.hn, o.vn, p.pname, p.fname, p.lname,
+            p.sex, p.nationality, p.birthday, id.icd10, o.vstdate AS regdate,
+            DATE(CONCAT(id.vstdate,' ',id.vsttime)) AS dxdate, o.vstdate AS dchdate, o.ovstost,
+            CONCAT(p.addrpart,' ',p.road) AS address, p.moopart AS moo, p.tmbpart, p.amppart AS ampart,
+            p.chwpart, p.hometel AS phone, p.informtel AS relation_phone, p.informname AS relation_name,
+            GROUP_CONCAT(di.sticker_short_name SEPARATOR '|') AS drug_name
+    """,
+}
+
+
+async def _timed(fn, repeat: int) -> tuple:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = await fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return result, timings
+
+
+async def bench(kind: str, days: list, repeat: int) -> dict:
+    from sqlalchemy import text
+    from app.core.database import async_session_factory
+    from app.services.stroke_cohort import STROKE_IPD, STROKE_OPD
+
+    cohort = STROKE_IPD if kind == "ipd" else STROKE_OPD
+    legacy_sql = text(_LEGACY_SELECT[kind] + _LEGACY_FROM[kind] + " GROUP BY o.vn")
+    joined_sql = text("SELECT COUNT(*) " + _LEGACY_FROM[kind])
+
+    legacy_ms, cohort_ms = [], []
+    rows = joined = fetched = mismatched = 0
+    async with async_session_factory() as session:
+        for day in days:
+            async def legacy():
+                return (await session.execute(legacy_sql, {"day": day})).mappings().all()
+
+            old, timings = await _timed(legacy, repeat)
+            legacy_ms.append(statistics.median(timings))
+            new, timings = await _timed(lambda: cohort.rows(day), repeat)
+            cohort_ms.append(statistics.median(timings))
+
+            rows += len(new)
+            joined += (await session.execute(joined_sql, {"day": day})).scalar()
+            # แถวที่แบบ cohort ดึงจริง = keys + details + drugs (1 ต่อ key)
+            fetched += len(new) * 2 + sum(1 for r in new if r["drug_name"])
+            if sorted(r["vn"] for r in old) != sorted(r["vn"] for r in new):
+                mismatched += 1
+
+    return {
+        "endpoint": f"Stroke{kind.upper()}",
+        "days": len(days),
+        "rows": rows,
+        "legacy_p50_ms": statistics.median(legacy_ms) if legacy_ms else 0.0,
+        "legacy_max_ms": max(legacy_ms, default=0.0),
+        "cohort_p50_ms": statistics.median(cohort_ms) if cohort_ms else 0.0,
+        "cohort_max_ms": max(cohort_ms, default=0.0),
+        "joined_rows": joined,
+        "fetched_rows": fetched,
+        "mismatched_days": mismatched,
+    }
+
+
+async def main(args):
+    harness.configure_env(args.db)
+    from app.core.database import engine
+    hosxp_standin.attach(engine)
+
+    keys = hosxp_standin.sample_keys(args.db)
+    results = [
+        await bench("ipd", keys["dchdates"], args.repeat),
+        await bench("opd", keys["vstdates"], args.repeat),
+    ]
+
+    header = (f"{'endpoint':<10} {'days':>5} {'rows':>6} {'legacy p50':>11} {'legacy max':>11} "
+              f"{'cohort p50':>11} {'cohort max':>11} {'speedup':>8} {'joined':>8} {'fetched':>8}  same vn")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        speedup = r["legacy_p50_ms"] / r["cohort_p50_ms"] if r["cohort_p50_ms"] else 0.0
+        print(
+            f"{r['endpoint']:<10} {r['days']:>5} {r['rows']:>6} {r['legacy_p50_ms']:>11.2f} {r['legacy_max_ms']:>11.2f} "
+            f"{r['cohort_p50_ms']:>11.2f} {r['cohort_max_ms']:>11.2f} {speedup:>7.2f}x {r['joined_rows']:>8} "
+            f"{r['fetched_rows']:>8}  {'yes' if not r['mismatched_days'] else 'NO (' + str(r['mismatched_days']) + ' days)'}"
+        )
+    print("เวลาเป็น ms ต่อวัน (median ของ --repeat รอบ) / joined = แถวก่อน GROUP BY ของแบบเดิม")
+
+    await engine.dispose()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="เทียบ query Stroke แบบเดิมกับแบบ cohort 2 ขั้น")
+    harness.add_seed_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=5, help="จำนวนรอบต่อวัน (ใช้ median)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    harness.ensure_seeded(args)
+    asyncio.run(main(args))
@@ -0,0 +1,126 @@
+# benchmarks/bench_workers.py
+#
+# วัดผลของจำนวน worker: รัน launcher จริง (app/server.py ผ่าน benchmarks.standin_app) ทีละ SERVER_WORKERS
+# แล้วยิง HTTP ผ่าน TCP (keep-alive) ด้วย scenario เดียวกับ harness รายงาน rps / p50 / p95 / p99 ต่อจำนวน worker
+# ตัวเลขขึ้นกับจำนวน core ของเครื่องที่รัน (worker มากกว่า core ไม่ช่วย)
+#
+#   python -m benchmarks.bench_workers                          # workers 1 2 4
+#   python -m benchmarks.bench_workers --workers 1 2 4 8 --only hie/patient stroke --concurrency 16
+#   python -m benchmarks.bench_workers --loop asyncio --http h11 # เทียบกับ uvloop / httptools
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import harness, hosxp_standin
+
+
+async def wait_ready(client, process, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            response = await client.get("/api/v1/monitor/status")
+            if response.status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"server not ready after {timeout}s")
+
+
+async def bench_workers(workers: int, selected: list, args) -> list:
+    import httpx
+
+    env = dict(os.environ)
+    env.update({
+        "SERVER_WORKERS": str(workers),
+        "SERVER_HOST": "127.0.0.1",
+        "APP_PORT": str(args.port),
+        "SERVER_ACCESS_LOG": "false",
+    })
+    if args.loop:
+        env["SERVER_LOOP"] = args.loop
+    if args.http:
+        env["SERVER_HTTP"] = args.http
+
+    process = subprocess.Popen([sys.executable, "-m", "benchmarks.standin_app"], env=env)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = []
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=None) as client:
+            started = time.perf_counter()
+            await wait_ready(client, process, args.ready_timeout)
+            print(f"workers={workers} ready in {time.perf_counter() - started:.1f}s", flush=True)
+            for i, scenario in enumerate(selected):
+                result = await harness.run_scenario(
+                    client, scenario, args.requests, args.concurrency, args.warmup, args.seed + i
+                )
+                result["workers"] = workers
+                results.append(result)
+    finally:
+        # SIGTERM = graceful shutdown แบบเดียวกับ docker stop
+        process.terminate()
+        try:
+            process.wait(timeout=60)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return results
+
+
+def print_table(results: list):
+    baseline = {r["scenario"]: r["rps"] for r in results if r["workers"] == min(x["workers"] for x in results)}
+    header = f"{'scenario':<22} {'workers':>7} {'rps':>9} {'scale':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  status"
+    print(header)
+    print("-" * len(header))
+    for r in sorted(results, key=lambda r: (r["scenario"], r["workers"])):
+        base = baseline.get(r["scenario"])
+        scale = r["rps"] / base if base else 0.0
+        status = " ".join(f"{code}x{n}" for code, n in sorted(r["status"].items()))
+        print(
+            f"{r['scenario']:<22} {r['workers']:>7} {r['rps']:>9.1f} {scale:>6.2f}x {r['p50_ms']:>9.2f} "
+            f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f}  {status}"
+        )
+
+
+async def main(args):
+    harness.configure_env(args.db)
+    keys = hosxp_standin.sample_keys(args.db)
+    selected = [
+        s for s in harness.scenarios(keys)
+        if any(s[0].startswith(o) or s[1] == o for o in args.only)
+    ]
+
+    results = []
+    for workers in args.workers:
+        results.extend(await bench_workers(workers, selected, args))
+    print(f"cpu count: {os.cpu_count()}")
+    print_table(results)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="วัด throughput ตามจำนวน worker ของ app/server.py")
+    harness.add_seed_arguments(parser)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--port", type=int, default=18181)
+    parser.add_argument("--loop", choices=["auto", "uvloop", "asyncio"])
+    parser.add_argument("--http", choices=["auto", "httptools", "h11"])
+    parser.add_argument("--requests", type=int, default=400, help="จำนวน request ต่อ scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", nargs="+", default=["hie/patient", "hie/visit", "stroke", "rti/accident"],
+                        help="เลือก scenario ตามชื่อขึ้นต้นหรือ group")
+    parser.add_argument("--ready-timeout", type=float, default=60.0)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    harness.ensure_seeded(args)
+    asyncio.run(main(args))
@@ -0,0 +1,242 @@
+# benchmarks/harness.py
+#
+# Benchmark แบบ offline: seed ฐานข้อมูลจำลอง (hosxp_standin) แล้วยิงทุก endpoint ของ /api/v1
+# ในโปรเซสเดียวกันผ่าน httpx ASGITransport (ไม่ผ่าน network) รายงาน throughput และ p50/p95/p99
+#
+#   python -m benchmarks.harness                              # ค่าเริ่มต้น
+#   python -m benchmarks.harness --patients 5000 --rti-per-day 2000 --reseed
+#   python -m benchmarks.harness --only rti --requests 500 --concurrency 16
+#   python -m benchmarks.harness --json result.json           # เก็บผลไว้เทียบกับรอบถัดไป
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import hosxp_standin
+
+HOSPCODE = "10815"
+API_KEY = "benchmark"
+CLIENT_IP = "127.0.0.1"
+
+# ค่าที่ harness ต้องกำหนดเอง (ทับ .env) ส่วนค่าอื่นใช้จาก .env ถ้ามี
+_FORCED_ENV = {
+    "API_KEY": API_KEY,
+    "API_ALLOWED_IP1": CLIENT_IP,
+    "HOSP_CODE": HOSPCODE,
+}
+_DEFAULT_ENV = {
+    "APP_NAME": "benchmark", "APP_ENV": "benchmark", "APP_PORT": "18080",
+    "API_ALLOWED_IP2": "", "HOSP_CODE9": "EA0010815", "HOSP_NAME": "benchmark",
+    "DB_HOST": "standin", "DB_PORT": "0", "DB_USER": "-", "DB_PASS": "-", "DB_NAME": "-",
+    "DB_DRIVER": "-",
+    # ยิงจาก IP เดียวด้วย concurrency สูง วัดตัวแอปไม่ใช่ rate limit (เปิดเองได้ด้วย ADMISSION_ENABLED=true)
+    "ADMISSION_ENABLED": "false",
+}
+
+
+def configure_env(db_path: str):
+    # ต้องเรียกก่อน import app (settings / engine อ่านค่าตอน import)
+    os.environ.update(_FORCED_ENV)
+    os.environ["DB_URL"] = hosxp_standin.database_url(db_path)
+    for key, value in _DEFAULT_ENV.items():
+        os.environ.setdefault(key, value)
+
+
+def ensure_seeded(args):
+    if getattr(args, "reseed", False) and os.path.exists(args.db):
+        os.remove(args.db)
+    if not os.path.exists(args.db):
+        started = time.perf_counter()
+        hosxp_standin.seed(
+            args.db, patients=args.patients, visits_per_patient=args.visits_per_patient,
+            days=args.days, rti_per_day=args.rti_per_day, places=args.places, seed_value=args.seed,
+        )
+        print(f"seeded {args.db} in {time.perf_counter() - started:.1f}s")
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    # nearest-rank
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+# ---------------------------------------------------------
+# Scenario: (ชื่อ, group, method, path, สร้าง request จาก rnd, headers เพิ่มเติม)
+# ---------------------------------------------------------
+def scenarios(keys: dict) -> list:
+    visits, admits = keys["visits"], keys["admits"] or keys["visits"]
+    vstdates, dchdates, rti_days = keys["vstdates"], keys["dchdates"] or keys["vstdates"], keys["rti_days"]
+    first_day = vstdates[0]
+
+    def visit(rnd):
+        cid, hn, vn, an, vstdate = rnd.choice(visits)
+        return {"hospcode": HOSPCODE, "cid": cid, "hn": hn, "vn": vn, "vstdate": vstdate}
+
+    def admit(rnd):
+        cid, hn, vn, an, vstdate = rnd.choice(admits)
+        return {"hospcode": HOSPCODE, "cid": cid, "hn": hn, "vn": vn, "an": an, "vstdate": vstdate}
+
+    def patient(rnd):
+        return {"hospcode": HOSPCODE, "cid": rnd.choice(visits)[0]}
+
+    def service(rnd):
+        cid, hn, _, _, _ = rnd.choice(visits)
+        return {"hospcode": HOSPCODE, "cid": cid, "hn": hn, "vstdate": first_day}
+
+    def batch(rnd):
+        cid, hn, _, _, _ = rnd.choice(visits)
+        own = [v for v in visits if v[0] == cid]
+        return {"hospcode": HOSPCODE, "cid": cid, "visits": [{"hn": v[1], "vn": v[2]} for v in own]}
+
+    ndjson = {"accept": "application/x-ndjson"}
+    return [
+        ("hie/patient", "hie", "POST", "/api/v1/hie/patient", patient, None),
+        ("hie/service", "hie", "POST", "/api/v1/hie/service", service, None),
+        ("hie/visit", "hie", "POST", "/api/v1/hie/visit", visit, None),
+        ("hie/admit", "hie", "POST", "/api/v1/hie/admit", admit, None),
+        ("hie/visits/batch", "hie", "POST", "/api/v1/hie/visits/batch", batch, None),
+        ("stroke/StrokeIPD", "stroke", "POST", "/api/v1/stroke/StrokeIPD",
+         lambda rnd: {"hospcode": HOSPCODE, "dchdate": rnd.choice(dchdates)}, None),
+        ("stroke/StrokeOPD", "stroke", "POST", "/api/v1/stroke/StrokeOPD",
+         lambda rnd: {"hospcode": HOSPCODE, "vstdate": rnd.choice(vstdates)}, None),
+        ("rti/accident", "rti", "POST", "/api/v1/rti/accident",
+         lambda rnd: {"hospcode": HOSPCODE, "vstdate": rnd.choice(rti_days)}, None),
+        ("rti/accident ndjson", "rti", "POST", "/api/v1/rti/accident",
+         lambda rnd: {"hospcode": HOSPCODE, "vstdate": rnd.choice(rti_days)}, ndjson),
+        ("rti/place", "rti", "POST", "/api/v1/rti/place", lambda rnd: {"hospcode": HOSPCODE}, None),
+        ("epidem/ping", "epidem", "GET", "/api/v1/epidem/ping", None, None),
+        ("monitor/status", "monitor", "GET", "/api/v1/monitor/status", None, None),
+        ("monitor/database", "monitor", "GET", "/api/v1/monitor/database", None, None),
+        ("monitor/pool", "monitor", "GET", "/api/v1/monitor/pool", None, None),
+        ("monitor/cache", "monitor", "GET", "/api/v1/monitor/cache", None, None),
+    ]
+
+
+async def run_scenario(client, scenario, requests: int, concurrency: int, warmup: int, seed: int) -> dict:
+    name, _, method, path, make_body, extra_headers = scenario
+    rnd = random.Random(seed)
+    headers = {"x-api-key": API_KEY, "x-hospcode": HOSPCODE, **(extra_headers or {})}
+    bodies = [make_body(rnd) if make_body else None for _ in range(requests + warmup)]
+
+    async def call(body):
+        started = time.perf_counter()
+        response = await client.request(method, path, json=body, headers=headers)
+        await response.aread()
+        return time.perf_counter() - started, response.status_code, len(response.content)
+
+    for body in bodies[:warmup]:
+        await call(body)
+
+    queue = list(reversed(bodies[warmup:]))
+    latencies, statuses, size = [], {}, 0
+
+    async def worker():
+        nonlocal size
+        while queue:
+            elapsed, status, length = await call(queue.pop())
+            latencies.append(elapsed)
+            statuses[status] = statuses.get(status, 0) + 1
+            size += length
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "rps": round(len(latencies) / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "avg_kb": round(size / len(latencies) / 1024, 1) if latencies else 0.0,
+        "status": statuses,
+    }
+
+
+def print_table(results: list):
+    header = f"{'scenario':<22} {'req':>5} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'avg KB':>8}  status"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        status = " ".join(f"{code}x{n}" for code, n in sorted(r["status"].items()))
+        print(
+            f"{r['scenario']:<22} {r['requests']:>5} {r['rps']:>9.1f} {r['p50_ms']:>9.2f} "
+            f"{r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['max_ms']:>9.2f} {r['avg_kb']:>8.1f}  {status}"
+        )
+
+
+async def main(args):
+    configure_env(args.db)
+
+    import httpx
+    from app.core.database import engine, replica_engine
+    from app.main import app
+
+    # ฟังก์ชัน/ไวยากรณ์ MySQL บน SQLite ต้องผูกก่อน connection แรก (replica ด้วยถ้าตั้ง REPLICA_DB_URL)
+    for e in (engine, replica_engine):
+        if e is not None:
+            hosxp_standin.attach(e)
+
+    keys = hosxp_standin.sample_keys(args.db)
+    selected = [
+        s for s in scenarios(keys)
+        if not args.only or any(s[0].startswith(o) or s[1] == o for o in args.only)
+    ]
+
+    transport = httpx.ASGITransport(app=app, client=(CLIENT_IP, 50000))
+    results = []
+    # เปิด lifespan ของแอป (preload ข้อมูลอ้างอิง) เหมือนตอนรันจริง
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for i, scenario in enumerate(selected):
+                results.append(await run_scenario(
+                    client, scenario, args.requests, args.concurrency, args.warmup, args.seed + i
+                ))
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"volumes": vars(args), "results": results}, f, ensure_ascii=False, indent=1)
+
+    await engine.dispose()
+
+
+def add_seed_arguments(parser):
+    # ขนาดข้อมูลของฐานข้อมูลจำลอง (ใช้ร่วมกับ benchmark อื่นใน benchmarks/)
+    parser.add_argument("--db", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin.sqlite"))
+    parser.add_argument("--reseed", action="store_true", help="ลบฐานข้อมูลจำลองเดิมแล้ว seed ใหม่")
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--visits-per-patient", type=int, default=4)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--rti-per-day", type=int, default=500)
+    parser.add_argument("--places", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=2569)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Offline benchmark ของ /api/v1 กับฐานข้อมูล HOSxP จำลอง")
+    add_seed_arguments(parser)
+    parser.add_argument("--requests", type=int, default=200, help="จำนวน request ต่อ scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--only", nargs="*", help="เลือก scenario ตามชื่อขึ้นต้นหรือ group เช่น hie rti/place")
+    parser.add_argument("--json", help="บันทึกผลเป็น JSON")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    ensure_seeded(args)
+    asyncio.run(main(args))
@@ -0,0 +1,356 @@
+# benchmarks/hosxp_standin.py
+#
+# ฐานข้อมูลจำลอง (stand-in) ที่มีโครงสร้างคล้าย HOSxP สำหรับ benchmark แบบ offline
+# ใช้ SQLite ผ่าน aiosqlite จึงไม่ต้องแตะฐานข้อมูลจริงของโรงพยาบาล
+#
+# SQL ของ agent เขียนแบบ MySQL (CONCAT, YEAR(NOW()), IF(), GROUP_CONCAT ... SEPARATOR)
+# ไฟล์นี้จึงลงทะเบียนฟังก์ชันเสริมให้ SQLite และแปลง syntax ที่ SQLite ไม่รองรับ
+# ก่อนส่ง statement ลงฐานข้อมูล (เฉพาะ stand-in เท่านั้น)
+
+import random
+import re
+import sqlite3
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import create_engine, event
+
+SCHEMA = """
+CREATE TABLE opdconfig (hospitalname TEXT);
+CREATE TABLE thaiaddress (chwpart TEXT, amppart TEXT, tmbpart TEXT, name TEXT);
+CREATE TABLE patient (
+    hn TEXT PRIMARY KEY, cid TEXT, pname TEXT, fname TEXT, lname TEXT, birthday DATE,
+    hometel TEXT, sex TEXT, addrpart TEXT, road TEXT, moopart TEXT,
+    chwpart TEXT, amppart TEXT, tmbpart TEXT, nationality TEXT, informtel TEXT, informname TEXT
+);
+CREATE INDEX ix_patient_cid ON patient (cid);
+CREATE TABLE pttype (pttype TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE doctor (code TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE spclty (spclty TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE ovstist (ovstist TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE ovstost (ovstost TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE ward (ward TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE ipt_spclty (ipt_spclty TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE dchtype (dchtype TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE dchstts (dchstts TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE er_oper_code (er_oper_code TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE ipt_oper_code (ipt_oper_code TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE drugusage (drugusage TEXT PRIMARY KEY, shortlist TEXT);
+CREATE TABLE icd101 (code TEXT PRIMARY KEY, code3 TEXT, tname TEXT, name TEXT);
+CREATE TABLE icd10 (code TEXT PRIMARY KEY, name TEXT);
+CREATE TABLE s_drugitems (icode TEXT PRIMARY KEY, name TEXT, strength TEXT);
+CREATE TABLE drugitems (icode TEXT PRIMARY KEY, sticker_short_name TEXT);
+CREATE TABLE ovst (
+    vn TEXT PRIMARY KEY, hn TEXT, an TEXT, hcode TEXT, vstdate DATE, vsttime TIME,
+    pttype TEXT, pttypeno TEXT, doctor TEXT, ovstist TEXT, ovstost TEXT
+);
+CREATE INDEX ix_ovst_hn ON ovst (hn);
+CREATE INDEX ix_ovst_vstdate ON ovst (vstdate);
+CREATE INDEX ix_ovst_an ON ovst (an);
+CREATE TABLE vn_stat (vn TEXT PRIMARY KEY, pdx TEXT, paid_money REAL, spclty TEXT);
+CREATE TABLE oapp (vn TEXT, nextdate DATE);
+CREATE INDEX ix_oapp_vn ON oapp (vn);
+CREATE TABLE opdscreen (
+    vn TEXT PRIMARY KEY, hn TEXT, bw TEXT, height TEXT, temperature TEXT, bps TEXT, bpd TEXT,
+    rr TEXT, pulse TEXT, bmi TEXT, fbs TEXT, cc TEXT, hpi TEXT, fh TEXT, pmh TEXT, pe TEXT,
+    pe_ga TEXT, pe_ga_text TEXT, pe_heent TEXT, pe_heent_text TEXT, pe_heart TEXT,
+    pe_heart_text TEXT, pe_lung TEXT, pe_lung_text TEXT, pe_ab TEXT, pe_ab_text TEXT
+);
+CREATE TABLE ovstdiag (vn TEXT, icd10 TEXT, diagtype TEXT, vstdate DATE, vsttime TIME);
+CREATE INDEX ix_ovstdiag_vn ON ovstdiag (vn);
+CREATE TABLE opitemrece (vn TEXT, an TEXT, icode TEXT, qty REAL, sum_price REAL, drugusage TEXT);
+CREATE INDEX ix_opitemrece_vn ON opitemrece (vn);
+CREATE INDEX ix_opitemrece_an ON opitemrece (an);
+CREATE TABLE lab_head (lab_order_number INTEGER PRIMARY KEY, vn TEXT, order_date DATE);
+CREATE INDEX ix_lab_head_vn ON lab_head (vn);
+CREATE TABLE lab_order (lab_order_number INTEGER, lab_items_code TEXT, lab_order_result TEXT);
+CREATE INDEX ix_lab_order_number ON lab_order (lab_order_number);
+CREATE TABLE lab_items (lab_items_code TEXT PRIMARY KEY, lab_items_name TEXT, lab_items_normal_value TEXT);
+CREATE TABLE opd_allergy (hn TEXT, agent TEXT, symptom TEXT, report_date DATE, department TEXT);
+CREATE INDEX ix_opd_allergy_hn ON opd_allergy (hn);
+CREATE TABLE er_regist_oper (vn TEXT, rec_no INTEGER, er_oper_code TEXT, doctor TEXT, oper_qty REAL, oper_cost REAL);
+CREATE INDEX ix_er_regist_oper_vn ON er_regist_oper (vn);
+CREATE TABLE doctor_operation (vn TEXT, er_oper_code TEXT, doctor TEXT, price REAL);
+CREATE INDEX ix_doctor_operation_vn ON doctor_operation (vn);
+CREATE TABLE ipt (
+    an TEXT PRIMARY KEY, hn TEXT, vn TEXT, regdate DATE, dchdate DATE, dchtime TIME,
+    admdoctor TEXT, dch_doctor TEXT, pttype TEXT, ward TEXT, ipt_spclty TEXT,
+    dchtype TEXT, dchstts TEXT, prediag TEXT
+);
+CREATE INDEX ix_ipt_dchdate ON ipt (dchdate);
+CREATE TABLE an_stat (an TEXT PRIMARY KEY, vn TEXT, admday TEXT);
+CREATE INDEX ix_an_stat_vn ON an_stat (vn);
+CREATE TABLE iptadm (an TEXT PRIMARY KEY, bedno TEXT);
+CREATE TABLE iptdiag (an TEXT, icd10 TEXT, modify_datetime DATETIME);
+CREATE INDEX ix_iptdiag_an ON iptdiag (an);
+CREATE TABLE ipt_nurse_oper (an TEXT, ipt_oper_code TEXT, doctor TEXT, ref_date DATE, oper_qty REAL, total_price REAL);
+CREATE INDEX ix_ipt_nurse_oper_an ON ipt_nurse_oper (an);
+CREATE TABLE v_rti_accident (
+    vstdate DATE, HOSPCODE TEXT, PID TEXT, SEQ TEXT, DATETIME_SERV DATETIME, DATETIME_AE DATETIME,
+    AETYPE TEXT, AEPLACE TEXT, TYPEIN_AE TEXT, TRAFFIC TEXT, VEHICLE TEXT, ALCOHOL TEXT,
+    NACROTIC_DRUG TEXT, BELT TEXT, HELMET TEXT, AIRWAY TEXT, STOPBLEED TEXT, SPLINT TEXT,
+    FLUID TEXT, URGENCY TEXT, COMA_EYE TEXT, COMA_SPEAK TEXT, COMA_MOVEMENT TEXT,
+    D_UPDATE DATETIME, CID TEXT, HOSPCODE9 TEXT, accident_stdcode TEXT, pt_name TEXT, hn TEXT,
+    an TEXT, referhos TEXT, dead_in TEXT, dead_before TEXT, place_other TEXT
+);
+CREATE INDEX ix_v_rti_accident_vstdate ON v_rti_accident (vstdate);
+CREATE TABLE v_rti_place (
+    accident_stdcode TEXT, accident_place_type_name TEXT, latitude TEXT, longitude TEXT,
+    tamboncode TEXT, ampurcode TEXT, road TEXT, export_code TEXT
+);
+"""
+
+# ---------------------------------------------------------
+# ฟังก์ชัน MySQL ที่ SQLite ไม่มี
+# ---------------------------------------------------------
+def _concat(*args):
+    if any(a is None for a in args):
+        return None
+    return "".join(str(a) for a in args)
+
+
+def _year(value):
+    return int(str(value)[:4]) if value else None
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _if(cond, a, b):
+    return a if cond else b
+
+
+_GROUP_CONCAT_SEP = re.compile(r"GROUP_CONCAT\((.+?)\s+SEPARATOR\s+('[^']*')\)", re.IGNORECASE | re.DOTALL)
+_DATE_ALIAS = re.compile(r"(DATE\((?:[^()]|\([^()]*\))*\))\s+AS\s+(\w+)", re.IGNORECASE)
+
+
+def _to_sqlite(statement: str) -> str:
+    statement = _GROUP_CONCAT_SEP.sub(r"GROUP_CONCAT(\1, \2)", statement)
+    # ให้ DATE(...) AS x คืนค่าเป็น date object เหมือน driver จริง (PARSE_COLNAMES)
+    statement = _DATE_ALIAS.sub(r'\1 AS "\2 [date]"', statement)
+    return statement
+
+
+sqlite3.register_converter("DATE", lambda b: date.fromisoformat(b.decode()))
+sqlite3.register_converter("TIME", lambda b: time.fromisoformat(b.decode()))
+sqlite3.register_converter("DATETIME", lambda b: datetime.fromisoformat(b.decode()))
+
+
+def _register_functions(dbapi_connection, connection_record):
+    if hasattr(dbapi_connection, "run_async"):
+        # aiosqlite: create_function เป็น coroutine
+        dbapi_connection.run_async(_create_functions_async)
+    else:
+        for name, n, fn in _FUNCTIONS:
+            dbapi_connection.create_function(name, n, fn)
+
+
+async def _create_functions_async(conn):
+    for name, n, fn in _FUNCTIONS:
+        await conn.create_function(name, n, fn)
+
+
+_FUNCTIONS = [("CONCAT", -1, _concat), ("YEAR", 1, _year), ("NOW", 0, _now), ("IF", 3, _if)]
+
+
+def _rewrite(conn, cursor, statement, parameters, context, executemany):
+    return _to_sqlite(statement), parameters
+
+
+def attach(engine):
+    # ผูก engine (sync หรือ async) เข้ากับ stand-in
+    sync_engine = getattr(engine, "sync_engine", engine)
+    event.listen(sync_engine, "connect", _register_functions)
+    event.listen(sync_engine, "before_cursor_execute", _rewrite, retval=True)
+    return engine
+
+
+# ---------------------------------------------------------
+# ข้อมูลสังเคราะห์
+# ---------------------------------------------------------
+FIRST_NAMES = ["สมชาย", "สมหญิง", "จันทร์เจ้า", "มนัส", "สมพงษ์", "วิไล", "ประเสริฐ", "อรุณี"]
+LAST_NAMES = ["ใจดี", "ศรีสุข", "มั่นคง", "รุ่งเรือง", "แสงทอง", "บุญมา"]
+STROKE_CODES = ["I60", "I610", "I630", "I64", "I679"]
+OTHER_CODES = ["J00", "E119", "I10", "K297", "M545", "R51"]
+
+
+def seed(path: str, patients: int = 500, visits_per_patient: int = 4, days: int = 30,
+         rti_per_day: int = 200, places: int = 300, seed_value: int = 2569) -> dict:
+    rnd = random.Random(seed_value)
+    engine = create_engine(f"sqlite:///{path}")
+    raw = engine.raw_connection()
+    cur = raw.cursor()
+    cur.executescript(SCHEMA)
+
+    end_day = date(2025, 1, 31)
+    start_day = end_day - timedelta(days=days - 1)
+
+    cur.execute("INSERT INTO opdconfig VALUES ('โรงพยาบาลจำลอง')")
+    address = [("19", "00", "00", "สระบุรี")]
+    for a in range(1, 14):
+        amp = f"{a:02d}"
+        address.append(("19", amp, "00", f"อำเภอ{amp}"))
+        for t in range(1, 12):
+            address.append(("19", amp, f"{t:02d}", f"ตำบล{amp}{t:02d}"))
+    cur.executemany("INSERT INTO thaiaddress VALUES (?,?,?,?)", address)
+
+    def codes(table, n, prefix):
+        rows = [(f"{i:03d}", f"{prefix} {i}") for i in range(1, n + 1)]
+        cur.executemany(f"INSERT INTO {table} VALUES (?,?)", rows)
+        return [r[0] for r in rows]
+
+    doctors = codes("doctor", 40, "นพ.แพทย์")
+    pttypes = codes("pttype", 20, "สิทธิ")
+    spcltys = codes("spclty", 10, "แผนก")
+    ists = codes("ovstist", 6, "มาเอง")
+    osts = codes("ovstost", 6, "กลับบ้าน")
+    wards = codes("ward", 8, "หอผู้ป่วย")
+    codes("ipt_spclty", 8, "แผนก IPD")
+    dchtypes = codes("dchtype", 5, "จำหน่าย")
+    dchstts = codes("dchstts", 5, "สถานะ")
+    er_codes = codes("er_oper_code", 30, "หัตถการ")
+    ipt_codes = codes("ipt_oper_code", 30, "หัตถการ IPD")
+    usages = codes("drugusage", 20, "1x3 pc")
+
+    icds = STROKE_CODES + OTHER_CODES
+    cur.executemany("INSERT INTO icd101 VALUES (?,?,?,?)",
+                    [(c, c[:3], f"โรค {c}", f"Disease {c}") for c in icds])
+    cur.executemany("INSERT INTO icd10 VALUES (?,?)", [(c, f"Disease {c}") for c in icds])
+    icodes = [f"1{i:06d}" for i in range(1, 60)] + [f"3{i:06d}" for i in range(1, 20)]
+    cur.executemany("INSERT INTO s_drugitems VALUES (?,?,?)", [(c, f"Drug {c}", "500 mg") for c in icodes])
+    cur.executemany("INSERT INTO drugitems VALUES (?,?)", [(c, f"Drug {c} (A)") for c in icodes])
+    lab_codes = [f"{i:03d}" for i in range(1, 40)]
+    cur.executemany("INSERT INTO lab_items VALUES (?,?,?)",
+                    [(c, "HIV Ab" if c == "013" else f"Lab {c}", "0-10") for c in lab_codes])
+
+    patient_rows = []
+    ovst, vn_stat, oapp, screen, diag, items = [], [], [], [], [], []
+    lab_head, lab_order, allergy, er_oper, opd_oper = [], [], [], [], []
+    ipt, an_stat, iptadm, iptdiag, ipt_oper = [], [], [], [], []
+    lab_no = an_no = 0
+    for p in range(1, patients + 1):
+        hn = f"{p:09d}"
+        cid = f"{1100000000000 + p}"
+        amp = f"{rnd.randint(1, 13):02d}"
+        tmb = f"{rnd.randint(1, 11):02d}"
+        patient_rows.append((
+            hn, cid, rnd.choice(["นาย", "นาง", "น.ส."]), rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES),
+            date(1940 + p % 60, 1 + p % 12, 1 + p % 28).isoformat(), f"08{p:08d}", str(1 + p % 2),
+            f"{p}/1", "ถนนพหลโยธิน", f"{1 + p % 12:02d}", "19", amp, tmb, "99", f"09{p:08d}", "ญาติ",
+        ))
+        for a in range(rnd.randint(0, 2)):
+            allergy.append((hn, f"Drug {a}", "ผื่น", start_day.isoformat(), "OPD"))
+        for v in range(visits_per_patient):
+            day = start_day + timedelta(days=rnd.randrange(days))
+            vn = f"{day:%y%m%d}{p:06d}{v}"
+            stroke = rnd.random() < 0.1
+            an = None
+            if stroke and rnd.random() < 0.5:
+                an_no += 1
+                an = f"{an_no:09d}"
+            ovst.append((vn, hn, an, "10815", day.isoformat(), f"{8 + v % 8:02d}:30:00",
+                         rnd.choice(pttypes), f"NO{p}", rnd.choice(doctors), rnd.choice(ists), rnd.choice(osts)))
+            pdx = rnd.choice(STROKE_CODES if stroke else OTHER_CODES)
+            vn_stat.append((vn, pdx, rnd.randint(0, 2000), rnd.choice(spcltys)))
+            if rnd.random() < 0.3:
+                oapp.append((vn, (day + timedelta(days=30)).isoformat()))
+            screen.append((vn, hn, "60.5", "165", "36.8", "120", "80", "20", "78", "22.2", "95",
+                           "ไข้", "มีไข้ 2 วัน", "-", "-", "ปกติ", "1", "ดี", "1", "ปกติ", "1", "ปกติ",
+                           "1", "ปกติ", "1", "ปกติ"))
+            diag.append((vn, pdx, "1", day.isoformat(), "09:00:00"))
+            for _ in range(rnd.randint(1, 3)):
+                diag.append((vn, rnd.choice(STROKE_CODES if stroke else OTHER_CODES), "2",
+                             day.isoformat(), "09:10:00"))
+            for _ in range(rnd.randint(2, 8)):
+                items.append((vn, an, rnd.choice(icodes), rnd.randint(1, 30), rnd.randint(10, 900), rnd.choice(usages)))
+            for _ in range(rnd.randint(0, 2)):
+                lab_no += 1
+                lab_head.append((lab_no, vn, day.isoformat()))
+                for code in rnd.sample(lab_codes, 5):
+                    lab_order.append((lab_no, code, str(rnd.randint(1, 200))))
+            for r in range(rnd.randint(0, 2)):
+                er_oper.append((vn, r + 1, rnd.choice(er_codes), rnd.choice(doctors), 1, rnd.randint(50, 500)))
+            for _ in range(rnd.randint(0, 1)):
+                opd_oper.append((vn, rnd.choice(er_codes), rnd.choice(doctors), rnd.randint(50, 500)))
+            if an:
+                dch = min(day + timedelta(days=rnd.randint(1, 5)), end_day)
+                ipt.append((an, hn, vn, day.isoformat(), dch.isoformat(), "10:00:00", rnd.choice(doctors),
+                            rnd.choice(doctors), rnd.choice(pttypes), rnd.choice(wards), "001",
+                            rnd.choice(dchtypes), rnd.choice(dchstts), "Stroke"))
+                an_stat.append((an, vn, str((dch - day).days)))
+                iptadm.append((an, "B1"))
+                for code in rnd.sample(STROKE_CODES, 2):
+                    iptdiag.append((an, code, f"{day.isoformat()} 11:00:00"))
+                for _ in range(rnd.randint(1, 3)):
+                    ipt_oper.append((an, rnd.choice(ipt_codes), rnd.choice(doctors), day.isoformat(), 1, rnd.randint(50, 900)))
+
+    cur.executemany(f"INSERT INTO patient VALUES ({','.join('?' * 17)})", patient_rows)
+    cur.executemany(f"INSERT INTO ovst VALUES ({','.join('?' * 11)})", ovst)
+    cur.executemany("INSERT INTO vn_stat VALUES (?,?,?,?)", vn_stat)
+    cur.executemany("INSERT INTO oapp VALUES (?,?)", oapp)
+    cur.executemany(f"INSERT INTO opdscreen VALUES ({','.join('?' * 26)})", screen)
+    cur.executemany("INSERT INTO ovstdiag VALUES (?,?,?,?,?)", diag)
+    cur.executemany("INSERT INTO opitemrece VALUES (?,?,?,?,?,?)", items)
+    cur.executemany("INSERT INTO lab_head VALUES (?,?,?)", lab_head)
+    cur.executemany("INSERT INTO lab_order VALUES (?,?,?)", lab_order)
+    cur.executemany("INSERT INTO opd_allergy VALUES (?,?,?,?,?)", allergy)
+    cur.executemany("INSERT INTO er_regist_oper VALUES (?,?,?,?,?,?)", er_oper)
+    cur.executemany("INSERT INTO doctor_operation VALUES (?,?,?,?)", opd_oper)
+    cur.executemany(f"INSERT INTO ipt VALUES ({','.join('?' * 14)})", ipt)
+    cur.executemany("INSERT INTO an_stat VALUES (?,?,?)", an_stat)
+    cur.executemany("INSERT INTO iptadm VALUES (?,?)", iptadm)
+    cur.executemany("INSERT INTO iptdiag VALUES (?,?,?)", iptdiag)
+    cur.executemany("INSERT INTO ipt_nurse_oper VALUES (?,?,?,?,?,?)", ipt_oper)
+
+    rti = []
+    for d in range(days):
+        day = start_day + timedelta(days=d)
+        for s in range(rti_per_day):
+            served = datetime.combine(day, time(0, 0)) + timedelta(minutes=rnd.randrange(24 * 60))
+            rti.append((
+                day.isoformat(), "10815", f"{s:06d}", f"{d:03d}{s:05d}", served.isoformat(sep=" "),
+                (served - timedelta(minutes=30)).isoformat(sep=" "), "1", "2", "1", "1",
+                str(rnd.randint(1, 9)), str(rnd.randint(0, 1)), "0", "1", "1", "1", "0", "0", "1", "2",
+                "4", "5", "6", (served + timedelta(hours=1)).isoformat(sep=" "), f"{1100000000000 + s}",
+                "EA0010815", f"C{rnd.randint(1, places):03d}", rnd.choice(FIRST_NAMES), f"{s:09d}",
+                None, "10810", "0", "0", "ตลาดสด",
+            ))
+    cur.executemany(f"INSERT INTO v_rti_accident VALUES ({','.join('?' * 34)})", rti)
+    cur.executemany("INSERT INTO v_rti_place VALUES (?,?,?,?,?,?,?,?)", [
+        (f"C{i:03d}", "ทางแยก", f"14.{i:06d}", f"100.{i:06d}", f"1901{i % 11:02d}", "1901", "ถนนสุขุมวิท", "07")
+        for i in range(1, places + 1)
+    ])
+    raw.commit()
+    raw.close()
+    engine.dispose()
+
+    return sample_keys(path)
+
+
+def sample_keys(path: str) -> dict:
+    # อ่าน key ที่ใช้สร้าง request จากฐานข้อมูลที่ seed ไว้แล้ว (ไม่ต้อง seed ใหม่ทุกครั้ง)
+    conn = sqlite3.connect(path)
+    try:
+        visits = conn.execute("""
+            SELECT p.cid, o.hn, o.vn, o.an, o.vstdate
+            FROM ovst o INNER JOIN patient p ON p.hn = o.hn
+            ORDER BY o.vn
+        """).fetchall()
+        dchdates = [r[0] for r in conn.execute("SELECT DISTINCT dchdate FROM ipt ORDER BY dchdate")]
+        rti_days = [r[0] for r in conn.execute("SELECT DISTINCT vstdate FROM v_rti_accident ORDER BY vstdate")]
+    finally:
+        conn.close()
+
+    return {
+        "visits": visits,
+        "admits": [v for v in visits if v[3]],
+        "vstdates": sorted({v[4] for v in visits}),
+        "dchdates": dchdates,
+        "rti_days": rti_days,
+    }
+
+
+def database_url(path: str) -> str:
+    # detect_types=3 (PARSE_DECLTYPES | PARSE_COLNAMES) ให้ DATE/TIME กลับมาเป็น object
+    return f"sqlite+aiosqlite:///{path}?detect_types=3"
+
@@ -0,0 +1,25 @@
+# benchmarks/standin_app.py
+#
+# app.main:app ที่ผูกกับฐานข้อมูลจำลอง (hosxp_standin) สำหรับรันผ่าน launcher จริง (app/server.py)
+# ผู้เรียกต้องตั้ง env ด้วย harness.configure_env() ก่อน (worker ทุกตัว import module นี้เอง)
+#
+#   python -m benchmarks.standin_app   # = python -m app.server แต่ใช้ฐานข้อมูลจำลอง
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import hosxp_standin
+from app.core.database import engine, replica_engine
+from app.main import app
+
+# ฟังก์ชัน/ไวยากรณ์ MySQL บน SQLite ต้องผูกก่อน connection แรกของแต่ละ worker (replica ด้วยถ้าตั้ง REPLICA_DB_URL)
+for e in (engine, replica_engine):
+    if e is not None:
+        hosxp_standin.attach(e)
+
+
+if __name__ == "__main__":
+    from app import server
+    server.run("benchmarks.standin_app:app")